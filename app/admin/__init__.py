@@ -0,0 +1,14 @@
+"""
+Módulo de administración para SmtpMailer FastAPI.
+
+Endpoints internos de operación (recarga de plantillas, diagnóstico),
+protegidos con el token `ADMIN_TOKEN`.
+"""
+
+from app.admin.router import router_admin, TAG_ADMIN, require_admin
+
+__all__ = [
+    "router_admin",
+    "TAG_ADMIN",
+    "require_admin",
+]
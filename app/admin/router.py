@@ -0,0 +1,81 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.observability import get_logger, slow_transcripts
+from app.rendering import template_registry
+
+MODULE_NAME = "admin"
+
+logger = get_logger(__name__)
+
+TAG_ADMIN = {
+    "name": MODULE_NAME,
+    "description": """
+- 🛠️ **Operación** - Endpoints internos para operar el servicio sin reiniciarlo
+- 🔑 **Acceso:** Requieren el header `X-Admin-Token` igual a `ADMIN_TOKEN`; sin `ADMIN_TOKEN` quedan deshabilitados
+"""
+}
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Valida el token de administración; sin `ADMIN_TOKEN` configurado los endpoints se deshabilitan."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Endpoints de administración deshabilitados (ADMIN_TOKEN no configurado)"
+        )
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de administración inválido")
+
+
+router_admin = APIRouter(
+    prefix=f"/{MODULE_NAME}",
+    tags=[MODULE_NAME],
+    dependencies=[Depends(require_admin)])
+
+
+@router_admin.get("/templates")
+async def estado_plantillas() -> dict:
+    """Estado del registro de plantillas compiladas."""
+    return template_registry.stats()
+
+
+@router_admin.post("/templates/reload")
+async def recargar_plantillas() -> dict:
+    """
+    Recompila las plantillas de email desde disco sin reiniciar el servicio.
+    
+    Equivalente a enviar `SIGHUP` al proceso.
+    """
+    try:
+        await run_in_threadpool(template_registry.reload)
+    except Exception as e:
+        logger.error("Error recargando plantillas", exc_info=e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error recargando plantillas: {str(e)}"
+        )
+    return {"success": True, **template_registry.stats()}
+
+
+@router_admin.get("/smtp/slow-transcripts")
+async def transcripciones_lentas(limit: int = Query(20, ge=1, le=500)) -> dict:
+    """
+    Transcripciones SMTP de los envíos más lentos que `SMTP_SLOW_SEND_THRESHOLD_MS`.
+    
+    Cada línea indica los milisegundos desde el inicio del envío y su tipo:
+    `>` comando, `<` respuesta, `*` fase (dns, connect, tls, auth, data) o
+    tamaño de DATA. Las credenciales de AUTH no se guardan.
+    """
+    return {**slow_transcripts.stats(), "transcripts": slow_transcripts.entries(limit)}
+
+
+@router_admin.delete("/smtp/slow-transcripts")
+async def limpiar_transcripciones_lentas() -> dict:
+    """Vacía el ring buffer de transcripciones lentas."""
+    slow_transcripts.clear()
+    return {"success": True, **slow_transcripts.stats()}
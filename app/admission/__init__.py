@@ -0,0 +1,60 @@
+"""
+Módulo de control de admisión para SmtpMailer FastAPI.
+
+Limita los requests en curso y la espera por el threadpool: cuando la cola
+alcanza `ADMISSION_QUEUE_DEPTH` el servicio responde `503` con
+`Retry-After` en lugar de acumular latencia oculta, de modo que un relay
+lento se traduce en back-pressure rápida y visible para los clientes.
+
+Rate limiting en memoria con ventanas deslizantes: por IP del cliente en
+un middleware (antes de leer el cuerpo) y por destinatario en los
+endpoints de envío, antes de renderizar o tocar SMTP.
+
+Idempotencia: los reintentos de un envío (mismo `Idempotency-Key`, o mismo
+destinatario y contenido) reciben la respuesta ya guardada, o esperan al
+envío en curso, sin gastar cupo del relay.
+"""
+
+from app.admission.control import (
+    AdmissionController,
+    AdmissionMiddleware,
+    admission_controller,
+    configure_threadpool,
+    threadpool_stats,
+)
+from app.admission.idempotency import (
+    IDEMPOTENCY_HEADER,
+    REPLAYED_HEADER,
+    IdempotencyCache,
+    IdempotencyKeyReusedError,
+    idempotency_cache,
+    send_once,
+)
+from app.admission.ratelimit import (
+    RateLimiter,
+    RateLimitMiddleware,
+    SlidingWindowCounter,
+    enforce_recipient_limit,
+    rate_limiter,
+    recipient_wait,
+)
+
+__all__ = [
+    "AdmissionController",
+    "AdmissionMiddleware",
+    "admission_controller",
+    "configure_threadpool",
+    "threadpool_stats",
+    "IDEMPOTENCY_HEADER",
+    "REPLAYED_HEADER",
+    "IdempotencyCache",
+    "IdempotencyKeyReusedError",
+    "idempotency_cache",
+    "send_once",
+    "RateLimiter",
+    "RateLimitMiddleware",
+    "SlidingWindowCounter",
+    "enforce_recipient_limit",
+    "rate_limiter",
+    "recipient_wait",
+]
@@ -0,0 +1,212 @@
+import asyncio
+import json
+from typing import Optional, Sequence
+
+from anyio import to_thread
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.observability import get_logger
+from app.observability.metrics import Counter, metrics_registry
+
+
+logger = get_logger(__name__)
+
+REJECT_QUEUE_FULL = "queue_full"
+REJECT_THREADPOOL = "threadpool"
+REJECT_TIMEOUT = "timeout"
+REJECT_DRAINING = "draining"
+
+admission_rejected_total = metrics_registry.register(Counter(
+    "admission_rejected_total", "Requests rechazados con 503 por el control de admisión.", ("reason",)
+))
+
+
+def configure_threadpool(size: int) -> None:
+    """
+    Ajusta los tokens del threadpool por defecto de AnyIO (40 si no se configura).
+
+    El limitador pertenece al event loop en curso: debe llamarse desde el
+    lifespan de la aplicación.
+    """
+    to_thread.current_default_thread_limiter().total_tokens = max(1, size)
+
+
+def threadpool_stats() -> dict:
+    """Tokens del threadpool: totales, en uso y tareas esperando un hilo (desde el event loop)."""
+    limiter = to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    return {
+        "total": int(limiter.total_tokens),
+        "active": statistics.borrowed_tokens,
+        "waiting": statistics.tasks_waiting,
+    }
+
+
+class AdmissionController:
+    """
+    Control de admisión por capacidad de requests en curso y profundidad de cola.
+
+    Un request entra si hay lugar entre los `capacity` en curso; si no,
+    espera en una cola de a lo sumo `queue_depth` requests durante
+    `queue_timeout` segundos. Con la cola llena, o con `queue_depth` tareas
+    ya esperando un hilo del threadpool, se rechaza de inmediato. Con
+    `capacity=0` solo se aplica el límite de la cola del threadpool.
+
+    Al apagar, `start_draining()` rechaza todo request nuevo y `drain()`
+    espera a que terminen los que están en curso.
+    """
+
+    def __init__(self, capacity: int, queue_depth: int, queue_timeout: float, retry_after: int):
+        self.capacity = max(0, capacity)
+        self.queue_depth = max(0, queue_depth)
+        self.queue_timeout = queue_timeout
+        self.retry_after = max(1, retry_after)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.waiting = 0
+        self.draining = False
+
+        # Métricas
+        self.admitted = 0
+        self.rejected = 0
+
+    def _ensure_loop(self) -> Optional[asyncio.Semaphore]:
+        """Asocia el semáforo al event loop actual, reiniciándolo si cambió (p. ej. tras reiniciar el servidor)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.capacity) if self.capacity else None
+            self.active = 0
+            self.waiting = 0
+            self.draining = False
+        return self._slots
+
+    def _threadpool_saturated(self) -> bool:
+        waiting = threadpool_stats()["waiting"]
+        return waiting > 0 and waiting >= self.queue_depth
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Reserva lugar para un request.
+
+        Returns:
+            str | None: `None` si el request fue admitido, o el motivo del rechazo.
+        """
+        slots = self._ensure_loop()
+        if self.draining:
+            return REJECT_DRAINING
+        if self._threadpool_saturated():
+            return REJECT_THREADPOOL
+        if slots is not None and slots.locked():
+            if self.waiting >= self.queue_depth:
+                return REJECT_QUEUE_FULL
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return REJECT_TIMEOUT
+            finally:
+                self.waiting -= 1
+        elif slots is not None:
+            await slots.acquire()
+        self.active += 1
+        self.admitted += 1
+        return None
+
+    def release(self) -> None:
+        self.active -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def start_draining(self) -> None:
+        """Deja de admitir requests nuevos (apagado ordenado)."""
+        self._ensure_loop()
+        self.draining = True
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Espera a que terminen los requests en curso.
+
+        Returns:
+            bool: True si terminaron todos, False si venció el plazo.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.active > 0:
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    def reject(self, reason: str) -> None:
+        self.rejected += 1
+        admission_rejected_total.inc(reason)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "queue_depth": self.queue_depth,
+            "active": self.active,
+            "waiting": self.waiting,
+            "draining": self.draining,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+admission_controller = AdmissionController(
+    capacity=settings.MAX_IN_FLIGHT_REQUESTS,
+    queue_depth=settings.ADMISSION_QUEUE_DEPTH,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+)
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI que aplica el control de admisión y responde `503` con `Retry-After`.
+
+    Las rutas de operación (`/health`, `/metrics`, documentación) no pasan
+    por el control para seguir respondiendo bajo carga.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller,
+                 exclude: Sequence[str] = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json")):
+        self.app = app
+        self.controller = controller
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+
+        reason = await self.controller.acquire()
+        if reason is not None:
+            self.controller.reject(reason)
+            # Bajo ráfagas cada rechazo generaría un log: el conteo queda en `admission_rejected_total`
+            logger.debug("Request rechazado por control de admisión", reason=reason, path=scope["path"])
+            await self._reject(send, reason)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    async def _reject(self, send: Send, reason: str) -> None:
+        detail = ("Servicio deteniéndose, reintentar en otra instancia" if reason == REJECT_DRAINING
+                  else "Servicio saturado, reintentar más tarde")
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(self.controller.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
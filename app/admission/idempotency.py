@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.observability import get_logger
+from app.observability.metrics import Counter, metrics_registry
+
+
+logger = get_logger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+idempotent_replays_total = metrics_registry.register(Counter(
+    "idempotent_replays_total", "Requests duplicados respondidos sin reenviar.", ("route", "state")
+))
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Una clave de idempotencia ya usada llegó con un contenido distinto."""
+
+
+class _Entry:
+    __slots__ = ("future", "result", "expires_at", "fingerprint")
+
+    def __init__(self, future: asyncio.Future, fingerprint: Optional[str]):
+        self.future: Optional[asyncio.Future] = future
+        self.result: Any = None
+        self.expires_at = float("inf")
+        self.fingerprint = fingerprint
+
+
+class IdempotencyCache:
+    """
+    Caché con TTL de resultados de envío por clave de idempotencia.
+
+    Un request con una clave ya vista recibe el resultado guardado sin
+    volver a enviar; si el primer envío aún está en curso, espera a ese
+    envío en lugar de iniciar otro. Solo se guardan los resultados
+    exitosos: tras un fallo la clave se libera para que el cliente pueda
+    reintentar. Las entradas se expiran en orden y el total está acotado
+    por `max_keys`.
+
+    Cada entrada guarda la huella del contenido que la creó: si la clave se
+    reutiliza con otro contenido no se repite la respuesta, se rechaza.
+    """
+
+    def __init__(self, max_keys: int = 10_000):
+        self.max_keys = max(1, max_keys)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.joined = 0
+        self.misses = 0
+        self.conflicts = 0
+
+    def _expire(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest.expires_at > now and len(entries) <= self.max_keys:
+                break
+            entries.popitem(last=False)
+
+    def _lookup(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.future is None:
+            return entry if entry.expires_at > now else None
+        # Un envío en curso en otro event loop no puede esperarse desde este
+        return entry if entry.future.get_loop() is asyncio.get_running_loop() else None
+
+    async def run(self, key: str, send: Callable[[], Awaitable[Any]], ttl: float,
+                  keep: Callable[[Any], bool] = lambda result: True,
+                  fingerprint: Optional[str] = None) -> tuple[Any, str]:
+        """
+        Ejecuta `send()` una sola vez por `key` dentro de `ttl` segundos.
+
+        Args:
+            key (str): **Clave de idempotencia** ya acotada por ruta y destinatario.
+            send (Callable): **Envío** a ejecutar si la clave no se vio.
+            ttl (float): **Segundos** que se conserva el resultado.
+            keep (Callable): **Guardar** el resultado; los fallos no se guardan.
+            fingerprint (str, optional): **Huella del contenido**; debe coincidir con la de la entrada.
+
+        Returns:
+            tuple[Any, str]: El resultado y su origen: `sent`, `cached` (ya terminado) o `joined` (en curso).
+
+        Raises:
+            IdempotencyKeyReusedError: Si `key` ya se usó con otra huella.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._lookup(key, now)
+            if entry is None:
+                entry = _Entry(asyncio.get_running_loop().create_future(), fingerprint)
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self.misses += 1
+                owner = True
+            else:
+                owner = False
+                if entry.fingerprint != fingerprint:
+                    self.conflicts += 1
+                    raise IdempotencyKeyReusedError("La clave de idempotencia ya se usó con otro contenido")
+                if entry.future is None:
+                    self.hits += 1
+                    return entry.result, "cached"
+                self.joined += 1
+
+        if not owner:
+            try:
+                return await asyncio.shield(entry.future), "joined"
+            except asyncio.CancelledError:
+                if not entry.future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # El primer envío se canceló (cliente desconectado): este request envía por su cuenta
+                return await self.run(key, send, ttl, keep, fingerprint)
+
+        future = entry.future
+        try:
+            result = await send()
+        except BaseException as e:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            elif not future.done():
+                future.set_exception(e)
+                # Evita el aviso de excepción no recuperada si nadie esperaba
+                future.exception()
+            raise
+
+        with self._lock:
+            if keep(result) and ttl > 0:
+                entry.future = None
+                entry.result = result
+                entry.expires_at = time.monotonic() + ttl
+                if self._entries.get(key) is entry:
+                    self._entries.move_to_end(key)
+            elif self._entries.get(key) is entry:
+                del self._entries[key]
+        future.set_result(result)
+        return result, "sent"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._entries),
+                "max_keys": self.max_keys,
+                "hits": self.hits,
+                "joined": self.joined,
+                "misses": self.misses,
+                "conflicts": self.conflicts,
+            }
+
+
+idempotency_cache = IdempotencyCache(settings.IDEMPOTENCY_MAX_KEYS)
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+async def send_once(route: str, recipient: str, header_key: Optional[str], payload: str,
+                    send: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+    """
+    Envía a través de la caché de idempotencia de `route`.
+
+    Con header `Idempotency-Key` la clave es ese valor y se conserva
+    `IDEMPOTENCY_TTL_SECONDS`; reutilizarla con otro destinatario u otro
+    `payload` se rechaza en lugar de repetir la respuesta anterior, de modo
+    que nunca devuelve la respuesta de otro envío. Sin header, la clave se deriva de
+    `payload` (por ejemplo destinatario y código OTP) y se conserva
+    `IDEMPOTENCY_DERIVED_TTL_SECONDS`.
+
+    Returns:
+        tuple[Any, bool]: El resultado del envío e indicador de respuesta repetida.
+
+    Raises:
+        HTTPException: `422` si el `Idempotency-Key` ya se usó con otro destinatario o contenido.
+    """
+    recipient = recipient.strip().lower()
+    if not settings.IDEMPOTENCY_ENABLED:
+        return await send(), False
+    fingerprint = None
+    if header_key:
+        key, ttl = _digest(route, "header", header_key), settings.IDEMPOTENCY_TTL_SECONDS
+        fingerprint = _digest(recipient, payload)
+    elif settings.IDEMPOTENCY_DERIVED_TTL_SECONDS > 0:
+        key, ttl = _digest(route, recipient, "payload", payload), settings.IDEMPOTENCY_DERIVED_TTL_SECONDS
+    else:
+        return await send(), False
+
+    try:
+        result, state = await idempotency_cache.run(
+            key, send, ttl, keep=lambda r: getattr(r, "success", True), fingerprint=fingerprint
+        )
+    except IdempotencyKeyReusedError as e:
+        logger.warning("Idempotency-Key reutilizada con otro contenido", route=route, recipient=recipient)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)) from e
+    if state != "sent":
+        idempotent_replays_total.inc(route, state)
+        logger.debug("Request duplicado respondido sin reenviar", route=route, recipient=recipient, state=state)
+    return result, state != "sent"
@@ -0,0 +1,221 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, status
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.observability import get_logger
+from app.observability.metrics import Counter, metrics_registry
+
+
+logger = get_logger(__name__)
+
+rate_limited_total = metrics_registry.register(Counter(
+    "rate_limited_total", "Requests o envíos rechazados con 429 por límite de frecuencia.", ("scope", "window")
+))
+
+
+class SlidingWindowCounter:
+    """
+    Contador por clave en una ventana deslizante aproximada (dos ventanas fijas).
+
+    Por clave solo guarda `[índice de ventana, conteo anterior, conteo actual]`;
+    la estimación pondera la ventana anterior por la fracción que aún cae
+    dentro de la ventana deslizante. Registrar un evento es O(1) y las claves
+    sin actividad en dos ventanas se expiran en orden de último uso, también
+    en O(1) amortizado. No es thread-safe: lo protege `RateLimiter`.
+
+    Attributes:
+        limit (int): **Eventos** permitidos por ventana.
+        window (float): **Duración** de la ventana en segundos.
+        max_keys (int): **Claves** máximas en memoria; al superarlas se descartan las más antiguas.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max(1, max_keys)
+        self._entries: OrderedDict[str, list] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, key: str, index: int) -> list:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [index, 0, 0]
+        else:
+            self._entries.move_to_end(key)
+            if entry[0] != index:
+                # La ventana actual pasa a ser la anterior solo si son consecutivas
+                entry[1] = entry[2] if entry[0] == index - 1 else 0
+                entry[2] = 0
+                entry[0] = index
+        return entry
+
+    def wait(self, key: str, now: float) -> float:
+        """Segundos hasta que `key` pueda registrar un evento más (0 si ya puede)."""
+        if self.limit <= 0:
+            return 0.0
+        index, offset = divmod(now, self.window)
+        _, previous, current = self._entry(key, int(index))
+        elapsed = offset / self.window
+        allowed = self.limit - 1
+        if previous * (1 - elapsed) + current <= allowed:
+            return 0.0
+        if current <= allowed and previous:
+            # Basta con que salga de la ventana parte de los eventos anteriores
+            return max(0.0, self.window * (1 - (allowed - current) / previous) - offset)
+        # Hay que esperar a la ventana siguiente y a que salga parte de la actual
+        return self.window - offset + self.window * (1 - allowed / current)
+
+    def add(self, key: str, now: float) -> None:
+        index = int(now // self.window)
+        self._entry(key, index)[2] += 1
+        self._expire(index)
+
+    def _expire(self, index: int) -> None:
+        entries = self._entries
+        while entries:
+            oldest_index = next(iter(entries.values()))[0]
+            if oldest_index >= index - 1 and len(entries) <= self.max_keys:
+                break
+            entries.popitem(last=False)
+
+
+class RateLimiter:
+    """
+    Límites de frecuencia por IP del cliente y por destinatario, por minuto y por hora.
+
+    Un evento se registra solo si ninguna de las ventanas de su alcance lo
+    rechaza, de modo que los requests rechazados no consumen cupo.
+    """
+
+    def __init__(self, per_ip: Sequence[tuple[int, float]], per_recipient: Sequence[tuple[int, float]],
+                 max_keys: int = 100_000):
+        self._counters = {
+            "ip": [SlidingWindowCounter(limit, window, max_keys) for limit, window in per_ip if limit > 0],
+            "recipient": [SlidingWindowCounter(limit, window, max_keys) for limit, window in per_recipient if limit > 0],
+        }
+        self._lock = threading.Lock()
+
+    def hit(self, scope: str, key: str) -> float:
+        """
+        Registra un evento de `key` en las ventanas de `scope` (`ip` o `recipient`).
+
+        Returns:
+            float: 0 si se admitió, o los segundos a esperar si alguna ventana lo rechaza.
+        """
+        now = time.monotonic()
+        with self._lock:
+            counters = self._counters[scope]
+            for counter in counters:
+                wait = counter.wait(key, now)
+                if wait > 0:
+                    rate_limited_total.inc(scope, f"{counter.window:g}s")
+                    return wait
+            for counter in counters:
+                counter.add(key, now)
+        return 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                scope: [{"limit": c.limit, "window": c.window, "keys": len(c)} for c in counters]
+                for scope, counters in self._counters.items()
+            }
+
+
+rate_limiter = RateLimiter(
+    per_ip=[(settings.MAX_REQUESTS_PER_MINUTE, 60), (settings.MAX_REQUESTS_PER_HOUR, 3600)],
+    per_recipient=[(settings.MAX_EMAILS_PER_RECIPIENT_PER_MINUTE, 60),
+                   (settings.MAX_EMAILS_PER_RECIPIENT_PER_HOUR, 3600)],
+    max_keys=settings.RATE_LIMIT_MAX_KEYS,
+)
+
+
+def _retry_after(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
+
+
+def recipient_wait(email: str) -> float:
+    """Registra un envío a `email`; devuelve los segundos a esperar si supera su límite (0 si no)."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return 0.0
+    return rate_limiter.hit("recipient", email.strip().lower())
+
+
+def enforce_recipient_limit(email: str) -> None:
+    """
+    Aplica el límite por destinatario antes de renderizar o enviar.
+
+    Raises:
+        HTTPException: `429` con `Retry-After` si el destinatario superó su límite.
+    """
+    wait = recipient_wait(email)
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Límite de envíos al destinatario excedido",
+            headers={"Retry-After": _retry_after(wait)},
+        )
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI con el límite por IP del cliente; responde `429` con `Retry-After`.
+
+    Se ejecuta antes de leer el cuerpo del request, por lo que un cliente
+    que excede su límite no llega a validar, renderizar ni tocar SMTP. Con
+    `RATE_LIMIT_TRUST_FORWARDED` la IP se toma del primer valor de
+    `X-Forwarded-For` (solo detrás de un proxy de confianza).
+
+    `/email/otp/verify` queda fuera del límite por IP: la llaman unos pocos
+    backends con mucho volumen y cada código ya se bloquea tras
+    `OTP_MAX_ATTEMPTS` intentos fallidos.
+    """
+
+    def __init__(self, app: ASGIApp, limiter: RateLimiter = rate_limiter,
+                 exclude: Sequence[str] = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json",
+                                           "/email/otp/verify")):
+        self.app = app
+        self.limiter = limiter
+        self.exclude = tuple(exclude)
+
+    @staticmethod
+    def client_ip(scope: Scope) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED:
+            for key, value in scope["headers"]:
+                if key == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "-"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED
+                or scope["path"].startswith(self.exclude)):
+            await self.app(scope, receive, send)
+            return
+
+        wait = self.limiter.hit("ip", self.client_ip(scope))
+        if wait <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        logger.debug("Request rechazado por límite de frecuencia", path=scope["path"], retry_after=wait)
+        body = json.dumps({"detail": "Límite de requests excedido"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", _retry_after(wait).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
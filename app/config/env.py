@@ -25,6 +25,55 @@ class Settings(BaseSettings):
     SMTP_FROM_EMAIL: str
     SMTP_FROM_NAME: str = "SmtpMailer API"
     
+    # === MODO DE ENTREGA ===
+    # "direct": el request espera la conversación SMTP | "queued": spool durable + 202 Accepted
+    DELIVERY_MODE: str = "direct"
+    SPOOL_PATH: str = "data/spool.sqlite3"       # Archivo SQLite (WAL) del spool
+    SPOOL_WORKERS: int = 4                       # Workers que vacían el spool
+    SPOOL_MAX_ATTEMPTS: int = 5                  # Intentos antes de marcar el mensaje como fallido
+    SPOOL_RETRY_DELAY: int = 30                  # Segundos base entre reintentos (exponencial)
+    SPOOL_POLL_INTERVAL: float = 1.0             # Segundos entre consultas al spool vacío
+    SPOOL_DRAIN_TIMEOUT: int = 30                # Segundos para drenar el spool al apagar
+    SPOOL_SUPERSEDE_OTP: bool = True             # Un OTP nuevo reemplaza al pendiente del mismo destinatario
+    SPOOL_RETENTION_SECONDS: int = 86400         # Antigüedad tras la que se borran los mensajes terminados (0 = conservar)
+
+    # === ARRANQUE Y APAGADO ===
+    STARTUP_RELAY_PROBE: bool = True             # Sondear los relays (conexión, EHLO y AUTH) antes de reportar listo
+    STARTUP_PROBE_TIMEOUT: float = 10.0          # Segundos máximos de la verificación inicial
+    SHUTDOWN_DRAIN_TIMEOUT: int = 30             # Segundos para terminar los requests en curso al apagar
+
+    # === SONDEO DE RELAYS (READINESS) ===
+    # Conexión nueva + EHLO (+ AUTH) en segundo plano; /health/ready solo lee el último resultado
+    RELAY_PROBE_INTERVAL: int = 30               # Segundos entre sondeos (0 = solo el sondeo del arranque)
+    RELAY_PROBE_TTL: int = 90                    # Antigüedad máxima del resultado antes de reportar no listo
+    RELAY_PROBE_TIMEOUT: float = 10.0            # Segundos máximos por relay
+    RELAY_PROBE_AUTH: bool = True                # Incluir AUTH (detecta credenciales revocadas)
+
+    # === ENVÍO POR LOTES (WAITLIST) ===
+    WAITLIST_BATCH_CONCURRENCY: int = 4          # Envíos simultáneos por lote (sesiones SMTP reutilizadas)
+
+    # === REGISTRO DE PLANTILLAS ===
+    TEMPLATE_CACHE_DIR: str = "data/template_cache"  # Bytecode compilado de Jinja2 ("" desactiva)
+    TEMPLATE_AUTO_RELOAD: bool = False           # Verificar cambios en disco en cada render (solo desarrollo)
+    TEMPLATE_USE_BUILD: bool = True              # Cargar las plantillas optimizadas de app/templates/build si están al día
+
+    # === ADMINISTRACIÓN ===
+    ADMIN_TOKEN: Optional[str] = None            # Token del header X-Admin-Token; sin token, /admin deshabilitado
+
+    # === LOGS ===
+    LOG_LEVEL: str = "INFO"                      # Nivel del logger `app`
+    LOG_LEVELS: str = ""                         # Niveles por módulo: "app.smtp=DEBUG,app.rendering=WARNING"
+    LOG_FORMAT: str = "json"                     # "json" (una línea por registro) | "text" (desarrollo)
+    LOG_SEND_SAMPLE_RATE: float = 1.0            # Fracción de logs INFO por envío que se conservan
+    LOG_REDACT_FIELDS: str = "otp_code,code,password,token,authorization,redirect_url"  # Campos ocultos
+    LOG_MASK_EMAILS: bool = True                 # Enmascarar direcciones de email (u***@dominio.com)
+    LOG_QUEUE_SIZE: int = 10000                  # Registros en cola antes de descartar (nunca bloquea)
+
+    # === TRAZAS Y ENVÍOS LENTOS ===
+    TRACE_SAMPLE_RATE: float = 0.0               # Fracción de trazas nuevas cuyos spans se registran (las entrantes respetan `traceparent`)
+    SMTP_SLOW_SEND_THRESHOLD_MS: int = 2000      # Envíos más lentos que esto guardan su transcripción SMTP
+    SMTP_SLOW_TRANSCRIPTS: int = 50              # Transcripciones lentas en memoria (0 = no capturar)
+
     # === CONFIGURACIÓN DE CORS ===
     ALLOWED_ORIGINS: str = "*"
     ALLOWED_METHODS: str = "GET,POST,PUT,DELETE,OPTIONS"
@@ -32,7 +81,77 @@ class Settings(BaseSettings):
     
     # === CONFIGURACIÓN DE TIMEOUTS ===
     SMTP_TIMEOUT: int = 30
-    
+
+    # === TRANSPORTE SMTP ===
+    # "async": cliente asyncio nativo | "sync": smtplib bloqueante en threadpool
+    SMTP_TRANSPORT: str = "async"
+
+    # === CAPACIDAD Y CONTROL DE ADMISIÓN ===
+    # Con la cola llena se responde 503 con Retry-After en lugar de acumular latencia
+    THREADPOOL_SIZE: int = 40                    # Hilos del threadpool de AnyIO (transporte sync)
+    MAX_IN_FLIGHT_REQUESTS: int = 0              # Requests procesándose a la vez (0 = sin límite)
+    ADMISSION_QUEUE_DEPTH: int = 100             # Requests (o tareas del threadpool) en espera antes de rechazar
+    ADMISSION_QUEUE_TIMEOUT: float = 10.0        # Segundos máximos de espera en la cola antes de rechazar
+    ADMISSION_RETRY_AFTER: int = 1               # Segundos sugeridos en el header Retry-After
+
+    # === RATE LIMITING ===
+    # Ventanas deslizantes en memoria; los rechazos (429) ocurren antes de renderizar o enviar
+    RATE_LIMIT_ENABLED: bool = True              # Activar rate limiting
+    MAX_REQUESTS_PER_MINUTE: int = 100           # Límite por minuto por IP (0 = sin límite)
+    MAX_REQUESTS_PER_HOUR: int = 1000            # Límite por hora por IP (0 = sin límite)
+    MAX_EMAILS_PER_RECIPIENT_PER_MINUTE: int = 5  # Envíos por minuto a una misma dirección
+    MAX_EMAILS_PER_RECIPIENT_PER_HOUR: int = 30  # Envíos por hora a una misma dirección
+    RATE_LIMIT_MAX_KEYS: int = 100000            # Claves (IPs o destinatarios) en memoria por ventana
+    RATE_LIMIT_TRUST_FORWARDED: bool = False     # Tomar la IP de X-Forwarded-For (solo detrás de un proxy)
+
+    # === IDEMPOTENCIA ===
+    # Requests repetidos (header Idempotency-Key o mismo destinatario y contenido) no se reenvían
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_SECONDS: int = 600           # Vigencia de las respuestas con Idempotency-Key
+    IDEMPOTENCY_DERIVED_TTL_SECONDS: int = 60    # Vigencia sin header, por destinatario y contenido (0 = no derivar)
+    IDEMPOTENCY_MAX_KEYS: int = 10000            # Respuestas guardadas en memoria
+
+    # === CÓDIGOS OTP (EMISIÓN Y VERIFICACIÓN) ===
+    # /email/otp/issue genera el código y /email/otp/verify lo valida; solo se guarda su HMAC
+    OTP_STORE_BACKEND: str = "memory"            # "memory" (un proceso) | "sqlite" (varios workers en un host)
+    OTP_STORE_PATH: str = "data/otp.sqlite3"     # Archivo del backend sqlite
+    OTP_STORE_SHARDS: int = 16                   # Particiones del store en memoria (un lock por partición)
+    OTP_CODE_LENGTH: int = 6                     # Dígitos del código generado (4-8)
+    OTP_DEFAULT_EXPIRY_MINUTES: int = 10         # Vigencia si el request no indica expiry_minutes
+    OTP_MAX_ATTEMPTS: int = 5                    # Intentos fallidos antes de bloquear el código
+    OTP_HASH_SECRET: str = ""                    # Clave del HMAC ("" = aleatoria; en sqlite se guarda en el archivo)
+
+    # === CONFIGURACIÓN DEL POOL DE CONEXIONES SMTP ===
+    # Sesiones SMTP ya autenticadas y reutilizadas entre requests
+    SMTP_POOL_MIN_SIZE: int = 0                  # Sesiones abiertas al iniciar (warm-up)
+    SMTP_POOL_MAX_SIZE: int = 4                  # Máximo de sesiones simultáneas
+    SMTP_POOL_IDLE_TIMEOUT: int = 60             # Segundos antes de descartar una sesión ociosa
+    SMTP_POOL_NOOP_INTERVAL: int = 15            # Segundos de inactividad tras los que se verifica con NOOP
+    SMTP_POOL_MAX_MESSAGES_PER_SESSION: int = 100  # Mensajes por sesión antes de reciclarla
+    SMTP_POOL_ACQUIRE_TIMEOUT: int = 30          # Segundos de espera por una sesión libre
+    SMTP_PIPELINE_MAX_MESSAGES: int = 10         # Mensajes por sesión en envíos agrupados (PIPELINING)
+    SMTP_TLS_SESSION_RESUMPTION: bool = True     # Reanudar sesiones TLS al reconectar al mismo relay
+
+    # === RELAYS SMTP ===
+    # Lista JSON de relays: [{"name", "host", "port", "username", "password", "use_tls",
+    # "use_ssl", "from_email", "weight", "daily_quota"}]. Vacío: un único relay con SMTP_*
+    SMTP_RELAYS: str = ""
+    SMTP_RELAY_COOLDOWN: int = 30                # Segundos con el circuito abierto antes de probar de nuevo
+    SMTP_RELAY_HEALTH_INTERVAL: int = 60         # Segundos entre verificaciones de salud (0 desactiva)
+
+    # === REINTENTOS Y CIRCUIT BREAKER ===
+    # Errores transitorios (4xx, conexión) se reintentan con espera exponencial y jitter
+    SMTP_RETRY_MAX_ATTEMPTS: int = 3             # Intentos totales por mensaje (incluye failover)
+    SMTP_RETRY_BASE_DELAY: float = 0.5           # Segundos base entre rondas de reintento
+    SMTP_RETRY_MAX_DELAY: float = 5.0            # Espera máxima entre reintentos
+    SMTP_BREAKER_FAILURE_THRESHOLD: int = 3      # Fallos consecutivos que abren el circuito de un relay
+
+    # === SCHEDULER DE ENVÍO (PRESUPUESTO POR RELAY) ===
+    # El límite por minuto de cada relay va en "max_per_minute" y el diario en "daily_quota"
+    SMTP_OTP_RESERVE_RATIO: float = 0.2          # Fracción del presupuesto reservada a OTP
+    SCHEDULER_OTP_MAX_WAIT: float = 10.0         # Segundos que un OTP espera presupuesto antes de fallar
+    SCHEDULER_BULK_MAX_WAIT: float = 2.0         # Segundos que un envío masivo espera antes de diferirse
+
     # ========================================
     # VARIABLES NO UTILIZADAS (COMENTADAS)
     # ========================================
@@ -41,15 +160,11 @@ class Settings(BaseSettings):
     # Para usar en uvicorn.run() o configuración de servidor
     # API_HOST: str = "127.0.0.1"  # Host del servidor
     # API_PORT: int = 8000         # Puerto del servidor
-    # LOG_LEVEL: str = "INFO"      # Nivel de logging (DEBUG, INFO, WARN, ERROR)
     
     # === CONFIGURACIÓN DE SEGURIDAD ===
-    # Para implementar autenticación y rate limiting
+    # Para implementar autenticación
     # API_KEY_ENABLED: bool = False              # Activar autenticación por API key
     # API_KEY: Optional[str] = None              # API key para endpoints protegidos
-    # RATE_LIMIT_ENABLED: bool = True           # Activar rate limiting
-    # MAX_REQUESTS_PER_MINUTE: int = 100        # Límite por minuto por IP
-    # MAX_REQUESTS_PER_HOUR: int = 1000         # Límite por hora por IP
     
     # === CONFIGURACIÓN DE PLANTILLAS ===
     # Para personalizar templates HTML de emails
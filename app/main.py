@@ -1,8 +1,184 @@
+import asyncio
+import signal
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.admission import (
+    AdmissionMiddleware,
+    RateLimitMiddleware,
+    admission_controller,
+    configure_threadpool,
+    idempotency_cache,
+    rate_limiter,
+    threadpool_stats,
+)
 from app.config import settings
+from app.observability import (
+    CONTENT_TYPE,
+    GaugeCollector,
+    MetricsMiddleware,
+    TracingMiddleware,
+    configure_logging,
+    get_logger,
+    logging_stats,
+    metrics_registry,
+    shutdown_logging,
+)
+from app.rendering import template_registry
+from app.smtp import relay_prober, relay_router, active_pool_stats
+from app.smtp.transport import uses_async_transport
+from app.smtp.spool import DELIVERY_QUEUED, outbound_spool, spool_workers
+from app.otp.controller import EmailOTPApplication
 from app.otp.router import router_otp, TAG_OTP
+from app.otp.store import otp_store, store_stats
+from app.waitlist.controller import EmailWaitlistApplication
 from app.waitlist.router import router_waitlist, TAG_WAITLIST
+from app.admin import router_admin, TAG_ADMIN
+
+logger = get_logger(__name__)
+
+
+def _pool_samples():
+    """Sesiones SMTP por relay del transporte activo: abiertas, ociosas, en uso y máximo."""
+    for relay in relay_router.stats(uses_async_transport()):
+        pool = relay["pool"]
+        for state in ("size", "idle", "in_use", "max_size"):
+            yield "smtp_pool_sessions", {"relay": relay["name"], "state": state}, pool[state]
+
+
+# Conteo del spool por estado, leído fuera del event loop en cada consulta a `/metrics`
+_spool_counts: dict[str, int] = {}
+
+
+def _spool_samples():
+    """Mensajes del spool por estado (solo con `DELIVERY_MODE=queued`)."""
+    if settings.DELIVERY_MODE != DELIVERY_QUEUED:
+        return
+    for status, count in _spool_counts.items():
+        yield "spool_messages", {"status": status}, count
+
+
+def _threadpool_samples():
+    """Hilos del threadpool en uso, totales y tareas esperando un hilo."""
+    for state, value in threadpool_stats().items():
+        yield "threadpool_tokens", {"state": state}, value
+
+
+def _admission_samples():
+    """Requests en curso y en cola del control de admisión."""
+    stats = admission_controller.stats()
+    for state in ("active", "waiting"):
+        yield "admission_requests", {"state": state}, stats[state]
+
+
+def _probe_samples():
+    """Resultado del último sondeo por relay (1 = respondió)."""
+    for result in relay_prober.snapshot()["relays"]:
+        yield "smtp_relay_probe_up", {"relay": result["relay"]}, int(result["ok"])
+
+
+def _probe_age_samples():
+    """Segundos desde el último sondeo de relays (sin muestra si aún no hubo sondeo)."""
+    age = relay_prober.snapshot()["age_seconds"]
+    if age is not None:
+        yield "smtp_relay_probe_age_seconds", {}, age
+
+
+def _scheduler_samples():
+    """Envíos esperando presupuesto por prioridad."""
+    for priority, waiting in relay_router.scheduler_stats()["waiting"].items():
+        yield "send_scheduler_waiting", {"priority": priority}, waiting
+
+
+metrics_registry.register(GaugeCollector("smtp_pool_sessions", "Sesiones SMTP del pool por relay y estado.", _pool_samples))
+metrics_registry.register(GaugeCollector("spool_messages", "Mensajes del spool de salida por estado.", _spool_samples))
+metrics_registry.register(GaugeCollector("threadpool_tokens", "Threadpool de AnyIO: total, en uso y en espera.", _threadpool_samples))
+metrics_registry.register(GaugeCollector("admission_requests", "Requests en curso y en cola de admisión.", _admission_samples))
+metrics_registry.register(GaugeCollector("smtp_relay_probe_up", "Último sondeo de cada relay (1 = respondió).", _probe_samples))
+metrics_registry.register(GaugeCollector("smtp_relay_probe_age_seconds", "Segundos desde el último sondeo de relays.", _probe_age_samples))
+metrics_registry.register(GaugeCollector("send_scheduler_waiting", "Envíos esperando presupuesto por prioridad.", _scheduler_samples))
+metrics_registry.register(GaugeCollector(
+    "log_queue_depth", "Registros de log pendientes de escribir.",
+    lambda: [("log_queue_depth", {}, logging_stats()["queue_depth"])],
+))
+
+
+def _install_reload_signal() -> bool:
+    """Recompila las plantillas al recibir SIGHUP (solo Unix y en el hilo principal)."""
+    if not hasattr(signal, "SIGHUP"):
+        return False
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(
+            signal.SIGHUP,
+            lambda: loop.run_in_executor(None, template_registry.reload)
+        )
+    except (NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
+
+
+async def _probe_relays() -> None:
+    """Primer sondeo de los relays (conexión, EHLO y AUTH) dentro de `STARTUP_PROBE_TIMEOUT`."""
+    try:
+        await asyncio.wait_for(relay_prober.run_once(), settings.STARTUP_PROBE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Verificación inicial de relays incompleta", timeout=settings.STARTUP_PROBE_TIMEOUT)
+    healthy = [result["relay"] for result in relay_prober.snapshot()["relays"] if result["ok"]]
+    if healthy:
+        logger.info("Relays SMTP verificados", healthy=healthy, total=len(relay_router.relays))
+    else:
+        logger.error("Ningún relay SMTP respondió a la verificación inicial", total=len(relay_router.relays))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicia el pipeline de logs, ajusta la capacidad del threadpool, compila las plantillas de email, crea
+    los controladores, abre las sesiones SMTP mínimas de cada relay y los sondea, e inicia el sondeo y la
+    verificación de salud periódicos y los workers del spool; solo entonces `/health/ready` reporta listo.
+    
+    Al apagar, deja de admitir requests (503 y `/health/ready` en 503), espera a los
+    envíos en curso dentro de `SHUTDOWN_DRAIN_TIMEOUT`, drena el spool dentro de
+    `SPOOL_DRAIN_TIMEOUT` y cierra las sesiones SMTP con QUIT; los logs pendientes
+    se escriben al final.
+    """
+    app.state.ready = False
+    configure_logging()
+    configure_threadpool(settings.THREADPOOL_SIZE)
+    template_registry.load()
+    # Con las plantillas compiladas; los routers los reciben por dependencia
+    app.state.otp_controller = EmailOTPApplication()
+    app.state.waitlist_controller = EmailWaitlistApplication()
+    reload_signal = _install_reload_signal()
+    use_async = uses_async_transport()
+    if settings.SMTP_POOL_MIN_SIZE > 0:
+        opened = await relay_router.warm_up(use_async)
+        logger.info("Relays SMTP precalentados", transport=settings.SMTP_TRANSPORT, sessions=opened)
+    if settings.STARTUP_RELAY_PROBE:
+        await _probe_relays()
+    relay_prober.start()
+    relay_router.start_health_checks(settings.SMTP_RELAY_HEALTH_INTERVAL, use_async)
+    if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+        spool_workers.start()
+    app.state.ready = True
+    logger.info("Servicio listo", transport=settings.SMTP_TRANSPORT, delivery_mode=settings.DELIVERY_MODE)
+    yield
+    app.state.ready = False
+    admission_controller.start_draining()
+    if not await admission_controller.drain(settings.SHUTDOWN_DRAIN_TIMEOUT):
+        logger.warning("Plazo de drenado de requests vencido", in_flight=admission_controller.active)
+    if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+        await spool_workers.stop(drain_timeout=settings.SPOOL_DRAIN_TIMEOUT)
+        outbound_spool.close()
+    otp_store.close()
+    await relay_prober.stop()
+    await relay_router.close()
+    if reload_signal:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    shutdown_logging()
+
 
 # Configuración de la aplicación FastAPI
 app = FastAPI(
@@ -31,7 +207,8 @@ API RESTful stateless para envío de correos electrónicos con Gmail SMTP.
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json",
-    openapi_tags=[TAG_OTP, TAG_WAITLIST]
+    openapi_tags=[TAG_OTP, TAG_WAITLIST, TAG_ADMIN],
+    lifespan=lifespan
 )
 
 # Configuración de CORS
@@ -43,6 +220,18 @@ app.add_middleware(
     allow_headers=settings.ALLOWED_HEADERS.split(","),
 )
 
+# Control de admisión: 503 con Retry-After cuando la cola de requests o del threadpool está llena
+app.add_middleware(AdmissionMiddleware)
+
+# Límite por IP del cliente (429), antes del control de admisión y de leer el cuerpo
+app.add_middleware(RateLimitMiddleware)
+
+# Métricas por request (incluidos los rechazos); la ruta queda disponible para las métricas del envío
+app.add_middleware(MetricsMiddleware)
+
+# Span raíz por request, continuando el `traceparent` entrante
+app.add_middleware(TracingMiddleware)
+
 @app.get("/")
 async def root():
     """Endpoint raíz que retorna información básica de la API."""
@@ -62,9 +251,66 @@ async def health_check():
         "service": "SmtpMailer FastAPI",
         "version": "1.0.0",
         "environment": settings.ENVIRONMENT,
-        "smtp_configured": bool(settings.SMTP_HOST and settings.SMTP_USERNAME and settings.SMTP_PASSWORD)
+        "smtp_configured": bool(settings.SMTP_HOST and settings.SMTP_USERNAME and settings.SMTP_PASSWORD),
+        "smtp": active_pool_stats(),
+        "delivery_mode": settings.DELIVERY_MODE,
+        "spool": {
+            "depth": await asyncio.to_thread(outbound_spool.depth),
+            **spool_workers.stats()
+        } if settings.DELIVERY_MODE == DELIVERY_QUEUED else None,
+        "admission": {**admission_controller.stats(), "threadpool": threadpool_stats()},
+        "rate_limit": rate_limiter.stats() if settings.RATE_LIMIT_ENABLED else None,
+        "idempotency": idempotency_cache.stats() if settings.IDEMPOTENCY_ENABLED else None,
+        "relay_probe": {**relay_prober.stats(), "healthy": relay_prober.snapshot()["healthy"]},
+        "otp_store": await store_stats(),
+        "logging": logging_stats()
     }
 
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness profundo a partir del último sondeo de relays en caché.
+
+    Listo si el arranque terminó, no hay apagado en curso y, según el último
+    sondeo vigente, al menos un relay completó conexión, EHLO y AUTH. En modo
+    `queued` no se exige relay disponible: el spool absorbe la caída. Nunca
+    abre conexiones SMTP, de modo que el balanceador puede consultarlo con
+    cualquier frecuencia.
+    """
+    probe = relay_prober.snapshot()
+    if probe["checked_at"] is None:
+        # Sin resultado solo se reporta listo si ningún sondeo está configurado
+        relays_ok = not settings.STARTUP_RELAY_PROBE and relay_prober.interval <= 0
+    else:
+        relays_ok = not probe["stale"] and probe["healthy"] > 0
+    ready = getattr(app.state, "ready", False) and (relays_ok or settings.DELIVERY_MODE == DELIVERY_QUEUED)
+    return JSONResponse(
+        {
+            "ready": ready,
+            "relays": probe,
+            "pools": [
+                {"relay": relay["name"], "available": relay["available"], **relay["pool"]}
+                for relay in relay_router.stats(uses_async_transport())
+            ],
+            "queue": {
+                "spool_depth": await asyncio.to_thread(outbound_spool.depth)
+                if settings.DELIVERY_MODE == DELIVERY_QUEUED else None,
+                "admission": admission_controller.stats(),
+                "scheduler_waiting": relay_router.scheduler_stats()["waiting"],
+            },
+        },
+        status_code=200 if ready else 503,
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de texto de Prometheus."""
+    if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+        # SQLite bloquea: el conteo se lee en un hilo antes de exportar
+        _spool_counts.update(await asyncio.to_thread(outbound_spool.stats))
+    return PlainTextResponse(metrics_registry.render(), media_type=CONTENT_TYPE)
+
 
 app.include_router(router_otp)
-app.include_router(router_waitlist)
\ No newline at end of file
+app.include_router(router_waitlist)
+app.include_router(router_admin)
\ No newline at end of file
@@ -0,0 +1,48 @@
+"""
+Módulo de observabilidad para SmtpMailer FastAPI.
+
+Logs estructurados en JSON: los módulos registran con `get_logger(__name__)`
+y campos por nombre; los registros se encolan y un hilo en segundo plano
+los formatea, oculta los campos sensibles y los escribe a stdout, de modo
+que los requests nunca esperan por la salida estándar.
+
+Métricas en formato de texto de Prometheus (`/metrics`): requests por ruta
+y código, histogramas de latencia por fase del envío (render, MIME,
+connect, TLS, AUTH, DATA) etiquetados con la ruta y el relay, y gauges de
+pools, spool y scheduler calculados solo al exportar.
+
+Trazas: cada request abre un span raíz que continúa el `traceparent`
+entrante y cada fase del envío queda como span hijo; los envíos que
+superan `SMTP_SLOW_SEND_THRESHOLD_MS` guardan su transcripción SMTP en un
+ring buffer consultable desde `/admin/smtp/slow-transcripts`.
+"""
+
+from app.observability.logs import configure_logging, get_logger, logging_stats, shutdown_logging
+from app.observability.metrics import (
+    CONTENT_TYPE,
+    GaugeCollector,
+    MetricsMiddleware,
+    current_route,
+    metrics_registry,
+    observe_phase,
+)
+from app.observability.tracing import TracingMiddleware, current_span, start_span
+from app.observability.transcripts import record_transcript, slow_transcripts
+
+__all__ = [
+    "configure_logging",
+    "get_logger",
+    "logging_stats",
+    "shutdown_logging",
+    "CONTENT_TYPE",
+    "GaugeCollector",
+    "MetricsMiddleware",
+    "current_route",
+    "metrics_registry",
+    "observe_phase",
+    "TracingMiddleware",
+    "current_span",
+    "start_span",
+    "record_transcript",
+    "slow_transcripts",
+]
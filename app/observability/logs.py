@@ -0,0 +1,233 @@
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+from app.config import settings
+
+
+# Logger raíz de la aplicación; los módulos usan `get_logger(__name__)`
+ROOT_LOGGER = "app"
+
+LOG_FORMAT_JSON = "json"
+LOG_FORMAT_TEXT = "text"
+
+REDACTED = "[REDACTED]"
+
+# Campos con direcciones de email: se conserva solo la inicial y el dominio
+EMAIL_FIELDS = frozenset({"email", "to", "recipient", "recipients", "refused"})
+
+# Argumentos propios de `logging`; el resto de kwargs son campos estructurados
+_LOGGING_KWARGS = frozenset({"exc_info", "stack_info", "stacklevel", "extra"})
+
+
+def mask_email(address: str) -> str:
+    """`usuario@dominio.com` → `u***@dominio.com`."""
+    local, at, domain = str(address).partition("@")
+    if not at:
+        return REDACTED
+    return f"{local[:1]}***@{domain}"
+
+
+def redact_fields(fields: dict[str, Any], redact_keys: frozenset, mask_emails: bool = True) -> dict[str, Any]:
+    """
+    Copia los campos de un log ocultando los sensibles.
+
+    Args:
+        redact_keys (frozenset): **Claves** (en minúscula) cuyo valor se reemplaza por `[REDACTED]`.
+        mask_emails (bool): **Enmascarar** las direcciones de los campos de `EMAIL_FIELDS`.
+    """
+    clean = {}
+    for key, value in fields.items():
+        lowered = key.lower()
+        if lowered in redact_keys:
+            clean[key] = REDACTED
+        elif isinstance(value, dict):
+            clean[key] = redact_fields(value, redact_keys, mask_emails)
+        elif mask_emails and lowered in EMAIL_FIELDS and value is not None:
+            clean[key] = [mask_email(v) for v in value] if isinstance(value, (list, tuple)) else mask_email(value)
+        else:
+            clean[key] = value
+    return clean
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro: `ts`, `level`, `logger`, `msg` y los campos estructurados."""
+
+    def __init__(self, redact_keys: frozenset = frozenset(), mask_emails: bool = True):
+        super().__init__()
+        self.redact_keys = frozenset(key.lower() for key in redact_keys)
+        self.mask_emails = mask_emails
+
+    def _entry(self, record: logging.LogRecord) -> dict[str, Any]:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            for key, value in redact_fields(fields, self.redact_keys, self.mask_emails).items():
+                entry.setdefault(key, value)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return entry
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(self._entry(record), ensure_ascii=False, default=str)
+
+
+class TextFormatter(JsonFormatter):
+    """Formato legible para desarrollo: `ts [LEVEL] logger: msg clave=valor ...`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = self._entry(record)
+        head = f"{entry.pop('ts')} [{entry.pop('level')}] {entry.pop('logger')}: {entry.pop('msg')}"
+        exc = entry.pop("exc", None)
+        line = " ".join([head, *(f"{key}={value}" for key, value in entry.items())])
+        return f"{line}\n{exc}" if exc else line
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Handler que solo encola el registro; el formato y la escritura ocurren en el listener.
+
+    A diferencia de `QueueHandler`, no formatea el mensaje en el hilo que
+    registra (la cola es en memoria, no hace falta serializar el registro)
+    y, si la cola está llena, descarta el registro en lugar de bloquear.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class EventLogger(logging.LoggerAdapter):
+    """
+    Logger con campos estructurados: `logger.info("Correo enviado", email=..., relay=...)`.
+
+    Con `sampled=True`, los registros INFO o de menor nivel se conservan con
+    probabilidad `LOG_SEND_SAMPLE_RATE`; la decisión se toma antes de crear
+    el registro. WARNING y ERROR nunca se muestrean.
+    """
+
+    sampled_out = 0
+
+    def __init__(self, logger: logging.Logger, sampled: bool = False):
+        super().__init__(logger, {})
+        self.sampled = sampled
+
+    def log(self, level: int, msg: object, *args, **kwargs) -> None:
+        if not self.isEnabledFor(level):
+            return
+        if self.sampled and level <= logging.INFO and random.random() >= settings.LOG_SEND_SAMPLE_RATE:
+            EventLogger.sampled_out += 1
+            return
+        msg, kwargs = self.process(msg, kwargs)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def process(self, msg: object, kwargs: dict) -> tuple[object, dict]:
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+        if fields:
+            kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+
+def get_logger(name: str, sampled: bool = False) -> EventLogger:
+    """
+    Logger estructurado para un módulo.
+
+    Args:
+        name (str): **Nombre** del logger; con `__name__` queda bajo el logger `app`.
+        sampled (bool): **Muestrear** los registros INFO (logs por envío en el hot path).
+    """
+    return EventLogger(logging.getLogger(name), sampled=sampled)
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """`"app.smtp=DEBUG,app.rendering=WARNING"` → `{"app.smtp": "DEBUG", ...}`."""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_lock = threading.Lock()
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging() -> None:
+    """
+    Instala el pipeline de logs: `QueueHandler` en el logger `app` y un listener en segundo plano.
+
+    Los hilos que registran solo encolan; el formato JSON, la redacción de
+    campos y la escritura a stdout ocurren en el hilo del listener. Es
+    idempotente.
+    """
+    global _handler, _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(sys.stdout)
+        formatter_class = TextFormatter if settings.LOG_FORMAT == LOG_FORMAT_TEXT else JsonFormatter
+        redact_keys = frozenset(key.strip() for key in settings.LOG_REDACT_FIELDS.split(",") if key.strip())
+        output.setFormatter(formatter_class(redact_keys, settings.LOG_MASK_EMAILS))
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=max(1, settings.LOG_QUEUE_SIZE)))
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers = [_handler]
+        root.setLevel(settings.LOG_LEVEL.upper())
+        root.propagate = False
+        for name, level in parse_levels(settings.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Vacía la cola de logs, detiene el listener y devuelve el logger `app` a su estado inicial."""
+    global _handler, _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        root = logging.getLogger(ROOT_LOGGER)
+        root.removeHandler(_handler)
+        root.propagate = True
+        _handler = None
+        _listener = None
+
+
+def logging_stats() -> dict:
+    """Métricas del pipeline: registros encolados, descartados por cola llena y muestreados."""
+    handler = _handler
+    return {
+        "level": settings.LOG_LEVEL.upper(),
+        "format": settings.LOG_FORMAT,
+        "queue_depth": handler.queue.qsize() if handler else 0,
+        "enqueued": handler.enqueued if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "sampled_out": EventLogger.sampled_out,
+    }
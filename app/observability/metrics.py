@@ -0,0 +1,258 @@
+import bisect
+import threading
+import time
+from typing import Callable, Iterable, Sequence
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.observability.tracing import current_route, record_span
+from app.observability.transcripts import transcript_event
+
+
+# Buckets de latencia en segundos: de render en memoria (<1 ms) a DATA sobre enlaces lentos
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Muestras de un colector: (nombre, etiquetas, valor)
+Sample = tuple[str, dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """Base de las métricas: nombre, ayuda y nombres de etiquetas (en orden posicional)."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Contador monótono por combinación de etiquetas."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram(Metric):
+    """
+    Histograma con buckets fijos por combinación de etiquetas.
+
+    `observe()` solo hace una búsqueda binaria y suma bajo un lock; los
+    buckets acumulados se calculan al exportar.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: [conteo por bucket (+Inf al final), suma, total]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            snapshot = sorted((labels, list(series[0]), series[1], series[2])
+                              for labels, series in self._series.items())
+        lines = self._header()
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class GaugeCollector:
+    """
+    Gauges calculados al exportar a partir del estado actual (pools, spool, scheduler).
+
+    Evita actualizar un gauge en cada operación: la función se llama solo
+    cuando se consulta `/metrics`.
+    """
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Iterable[Sample]]):
+        self.name = name
+        self.help = help
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for name, labels, value in self.collect():
+            lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas en formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._metrics: list = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Métrica duplicada: {metric.name}")
+            self._metrics.append(metric)
+        return metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics = [metric for metric in self._metrics if metric.name != name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # Un colector con error no debe romper el resto de la exportación
+                lines.append(f"# {metric.name} no disponible: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+# Registro global y métricas de la aplicación
+metrics_registry = MetricsRegistry()
+
+http_requests_total = metrics_registry.register(Counter(
+    "http_requests_total", "Requests HTTP por ruta, método y código de estado.", ("route", "method", "status")
+))
+http_request_seconds = metrics_registry.register(Histogram(
+    "http_request_duration_seconds", "Duración de los requests HTTP.", ("route",)
+))
+send_phase_seconds = metrics_registry.register(Histogram(
+    "smtp_phase_duration_seconds",
+    "Duración de cada fase de un envío: render, mime, connect, tls, auth, data.",
+    ("phase", "route", "relay"),
+))
+smtp_sends_total = metrics_registry.register(Counter(
+    "smtp_sends_total",
+    "Envíos por relay y resultado (sent, 4xx, rcpt_4xx, 5xx, auth, connect).",
+    ("route", "relay", "outcome"),
+))
+
+
+def observe_phase(phase: str, started: float, relay: str = "-") -> None:
+    """
+    Registra la duración de una fase iniciada en `started` (`time.perf_counter()`).
+
+    Además del histograma, la fase queda como span hijo de la traza en curso
+    y como línea de la transcripción SMTP activa, si las hay.
+    """
+    elapsed = time.perf_counter() - started
+    send_phase_seconds.observe(elapsed, phase, current_route.get(), relay)
+    record_span(phase, started, relay=relay)
+    transcript_event(f"{phase} {elapsed * 1000:.3f}ms")
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que cuenta requests y mide su duración por ruta.
+
+    Solo usa como etiqueta las rutas registradas en la aplicación (el resto
+    cuenta como `other`) para que la cardinalidad no dependa de las URLs
+    recibidas. La ruta queda en `current_route` para las métricas del envío.
+    """
+
+    def __init__(self, app: ASGIApp, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+        self._routes: frozenset = frozenset()
+
+    def _route(self, scope: Scope) -> str:
+        if not self._routes:
+            # Las rutas de la aplicación se leen en el primer request
+            app = scope.get("app")
+            self._routes = frozenset(getattr(route, "path", "") for route in getattr(app, "routes", ()))
+        path = scope["path"]
+        return path if path in self._routes else "other"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        token = current_route.set(route)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_seconds.observe(time.perf_counter() - started, route)
+            http_requests_total.inc(route, scope["method"], str(status_code))
+            current_route.reset(token)
@@ -0,0 +1,196 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional, Sequence
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.observability.logs import get_logger
+
+
+logger = get_logger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+_HEX = frozenset("0123456789abcdef")
+
+
+def _is_hex(value: str, length: int) -> bool:
+    return len(value) == length and _HEX.issuperset(value)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple[str, str, bool]]:
+    """
+    Lee un header `traceparent` de W3C Trace Context.
+
+    Returns:
+        tuple | None: `(trace_id, parent_span_id, sampled)`, o `None` si el header falta o es inválido.
+    """
+    if not header:
+        return None
+    parts = header.strip().lower().split("-")
+    if len(parts) < 4:
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if not _is_hex(version, 2) or version == "ff" or (version == "00" and len(parts) != 4):
+        return None
+    if not _is_hex(trace_id, 32) or trace_id == _INVALID_TRACE_ID:
+        return None
+    if not _is_hex(span_id, 16) or span_id == _INVALID_SPAN_ID or not _is_hex(flags, 2):
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 0x01)
+
+
+class Span:
+    """
+    Operación medida dentro de una traza.
+
+    Attributes:
+        trace_id (str): **Traza** a la que pertenece (32 hex).
+        span_id (str): **Identificador** del span (16 hex).
+        parent_id (str): **Span padre**, o `None` en la raíz local sin traza entrante.
+        sampled (bool): **Muestreada**: los spans terminados se exportan a los logs.
+    """
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attributes",
+                 "started", "duration", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Optional[dict[str, Any]] = None, started: Optional[float] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes or {}
+        self.started = time.perf_counter() if started is None else started
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def child(self, name: str, attributes: Optional[dict[str, Any]] = None,
+              started: Optional[float] = None) -> "Span":
+        return Span(name, self.trace_id, self.span_id, self.sampled, attributes, started)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.duration = time.perf_counter() - self.started
+        if error is not None:
+            self.error = type(error).__name__
+        if self.sampled:
+            _export(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+# Ruta HTTP (o del spool) a la que pertenece el trabajo en curso; etiqueta `route` de las métricas
+current_route: ContextVar[str] = ContextVar("metrics_route", default="-")
+
+# Span en curso; los spans nuevos son hijos de este
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _export(span: Span) -> None:
+    logger.info(
+        "span",
+        trace_id=span.trace_id,
+        span_id=span.span_id,
+        parent_id=span.parent_id,
+        span=span.name,
+        duration_ms=round(span.duration * 1000, 3),
+        error=span.error,
+        **span.attributes,
+    )
+
+
+def _new_root(name: str, attributes: dict[str, Any]) -> Span:
+    sampled = settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE
+    return Span(name, os.urandom(16).hex(), None, sampled, attributes)
+
+
+@contextmanager
+def start_span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Abre un span hijo del span en curso (o la raíz de una traza nueva) mientras dura el bloque.
+
+    Sirve tanto en código síncrono como en corrutinas; el span queda en
+    `current_span` para las fases registradas dentro del bloque.
+    """
+    parent = current_span.get()
+    span = parent.child(name, attributes) if parent is not None else _new_root(name, attributes)
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.finish(e)
+        raise
+    else:
+        span.finish()
+    finally:
+        current_span.reset(token)
+
+
+def record_span(name: str, started: float, **attributes: Any) -> None:
+    """Registra como hijo del span en curso una fase ya terminada que empezó en `started`."""
+    parent = current_span.get()
+    if parent is not None:
+        parent.child(name, attributes, started).finish()
+
+
+def current_trace_id() -> Optional[str]:
+    span = current_span.get()
+    return span.trace_id if span is not None else None
+
+
+class TracingMiddleware:
+    """
+    Middleware ASGI que abre el span raíz de cada request.
+
+    Continúa la traza del header `traceparent` entrante (y su decisión de
+    muestreo) o inicia una nueva con `TRACE_SAMPLE_RATE`, y devuelve el
+    `traceparent` del span del servicio en la respuesta. El nombre del span
+    usa la ruta registrada que atendió el request, no la URL recibida.
+    """
+
+    def __init__(self, app: ASGIApp, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        header = next((value for key, value in scope["headers"] if key == b"traceparent"), None)
+        incoming = parse_traceparent(header.decode("latin-1")) if header else None
+        if incoming is not None:
+            trace_id, parent_id, sampled = incoming
+            span = Span(scope["method"], trace_id, parent_id, sampled)
+        else:
+            span = _new_root(scope["method"], {})
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.attributes["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((TRACEPARENT_HEADER.encode(), span.traceparent().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_span.set(span)
+        error: Optional[BaseException] = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            # El router deja en el scope la ruta que atendió el request
+            route = scope.get("route")
+            span.name = f"{scope['method']} {getattr(route, 'path', 'other')}"
+            span.finish(error)
+            current_span.reset(token)
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from app.config import settings
+from app.observability.logs import mask_email
+from app.observability.tracing import current_route, current_trace_id
+
+
+# Líneas máximas por transcripción: un envío normal usa menos de 20
+MAX_TRANSCRIPT_LINES = 200
+
+REDACTED = "***"
+
+
+class SMTPTranscript:
+    """
+    Conversación SMTP de un envío: comandos (`>`), respuestas (`<`) y fases (`*`).
+
+    Cada línea lleva los milisegundos desde el inicio del envío. Las
+    credenciales de AUTH nunca se guardan y el contenido de DATA solo se
+    registra como tamaño.
+    """
+
+    __slots__ = ("relay", "started", "lines", "last_code", "truncated")
+
+    def __init__(self, relay: str):
+        self.relay = relay
+        self.started = time.perf_counter()
+        self.lines: list[tuple[float, str, str]] = []
+        self.last_code = 0
+        self.truncated = 0
+
+    def _add(self, direction: str, text: str) -> None:
+        if len(self.lines) >= MAX_TRANSCRIPT_LINES:
+            self.truncated += 1
+            return
+        self.lines.append((round((time.perf_counter() - self.started) * 1000, 3), direction, text))
+
+    def command(self, line: str) -> None:
+        if line[:5].upper() == "AUTH ":
+            mechanism = line[5:].split(" ", 1)[0]
+            line = f"AUTH {mechanism} {REDACTED}"
+        elif self.last_code == 334:
+            # Continuación de AUTH (usuario, contraseña o token en base64)
+            line = REDACTED
+        elif settings.LOG_MASK_EMAILS and line[:9].upper() == "RCPT TO:<":
+            address, _, rest = line[9:].partition(">")
+            line = f"{line[:9]}{mask_email(address)}>{rest}"
+        self._add(">", line)
+
+    def reply(self, code: int, message: bytes) -> None:
+        self.last_code = code
+        first_line = message.split(b"\n", 1)[0].decode("utf-8", "replace")
+        self._add("<", f"{code} {first_line}")
+
+    def event(self, text: str) -> None:
+        self._add("*", text)
+
+
+# Transcripción del envío en curso; `None` fuera de un envío o con la captura deshabilitada
+current_transcript: ContextVar[Optional[SMTPTranscript]] = ContextVar("smtp_transcript", default=None)
+
+
+def transcript_command(line: str) -> None:
+    """Agrega un comando enviado a la transcripción en curso, si la hay."""
+    transcript = current_transcript.get()
+    if transcript is not None:
+        transcript.command(line)
+
+
+def transcript_reply(code: int, message: bytes) -> None:
+    """Agrega una respuesta del servidor a la transcripción en curso, si la hay."""
+    transcript = current_transcript.get()
+    if transcript is not None:
+        transcript.reply(code, message)
+
+
+def transcript_event(text: str) -> None:
+    """Agrega una fase o evento a la transcripción en curso, si la hay."""
+    transcript = current_transcript.get()
+    if transcript is not None:
+        transcript.event(text)
+
+
+class SlowTranscriptBuffer:
+    """Ring buffer en memoria con las transcripciones de los envíos lentos más recientes."""
+
+    def __init__(self, capacity: int):
+        self._entries: deque[dict] = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def add(self, entry: dict) -> None:
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+
+    def entries(self, limit: Optional[int] = None) -> list[dict]:
+        """Transcripciones guardadas, de la más reciente a la más antigua."""
+        with self._lock:
+            entries = list(reversed(self._entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "threshold_ms": settings.SMTP_SLOW_SEND_THRESHOLD_MS,
+            "capacity": self._entries.maxlen if settings.SMTP_SLOW_TRANSCRIPTS > 0 else 0,
+            "stored": len(self._entries),
+            "recorded": self.recorded,
+        }
+
+
+slow_transcripts = SlowTranscriptBuffer(settings.SMTP_SLOW_TRANSCRIPTS)
+
+
+@contextmanager
+def record_transcript(relay: str, messages: int = 1) -> Iterator[Optional[SMTPTranscript]]:
+    """
+    Captura la conversación SMTP del bloque y la guarda si supera `SMTP_SLOW_SEND_THRESHOLD_MS`.
+
+    Con `SMTP_SLOW_TRANSCRIPTS=0` no captura nada. La transcripción se
+    comparte con el threadpool a través del contexto, por lo que también
+    cubre el transporte `smtplib`.
+    """
+    if settings.SMTP_SLOW_TRANSCRIPTS <= 0:
+        yield None
+        return
+
+    transcript = SMTPTranscript(relay)
+    token = current_transcript.set(transcript)
+    error: Optional[BaseException] = None
+    try:
+        yield transcript
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        current_transcript.reset(token)
+        elapsed_ms = (time.perf_counter() - transcript.started) * 1000
+        if elapsed_ms >= settings.SMTP_SLOW_SEND_THRESHOLD_MS:
+            slow_transcripts.add({
+                "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "relay": relay,
+                "route": current_route.get(),
+                "trace_id": current_trace_id(),
+                "messages": messages,
+                "duration_ms": round(elapsed_ms, 3),
+                "error": f"{type(error).__name__}: {error}" if error is not None else None,
+                "lines": [f"{offset:>10.3f} {direction} {text}" for offset, direction, text in transcript.lines],
+                "truncated_lines": transcript.truncated,
+            })
@@ -1,20 +1,116 @@
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-import smtplib
-import ssl
 from datetime import datetime
 from typing import Optional
 
-TEMPLATES_DIR = "app/templates"
+SPOOL_ROUTE = "/email/send_otp"
 
 from app.config import settings
+from app.observability import get_logger
+from app.observability.tracing import start_span
 from app.otp.models import OTPEmailRequest, OTPEmailResponse
-from jinja2 import Environment, FileSystemLoader
+from app.rendering import template_registry
+from app.smtp import send_message, send_message_async
+from app.smtp.mime import MessageTemplate
+from app.smtp.scheduler import PRIORITY_OTP
+from app.smtp.spool import enqueue_message
+
+# Logs por envío: los INFO se muestrean con LOG_SEND_SAMPLE_RATE
+logger = get_logger(__name__, sampled=True)
 
 class EmailOTPApplication:
     def __init__(self):
-        print(f"[INFO] Inicializando EmailOTPApplication con templates en: {TEMPLATES_DIR}")
-        self.jinja_env = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+        logger.debug("EmailOTPApplication inicializado", templates_dir=str(template_registry.templates_dir))
+        # Cabeceras y estructura MIME precodificadas; por request solo To y el cuerpo
+        #subject = f'Código de verificación - {settings.APP_NAME}'
+        self._message = MessageTemplate(settings.SMTP_FROM_EMAIL, "Codigo de verificación", ("html",))
+
+    def _prepare_message(self, request: OTPEmailRequest) -> tuple[bytes, bool]:
+        """
+        Renderiza la plantilla OTP y construye el mensaje MIME listo para envío.
+        
+        Aplica la lógica condicional para mostrar/ocultar elementos según los
+        parámetros proporcionados (expiración, botón de redirección).
+        
+        Args:
+            request (OTPEmailRequest): Configuración completa del email OTP.
+            
+        Returns:
+            tuple[bytes, bool]: Mensaje serializado e indicador de botón de redirección.
+        """
+        # Determinar si mostrar mensaje de expiración
+        show_expiry = request.expiry_minutes is not None and request.expiry_minutes > 0
+        
+        # Determinar si mostrar botón de redirección automática
+        show_redirect_button = request.redirect_url is not None and request.redirect_url.strip() != ""
+        
+        # Solo los campos por request: app_name, logo y footer ya están en el
+        # esqueleto precalculado desde configuración
+        context = {
+            "otp_code": request.code,
+            "expiry_minutes": request.expiry_minutes,
+            "expiry_suffix": "" if request.expiry_minutes == 1 else "s",
+            "show_expiry": show_expiry,
+            "redirect_url": request.redirect_url,
+            "show_redirect_button": show_redirect_button,
+        }
+        
+        html_content = template_registry.render("otp.html", context)
+        
+        # Crear el mensaje
+        msg = self._message.build(request.email, (html_content,))
+        
+        return msg, show_redirect_button
+
+    def _build_response(self, request: OTPEmailRequest, result: Optional[dict] = None,
+                        error: Optional[Exception] = None,
+                        show_redirect_button: bool = False,
+                        message_id: Optional[str] = None) -> OTPEmailResponse:
+        """
+        Construye la respuesta a partir del resultado del envío SMTP.
+        
+        Args:
+            request (OTPEmailRequest): Solicitud original.
+            result (Optional[dict]): Destinatarios rechazados devueltos por el servidor SMTP.
+            error (Optional[Exception]): Error ocurrido durante la preparación o el envío.
+            show_redirect_button (bool): Si el email incluyó botón de redirección.
+            message_id (Optional[str]): ID en el spool si el mensaje fue encolado.
+            
+        Returns:
+            OTPEmailResponse: Resultado detallado del envío con metadatos.
+        """
+        if error is None and result:
+            logger.error("Destinatario rechazado por el relay", email=request.email, refused=list(result))
+            error = Exception(f"Error SMTP: {result}")
+        
+        if error is None:
+            if message_id:
+                logger.info("Código OTP encolado", email=request.email, message_id=message_id)
+            else:
+                logger.info("Código OTP enviado", email=request.email)
+            
+            # Construir respuesta exitosa
+            return OTPEmailResponse(
+                success=True,
+                message="Código OTP encolado para envío" if message_id else "Código OTP enviado exitosamente",
+                email_sent_to=request.email,
+                timestamp=datetime.utcnow().isoformat() + "Z",
+                expiry_minutes=request.expiry_minutes,
+                has_verification_button=show_redirect_button,
+                logo_used=settings.COMPANY_LOGO_URL,
+                message_id=message_id
+            )
+        
+        logger.error("Error enviando código OTP", email=request.email, error=str(error))
+        
+        # Construir respuesta de error
+        return OTPEmailResponse(
+            success=False,
+            message=f"Error enviando código OTP: {str(error)}",
+            email_sent_to=request.email,
+            timestamp=datetime.utcnow().isoformat() + "Z",
+            expiry_minutes=request.expiry_minutes,
+            has_verification_button=show_redirect_button,
+            logo_used=settings.COMPANY_LOGO_URL
+        )
 
     def send_otp_email(self, request: OTPEmailRequest) -> OTPEmailResponse:
         """
@@ -22,6 +118,8 @@ class EmailOTPApplication:
         
         Procesa la solicitud OTP aplicando lógica condicional para mostrar/ocultar
         elementos según los parámetros proporcionados (expiración, verificación automática, logo).
+        Utiliza el transporte bloqueante (`smtplib`); desde endpoints async usar
+        `send_otp_email_async()`.
         
         Args:
             request (OTPEmailRequest): Configuración completa del email OTP.
@@ -29,113 +127,73 @@ class EmailOTPApplication:
         Returns:
             OTPEmailResponse: Resultado detallado del envío con metadatos.
         """
+        show_redirect_button = False
         try:
-            template = self.jinja_env.get_template("otp.html")
-            
-            # Logo y app_name siempre desde configuración
-            
-            # Determinar si mostrar mensaje de expiración
-            show_expiry = request.expiry_minutes is not None and request.expiry_minutes > 0
-            
-            # Determinar si mostrar botón de redirección automática
-            show_redirect_button = request.redirect_url is not None and request.redirect_url.strip() != ""
-            
-            # Construir contexto para la plantilla
-            context = {
-                "email": request.email,
-                "otp_code": request.code,
-                "app_name": settings.APP_NAME,  # Desde .env
-                "logo_url": settings.COMPANY_LOGO_URL,  # Desde .env
-                "expiry_minutes": request.expiry_minutes,
-                "show_expiry": show_expiry,
-                "redirect_url": request.redirect_url,
-                "show_redirect_button": show_redirect_button,
-                "company_name": settings.COMPANY_NAME,
-                "support_email": settings.SUPPORT_EMAIL,
-                "website_url": settings.WEBSITE_URL
-            }
-            
-            print(f"[INFO] Contexto del template: {context}")
-            html_content = template.render(context)
-            
-            # Crear el mensaje
-            msg = MIMEMultipart()
-            msg['From'] = settings.SMTP_FROM_EMAIL
-            msg['To'] = request.email
-            #msg['Subject'] = f'Código de verificación - {settings.APP_NAME}'
-            msg['Subject'] = "Codigo de verificación"
-            msg.attach(MIMEText(html_content, 'html'))
-            
-            # Enviar el correo
-            print(f"[INFO] SMTP_USE_SSL: {settings.SMTP_USE_SSL}")
-            print(f"[INFO] SMTP_USE_TLS: {settings.SMTP_USE_TLS}")
-            print(f"[INFO] SMTP_PORT: {settings.SMTP_PORT}")
+            with start_span("otp.send", transport="sync"):
+                msg, show_redirect_button = self._prepare_message(request)
+                
+                # Enviar el correo usando una sesión autenticada de alguno de los relays
+                result = send_message(settings.SMTP_FROM_EMAIL, request.email, msg, PRIORITY_OTP)
+            return self._build_response(request, result=result, show_redirect_button=show_redirect_button)
+                
+        except Exception as e:
+            return self._build_response(request, error=e, show_redirect_button=show_redirect_button)
+
+    async def send_otp_email_async(self, request: OTPEmailRequest) -> OTPEmailResponse:
+        """
+        Versión asíncrona de `send_otp_email()`.
+        
+        Usa el transporte configurado en `SMTP_TRANSPORT`: el cliente SMTP
+        asyncio nativo o el pool `smtplib` ejecutado en el threadpool.
+        
+        Args:
+            request (OTPEmailRequest): Configuración completa del email OTP.
             
-            if settings.SMTP_USE_SSL:
-                # Método para puerto 465: Conexión segura desde el inicio
-                print("[INFO] Conectando con SMTP_SSL")
-                ssl_context = ssl.create_default_context()
-                server = smtplib.SMTP_SSL(
-                    settings.SMTP_HOST, 
-                    settings.SMTP_PORT, 
-                    context=ssl_context,
-                    timeout=settings.SMTP_TIMEOUT
-                )
-            elif settings.SMTP_USE_TLS:
-                # Método para puerto 587: Conexión normal que se actualiza a segura
-                print("[INFO] Conectando con SMTP + TLS")
-                server = smtplib.SMTP(
-                    settings.SMTP_HOST, 
-                    settings.SMTP_PORT, 
-                    timeout=settings.SMTP_TIMEOUT
-                )
-                print("[INFO] Iniciando STARTTLS")
-                server.starttls()
-            else:
-                # Conexión no segura (no recomendada)
-                print("[WARN] Conectando sin seguridad - SMTP plano")
-                server = smtplib.SMTP(
-                    settings.SMTP_HOST, 
-                    settings.SMTP_PORT, 
-                    timeout=settings.SMTP_TIMEOUT
+        Returns:
+            OTPEmailResponse: Resultado detallado del envío con metadatos.
+        """
+        show_redirect_button = False
+        try:
+            with start_span("otp.send", transport=settings.SMTP_TRANSPORT):
+                msg, show_redirect_button = self._prepare_message(request)
+                
+                result = await send_message_async(
+                    settings.SMTP_FROM_EMAIL, request.email, msg, PRIORITY_OTP
                 )
+            return self._build_response(request, result=result, show_redirect_button=show_redirect_button)
+                
+        except Exception as e:
+            return self._build_response(request, error=e, show_redirect_button=show_redirect_button)
 
-            # Autenticar y enviar el correo
-            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-            result = server.sendmail(settings.SMTP_FROM_EMAIL, request.email, msg.as_string())
-            server.quit()
+    async def queue_otp_email(self, request: OTPEmailRequest) -> OTPEmailResponse:
+        """
+        Renderiza el email OTP y lo encola en el spool durable (modo `queued`).
+        
+        La entrega al relay la realizan los workers en segundo plano, por lo que
+        la latencia de la API no depende de la latencia del servidor SMTP. Con
+        `SPOOL_SUPERSEDE_OTP` el nuevo código reemplaza al OTP aún pendiente del
+        mismo destinatario, que ya no es válido y no llega a enviarse.
+        
+        Args:
+            request (OTPEmailRequest): Configuración completa del email OTP.
             
-            # Verificar resultado del envío
-            if not result:
-                print(f"[INFO] Correo enviado exitosamente a {request.email}")
+        Returns:
+            OTPEmailResponse: Confirmación con el `message_id` asignado en el spool.
+        """
+        show_redirect_button = False
+        try:
+            with start_span("otp.enqueue"):
+                msg, show_redirect_button = self._prepare_message(request)
                 
-                # Construir respuesta exitosa
-                return OTPEmailResponse(
-                    success=True,
-                    message="Código OTP enviado exitosamente",
-                    email_sent_to=request.email,
-                    timestamp=datetime.utcnow().isoformat() + "Z",
-                    expiry_minutes=request.expiry_minutes,
-                    has_verification_button=show_redirect_button,
-                    logo_used=settings.COMPANY_LOGO_URL
+                supersede_key = f"{SPOOL_ROUTE}:{request.email.lower()}" if settings.SPOOL_SUPERSEDE_OTP else None
+                message_id = await enqueue_message(
+                    SPOOL_ROUTE, settings.SMTP_FROM_EMAIL, [request.email], msg, PRIORITY_OTP, supersede_key
                 )
-            else:
-                print(f"[ERROR] Fallo en el envío a: {result}")
-                raise Exception(f"Error SMTP: {result}")
+            return self._build_response(request, show_redirect_button=show_redirect_button,
+                                        message_id=message_id)
                 
         except Exception as e:
-            print(f"[ERROR] Error enviando OTP: {str(e)}")
-            
-            # Construir respuesta de error
-            return OTPEmailResponse(
-                success=False,
-                message=f"Error enviando código OTP: {str(e)}",
-                email_sent_to=request.email,
-                timestamp=datetime.utcnow().isoformat() + "Z",
-                expiry_minutes=request.expiry_minutes,
-                has_verification_button=show_redirect_button if 'show_redirect_button' in locals() else False,
-                logo_used=settings.COMPANY_LOGO_URL
-            )
+            return self._build_response(request, error=e, show_redirect_button=show_redirect_button)
 
     # Método legacy para compatibilidad hacia atrás
     def Send_OTP(self, email: str, code: str, app_name: str):
@@ -144,7 +202,7 @@ class EmailOTPApplication:
         
         DEPRECATED: Usar send_otp_email() con OTPEmailRequest en su lugar.
         """
-        print(f"[WARN] Usando método legacy Send_OTP - considerar migrar a send_otp_email()")
+        logger.warning("Usando método legacy Send_OTP - considerar migrar a send_otp_email()")
         
         # Crear request con parámetros básicos (app_name ya no se necesita)
         request = OTPEmailRequest(
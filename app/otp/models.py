@@ -107,6 +107,7 @@ class OTPEmailResponse(BaseModel):
         expiry_minutes (Optional[int]): **Minutos de expiración** aplicados.
         has_verification_button (bool): **Indica si se incluyó botón** de verificación.
         logo_used (str): **URL del logo** utilizado en el email.
+        message_id (Optional[str]): **ID del mensaje encolado** - Solo en modo `queued`.
     """
     
     success: bool = Field(
@@ -144,6 +145,11 @@ class OTPEmailResponse(BaseModel):
         description="**URL del logo** - Logo utilizado en el email"
     )
     
+    message_id: Optional[str] = Field(
+        None,
+        description="**ID del mensaje encolado** - Solo en modo de entrega `queued` (202 Accepted)"
+    )
+    
     class Config:
         schema_extra = {
             "example": {
@@ -155,4 +161,105 @@ class OTPEmailResponse(BaseModel):
                 "has_verification_button": True,
                 "logo_used": "https://encrypted-tbn0.gstatic.com/images?q=tbn:ANd9GcT5mug1kZAbRtSexOlAnCSRDudlfe-GKxYfQA&s"
             }
-        }
\ No newline at end of file
+        }
+
+
+class OTPIssueRequest(BaseModel):
+    """
+    Modelo de solicitud para emitir un código OTP generado por el servicio.
+    
+    A diferencia de `OTPEmailRequest`, el código no lo envía el cliente: el
+    servicio lo genera, guarda solo su HMAC y lo envía por correo. La
+    verificación se hace después con `/email/otp/verify`.
+    
+    Attributes:
+        email (EmailStr): **Dirección de correo electrónico** del destinatario.
+        expiry_minutes (Optional[int]): **Vigencia del código** en minutos.
+                                       Si es None se usa `OTP_DEFAULT_EXPIRY_MINUTES`.
+        redirect_url (Optional[str]): **URL de redirección automática** para el botón del email.
+    """
+    
+    email: EmailStr = Field(
+        ...,
+        description="**Email del destinatario** - Debe ser RFC-compliant",
+        example="usuario@ejemplo.com"
+    )
+    
+    expiry_minutes: Optional[int] = Field(
+        None,
+        ge=1,
+        le=1440,  # Máximo 24 horas
+        description="**Vigencia del código** en minutos. Si es None se usa la configuración del servicio",
+        example=10
+    )
+    
+    redirect_url: Optional[str] = Field(
+        None,
+        max_length=2048,
+        description="**URL de redirección** - Botón opcional para redirigir al usuario automáticamente",
+        example="https://app.com/dashboard?verified=true"
+    )
+    
+    @validator('redirect_url')
+    def validate_redirect_url(cls, v):
+        """Valida que la URL de redirección tenga formato correcto si se proporciona."""
+        if v is not None and v.strip():
+            if not (v.startswith('http://') or v.startswith('https://')):
+                raise ValueError('URL de redirección debe comenzar con http:// o https://')
+        return v
+
+
+class OTPVerifyRequest(BaseModel):
+    """
+    Modelo de solicitud para verificar un código OTP emitido por el servicio.
+    
+    Attributes:
+        email (EmailStr): **Dirección de correo electrónico** a la que se envió el código.
+        code (str): **Código OTP** ingresado por el usuario.
+    """
+    
+    email: EmailStr = Field(
+        ...,
+        description="**Email del destinatario** - El mismo usado al emitir el código",
+        example="usuario@ejemplo.com"
+    )
+    
+    code: str = Field(
+        ...,
+        min_length=4,
+        max_length=8,
+        description="**Código OTP** - Tal como lo ingresó el usuario",
+        example="482913"
+    )
+
+
+class OTPVerifyResponse(BaseModel):
+    """
+    Resultado de la verificación de un código OTP.
+    
+    Attributes:
+        valid (bool): **Código correcto** - True si el código se verificó (y se consumió).
+        status (str): **Resultado** - `valid`, `invalid`, `expired` o `locked`.
+        message (str): **Mensaje descriptivo** del resultado.
+        attempts_remaining (int): **Intentos restantes** antes de bloquear el código.
+    """
+    
+    valid: bool = Field(
+        ...,
+        description="**Código correcto** - Un código válido solo puede usarse una vez"
+    )
+    
+    status: str = Field(
+        ...,
+        description="**Resultado** - valid, invalid, expired o locked"
+    )
+    
+    message: str = Field(
+        ...,
+        description="**Mensaje descriptivo** - Detalles del resultado"
+    )
+    
+    attempts_remaining: int = Field(
+        0,
+        description="**Intentos restantes** - Solo relevante si el código es incorrecto"
+    )
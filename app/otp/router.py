@@ -1,11 +1,23 @@
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from app.admission import IDEMPOTENCY_HEADER, REPLAYED_HEADER, enforce_recipient_limit, send_once
+from app.config import settings
+from app.observability import get_logger
 from app.otp.controller import EmailOTPApplication
-from app.otp.models import OTPEmailRequest, OTPEmailResponse
-
-controller = EmailOTPApplication()
+from app.otp.models import (
+    OTPEmailRequest,
+    OTPEmailResponse,
+    OTPIssueRequest,
+    OTPVerifyRequest,
+    OTPVerifyResponse,
+)
+from app.otp.store import VERIFY_EXPIRED, VERIFY_INVALID, VERIFY_LOCKED, VERIFY_VALID, issue_code, verify_code
+from app.smtp.spool import DELIVERY_QUEUED
 
 MODULE_NAME = "email"
 
+logger = get_logger(__name__)
+
 router_otp = APIRouter(
     prefix=f"/{MODULE_NAME}",
     tags=[MODULE_NAME])
@@ -18,11 +30,41 @@ TAG_OTP = {
 - 🚀 **Casos de uso:** Registro, login seguro, recuperación de cuenta  
 - 📧 **Características:** HTML responsivo, rate limiting, validación RFC
 - ⚡ **Seguridad:** Códigos aleatorios, expiración configurable, logging completo
+- 🔑 **Emisión y verificación:** `/otp/issue` genera el código en el servicio y `/otp/verify` lo valida
 """
 }
 
+# Respuesta HTTP y mensaje por resultado de verificación
+_VERIFY_RESULTS = {
+    VERIFY_VALID: (status.HTTP_200_OK, "Código verificado"),
+    VERIFY_INVALID: (status.HTTP_400_BAD_REQUEST, "Código incorrecto"),
+    VERIFY_EXPIRED: (status.HTTP_410_GONE, "Código expirado o inexistente, solicitar uno nuevo"),
+    VERIFY_LOCKED: (status.HTTP_429_TOO_MANY_REQUESTS, "Demasiados intentos fallidos, solicitar un código nuevo"),
+}
+
+
+def get_otp_controller(request: Request) -> EmailOTPApplication:
+    """Controlador OTP creado en el lifespan de la aplicación (`app.state.otp_controller`)."""
+    return request.app.state.otp_controller
+
+
+async def _deliver(controller: EmailOTPApplication, request: OTPEmailRequest) -> OTPEmailResponse:
+    """Aplica el límite por destinatario y envía (o encola, en modo `queued`) el email OTP."""
+    # Límite por destinatario antes de renderizar o tocar SMTP; los reintentos no lo consumen
+    enforce_recipient_limit(request.email)
+    
+    if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+        # Modo spool: validar, renderizar y encolar; la entrega es en segundo plano
+        return await controller.queue_otp_email(request)
+    return await controller.send_otp_email_async(request)
+
 @router_otp.post("/send_otp", response_model=OTPEmailResponse)
-def enviar_codigo_otp(request: OTPEmailRequest) -> OTPEmailResponse:
+async def enviar_codigo_otp(
+    request: OTPEmailRequest,
+    http_response: Response,
+    controller: EmailOTPApplication = Depends(get_otp_controller),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+) -> OTPEmailResponse:
     """
     Envía un código de verificación OTP (One-Time Password) por correo electrónico con configuración avanzada.
     
@@ -51,6 +93,7 @@ def enviar_codigo_otp(request: OTPEmailRequest) -> OTPEmailResponse:
     Args:
         request (OTPEmailRequest): **Configuración completa del email OTP** con todos los parámetros
                                   de personalización y comportamiento.
+        idempotency_key (str, optional): **Header `Idempotency-Key`** para reintentos seguros.
     
     Returns:
         OTPEmailResponse: **Respuesta detallada** con estado del envío, metadatos de configuración
@@ -72,11 +115,26 @@ def enviar_codigo_otp(request: OTPEmailRequest) -> OTPEmailResponse:
         - `app_name` y `logo_url` se toman automáticamente de las variables de entorno
         - Esto garantiza consistencia en el branding y simplifica la integración
         - Las URLs se validan automáticamente (deben comenzar con http/https)
+        - Con `DELIVERY_MODE=queued` el email se encola en el spool durable y se
+          responde `202 Accepted` con `message_id`; la entrega ocurre en segundo plano
+        - Se responde `429` con `Retry-After` si la IP o el destinatario superan su
+          límite de envíos (`MAX_REQUESTS_PER_*`, `MAX_EMAILS_PER_RECIPIENT_PER_*`)
+        - Un reintento con el mismo header `Idempotency-Key` (o, sin header, mismo email y código
+          dentro de `IDEMPOTENCY_DERIVED_TTL_SECONDS`) recibe la respuesta ya enviada
+          con `Idempotent-Replayed: true`, sin reenviar el email
+        - Reutilizar un `Idempotency-Key` con otro email o código responde `422` sin enviar
     """
     
     try:
         # Enviar email OTP con configuración avanzada
-        response = controller.send_otp_email(request)
+        response, replayed = await send_once(
+            f"/{MODULE_NAME}/send_otp", request.email, idempotency_key,
+            f"{request.email}\0{request.code}", lambda: _deliver(controller, request)
+        )
+        if replayed:
+            http_response.headers[REPLAYED_HEADER] = "true"
+        if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+            http_response.status_code = status.HTTP_202_ACCEPTED
         
         # Si el envío falló, lanzar HTTPException
         if not response.success:
@@ -92,15 +150,133 @@ def enviar_codigo_otp(request: OTPEmailRequest) -> OTPEmailResponse:
         raise
     except Exception as e:
         # Capturar cualquier otro error inesperado
-        print(f"[ERROR] Error inesperado en endpoint send_otp: {str(e)}")
+        logger.error("Error inesperado en endpoint send_otp", exc_info=e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+
+@router_otp.post("/otp/issue", response_model=OTPEmailResponse)
+async def emitir_codigo_otp(
+    request: OTPIssueRequest,
+    http_response: Response,
+    controller: EmailOTPApplication = Depends(get_otp_controller),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+) -> OTPEmailResponse:
+    """
+    Genera un código OTP en el servicio y lo envía por correo electrónico.
+    
+    El cliente ya no necesita generar ni guardar el código: el servicio lo
+    genera con un CSPRNG, guarda solo su HMAC con la vigencia indicada y lo
+    envía con la misma plantilla que `/send_otp`. El código se valida luego
+    con `/email/otp/verify`. Emitir un código nuevo invalida el anterior del
+    mismo destinatario.
+    
+    Args:
+        request (OTPIssueRequest): **Destinatario y vigencia** del código a emitir.
+        idempotency_key (str, optional): **Header `Idempotency-Key`** para reintentos seguros.
+    
+    Returns:
+        OTPEmailResponse: **Respuesta del envío**; el código nunca se incluye en la respuesta.
+    
+    Example:
+        ```json
+        {
+            "email": "usuario@hospital.com",
+            "expiry_minutes": 15
+        }
+        ```
+    
+    Note:
+        - Si `expiry_minutes` es None se usa `OTP_DEFAULT_EXPIRY_MINUTES`
+        - Con `DELIVERY_MODE=queued` se responde `202 Accepted` y, si había un OTP
+          pendiente para el mismo destinatario, se reemplaza en el spool
+        - Se responde `429` con `Retry-After` si la IP o el destinatario superan su
+          límite de envíos
+        - Un reintento idéntico dentro de `IDEMPOTENCY_DERIVED_TTL_SECONDS` (o con el
+          mismo `Idempotency-Key`) no emite otro código
+    """
+    
+    async def send() -> OTPEmailResponse:
+        expiry_minutes = request.expiry_minutes or settings.OTP_DEFAULT_EXPIRY_MINUTES
+        # El límite por destinatario se aplica antes de emitir el código
+        enforce_recipient_limit(request.email)
+        code = await issue_code(request.email, expiry_minutes * 60)
+        email_request = OTPEmailRequest(
+            email=request.email,
+            code=code,
+            expiry_minutes=expiry_minutes,
+            redirect_url=request.redirect_url
+        )
+        if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+            return await controller.queue_otp_email(email_request)
+        return await controller.send_otp_email_async(email_request)
+    
+    try:
+        response, replayed = await send_once(
+            f"/{MODULE_NAME}/otp/issue", request.email, idempotency_key, request.model_dump_json(), send
+        )
+        if replayed:
+            http_response.headers[REPLAYED_HEADER] = "true"
+        if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+            http_response.status_code = status.HTTP_202_ACCEPTED
+        
+        if not response.success:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=response.message
+            )
+        
+        return response
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error inesperado en endpoint otp/issue", exc_info=e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error interno del servidor: {str(e)}"
         )
 
 
+@router_otp.post("/otp/verify", response_model=OTPVerifyResponse)
+async def verificar_codigo_otp(request: OTPVerifyRequest, http_response: Response) -> OTPVerifyResponse:
+    """
+    Verifica un código OTP emitido con `/email/otp/issue`.
+    
+    La comparación es en tiempo constante contra el HMAC guardado. Un código
+    correcto se consume (no puede usarse dos veces); tras `OTP_MAX_ATTEMPTS`
+    intentos fallidos el código queda bloqueado hasta su vencimiento.
+    
+    Args:
+        request (OTPVerifyRequest): **Email y código** ingresado por el usuario.
+    
+    Returns:
+        OTPVerifyResponse: **Resultado** con el estado y los intentos restantes.
+    
+    Note:
+        - `200` código válido, `400` incorrecto, `410` expirado o inexistente,
+          `429` bloqueado por intentos fallidos
+        - No distingue un código expirado de uno nunca emitido, para no revelar
+          qué direcciones solicitaron códigos
+        - No cuenta para el límite por IP (`MAX_REQUESTS_PER_*`): la fuerza bruta se
+          frena por código con `OTP_MAX_ATTEMPTS`
+    """
+    result, attempts_remaining = await verify_code(request.email, request.code)
+    status_code, message = _VERIFY_RESULTS[result]
+    http_response.status_code = status_code
+    return OTPVerifyResponse(
+        valid=result == VERIFY_VALID,
+        status=result,
+        message=message,
+        attempts_remaining=attempts_remaining
+    )
+
+
 @router_otp.post("/send_otp_legacy")
-def enviar_codigo_otp_legacy(email: str, code: str, app_name: str):
+async def enviar_codigo_otp_legacy(email: str, code: str, app_name: str,
+                                   controller: EmailOTPApplication = Depends(get_otp_controller)):
     """
     Endpoint legacy para envío de OTP con parámetros simples.
     
@@ -122,8 +298,14 @@ def enviar_codigo_otp_legacy(email: str, code: str, app_name: str):
             code=code
         )
         
-        # Usar el controlador nuevo
-        response = controller.send_otp_email(request)
+        async def send() -> OTPEmailResponse:
+            enforce_recipient_limit(request.email)
+            return await controller.send_otp_email_async(request)
+        
+        # Usar el controlador nuevo; el mismo email y código en la ventana de idempotencia no se reenvía
+        response, _ = await send_once(
+            f"/{MODULE_NAME}/send_otp_legacy", request.email, None, f"{request.email}\0{request.code}", send
+        )
         
         if not response.success:
             raise HTTPException(
@@ -141,7 +323,7 @@ def enviar_codigo_otp_legacy(email: str, code: str, app_name: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[ERROR] Error en endpoint legacy: {str(e)}")
+        logger.error("Error en endpoint legacy", exc_info=e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
@@ -0,0 +1,351 @@
+import asyncio
+import hashlib
+import hmac
+import math
+import secrets
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+from app.observability import get_logger
+from app.observability.metrics import Counter, metrics_registry
+
+
+logger = get_logger(__name__)
+
+BACKEND_MEMORY = "memory"
+BACKEND_SQLITE = "sqlite"
+
+VERIFY_VALID = "valid"
+VERIFY_INVALID = "invalid"
+VERIFY_EXPIRED = "expired"
+VERIFY_LOCKED = "locked"
+
+otp_codes_issued_total = metrics_registry.register(Counter(
+    "otp_codes_issued_total", "Códigos OTP generados por el servicio."
+))
+otp_verifications_total = metrics_registry.register(Counter(
+    "otp_verifications_total", "Verificaciones de códigos OTP por resultado.", ("result",)
+))
+
+
+def generate_code(length: int) -> str:
+    """Código numérico aleatorio (CSPRNG) de `length` dígitos, entre 4 y 8."""
+    length = min(8, max(4, length))
+    return f"{secrets.randbelow(10 ** length):0{length}d}"
+
+
+def _normalize(email: str) -> str:
+    return email.strip().lower()
+
+
+def _digest(secret: bytes, email: str, code: str) -> bytes:
+    """HMAC-SHA256 del código ligado al destinatario: el store nunca guarda el código en claro."""
+    return hmac.new(secret, f"{email}\0{code.strip()}".encode("utf-8"), hashlib.sha256).digest()
+
+
+class TimingWheel:
+    """
+    Rueda de tiempos para expirar claves en O(1) amortizado.
+
+    Cada slot agrupa las claves que vencen dentro del mismo intervalo de
+    `resolution` segundos. Programar una clave es O(1) y `advance()` solo
+    recorre los slots que vencieron desde la llamada anterior; las claves
+    con vencimiento más allá de una vuelta de la rueda se quedan en su slot
+    hasta la vuelta que les corresponde. Reprogramar una clave no borra la
+    entrada anterior: quien expira debe confirmar el vencimiento real.
+    No es thread-safe: lo protege el shard que la contiene.
+    """
+
+    def __init__(self, resolution: float = 1.0, slots: int = 4096):
+        self.resolution = resolution
+        self.slots = max(1, slots)
+        self._buckets: list[dict[str, int]] = [{} for _ in range(self.slots)]
+        self._cursor: Optional[int] = None
+
+    def _tick(self, when: float) -> int:
+        return math.ceil(when / self.resolution)
+
+    def schedule(self, key: str, deadline: float) -> None:
+        tick = self._tick(deadline)
+        self._buckets[tick % self.slots][key] = tick
+
+    def advance(self, now: float) -> list[str]:
+        """Avanza la rueda hasta `now` y devuelve las claves vencidas."""
+        tick = int(now // self.resolution)
+        if self._cursor is None:
+            self._cursor = tick
+        steps = min(tick - self._cursor, self.slots)
+        if steps <= 0:
+            return []
+
+        expired = []
+        for offset in range(1, steps + 1):
+            bucket = self._buckets[(self._cursor + offset) % self.slots]
+            if not bucket:
+                continue
+            due = [key for key, deadline in bucket.items() if deadline <= tick]
+            for key in due:
+                del bucket[key]
+            expired.extend(due)
+        self._cursor = tick
+        return expired
+
+
+class _Record:
+    __slots__ = ("digest", "expires_at", "attempts")
+
+    def __init__(self, digest: bytes, expires_at: float):
+        self.digest = digest
+        self.expires_at = expires_at
+        self.attempts = 0
+
+
+class _Shard:
+    __slots__ = ("lock", "records", "wheel")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records: dict[str, _Record] = {}
+        self.wheel = TimingWheel()
+
+    def expire(self, now: float) -> None:
+        for email in self.wheel.advance(now):
+            record = self.records.get(email)
+            # Un código reemitido tiene su propio vencimiento en la rueda
+            if record is not None and record.expires_at <= now:
+                del self.records[email]
+
+
+class MemoryOTPStore:
+    """
+    Store de códigos OTP en memoria, particionado en shards por destinatario.
+
+    Cada shard tiene su propio lock, diccionario y rueda de expiración, de
+    modo que las verificaciones concurrentes de distintos destinatarios no
+    compiten por un lock global y la limpieza de códigos vencidos se reparte
+    entre las operaciones (O(1) amortizado). Los códigos se guardan como
+    HMAC y se comparan en tiempo constante. Un código nuevo reemplaza al
+    anterior del mismo destinatario; tras `max_attempts` fallos queda
+    bloqueado hasta que vence.
+
+    Solo sirve para un proceso: con varios workers usar `SQLiteOTPStore`.
+    """
+
+    blocking = False
+
+    def __init__(self, shards: int = 16, max_attempts: int = 5, secret: Optional[bytes] = None):
+        self.max_attempts = max(1, max_attempts)
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self._secret = secret or secrets.token_bytes(32)
+
+    def _shard(self, email: str) -> _Shard:
+        return self._shards[hash(email) % len(self._shards)]
+
+    def issue(self, email: str, ttl: float, length: int = 6) -> str:
+        """Genera un código para `email` válido `ttl` segundos, reemplazando al anterior."""
+        email = _normalize(email)
+        code = generate_code(length)
+        now = time.monotonic()
+        record = _Record(_digest(self._secret, email, code), now + ttl)
+        shard = self._shard(email)
+        with shard.lock:
+            shard.expire(now)
+            shard.records[email] = record
+            shard.wheel.schedule(email, record.expires_at)
+        return code
+
+    def verify(self, email: str, code: str) -> tuple[str, int]:
+        """
+        Verifica `code` para `email`; un código válido se consume.
+
+        Returns:
+            tuple[str, int]: Resultado (`valid`, `invalid`, `expired` o `locked`) e intentos restantes.
+        """
+        email = _normalize(email)
+        digest = _digest(self._secret, email, code)
+        now = time.monotonic()
+        shard = self._shard(email)
+        with shard.lock:
+            shard.expire(now)
+            record = shard.records.get(email)
+            if record is None or record.expires_at <= now:
+                return VERIFY_EXPIRED, 0
+            if record.attempts >= self.max_attempts:
+                return VERIFY_LOCKED, 0
+            if hmac.compare_digest(record.digest, digest):
+                del shard.records[email]
+                return VERIFY_VALID, 0
+            # El registro bloqueado se conserva hasta su vencimiento en la rueda
+            record.attempts += 1
+            remaining = self.max_attempts - record.attempts
+            return (VERIFY_INVALID if remaining else VERIFY_LOCKED), remaining
+
+    def stats(self) -> dict:
+        return {
+            "backend": BACKEND_MEMORY,
+            "shards": len(self._shards),
+            "codes": sum(len(shard.records) for shard in self._shards),
+        }
+
+    def close(self) -> None:
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS otp_codes (
+    email TEXT PRIMARY KEY,
+    digest BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_otp_codes_expiry ON otp_codes (expires_at);
+CREATE TABLE IF NOT EXISTS otp_meta (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+"""
+
+# Códigos vencidos que se borran por cada emisión: la limpieza queda repartida
+_EXPIRE_BATCH = 64
+
+
+class SQLiteOTPStore:
+    """
+    Store de códigos OTP sobre SQLite (WAL) compartido entre workers de un mismo host.
+
+    Misma semántica que `MemoryOTPStore`; la verificación es una transacción
+    `BEGIN IMMEDIATE`, de modo que dos workers no pueden consumir el mismo
+    código ni perder un intento fallido. Sin `OTP_HASH_SECRET`, la clave del
+    HMAC se genera una vez y se guarda en el propio archivo para que todos
+    los workers la compartan. La conexión se abre de forma perezosa.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_attempts: int = 5, secret: Optional[bytes] = None):
+        self.path = path
+        self.max_attempts = max(1, max_attempts)
+        self._secret = secret
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            if self._secret is None:
+                conn.execute("INSERT OR IGNORE INTO otp_meta (key, value) VALUES ('secret', ?)",
+                             (secrets.token_bytes(32),))
+                self._secret = conn.execute("SELECT value FROM otp_meta WHERE key = 'secret'").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def issue(self, email: str, ttl: float, length: int = 6) -> str:
+        email = _normalize(email)
+        code = generate_code(length)
+        # Tiempo de pared: los workers no comparten reloj monotónico
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM otp_codes WHERE rowid IN "
+                "(SELECT rowid FROM otp_codes WHERE expires_at <= ? LIMIT ?)",
+                (now, _EXPIRE_BATCH)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO otp_codes (email, digest, expires_at, attempts) VALUES (?, ?, ?, 0)",
+                (email, _digest(self._secret, email, code), now + ttl)
+            )
+        return code
+
+    def verify(self, email: str, code: str) -> tuple[str, int]:
+        email = _normalize(email)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            digest = _digest(self._secret, email, code)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT digest, expires_at, attempts FROM otp_codes WHERE email = ?", (email,)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    result = VERIFY_EXPIRED, 0
+                elif row[2] >= self.max_attempts:
+                    result = VERIFY_LOCKED, 0
+                elif hmac.compare_digest(row[0], digest):
+                    conn.execute("DELETE FROM otp_codes WHERE email = ?", (email,))
+                    result = VERIFY_VALID, 0
+                else:
+                    conn.execute("UPDATE otp_codes SET attempts = attempts + 1 WHERE email = ?", (email,))
+                    remaining = self.max_attempts - row[2] - 1
+                    result = (VERIFY_INVALID if remaining else VERIFY_LOCKED), remaining
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            codes = self._connection().execute(
+                "SELECT COUNT(*) FROM otp_codes WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return {"backend": BACKEND_SQLITE, "path": self.path, "codes": codes}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def create_otp_store():
+    """Crea el store configurado en `OTP_STORE_BACKEND` (`memory` o `sqlite`)."""
+    secret = settings.OTP_HASH_SECRET.encode("utf-8") if settings.OTP_HASH_SECRET else None
+    if settings.OTP_STORE_BACKEND == BACKEND_SQLITE:
+        return SQLiteOTPStore(settings.OTP_STORE_PATH, settings.OTP_MAX_ATTEMPTS, secret)
+    return MemoryOTPStore(settings.OTP_STORE_SHARDS, settings.OTP_MAX_ATTEMPTS, secret)
+
+
+# Instancia global del store de códigos OTP
+otp_store = create_otp_store()
+
+
+async def issue_code(email: str, ttl: float) -> str:
+    """Genera y guarda un código para `email` (en el threadpool si el backend bloquea)."""
+    if otp_store.blocking:
+        code = await asyncio.to_thread(otp_store.issue, email, ttl, settings.OTP_CODE_LENGTH)
+    else:
+        code = otp_store.issue(email, ttl, settings.OTP_CODE_LENGTH)
+    otp_codes_issued_total.inc()
+    return code
+
+
+async def verify_code(email: str, code: str) -> tuple[str, int]:
+    """
+    Verifica un código contra el store configurado.
+
+    Returns:
+        tuple[str, int]: Resultado de la verificación e intentos restantes.
+    """
+    if otp_store.blocking:
+        result = await asyncio.to_thread(otp_store.verify, email, code)
+    else:
+        result = otp_store.verify(email, code)
+    otp_verifications_total.inc(result[0])
+    return result
+
+
+async def store_stats() -> dict:
+    """Estadísticas del store (en el threadpool si el backend bloquea, para no frenar el event loop)."""
+    if otp_store.blocking:
+        return await asyncio.to_thread(otp_store.stats)
+    return otp_store.stats()
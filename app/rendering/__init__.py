@@ -0,0 +1,24 @@
+"""
+Módulo de renderizado de plantillas para SmtpMailer FastAPI.
+
+Proporciona un registro compartido de plantillas Jinja2 compiladas al
+iniciar la aplicación, con caché de bytecode en disco y recarga explícita.
+Las plantillas de email se evalúan parcialmente contra la configuración,
+de modo que cada request solo intercala sus propios campos. La etapa de
+build (`python app/rendering/build.py`) incrusta el CSS y minifica el HTML.
+"""
+
+from app.rendering.registry import TemplateRegistry, template_registry, TEMPLATES_DIR
+from app.rendering.build import BUILD_DIR, build_templates
+from app.rendering.prerender import PrerenderSpec, PrerenderedTemplate, EMAIL_PRERENDER_SPECS
+
+__all__ = [
+    "TemplateRegistry",
+    "template_registry",
+    "TEMPLATES_DIR",
+    "BUILD_DIR",
+    "build_templates",
+    "PrerenderSpec",
+    "PrerenderedTemplate",
+    "EMAIL_PRERENDER_SPECS",
+]
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Etapa de build de las plantillas de email.
+
+Incrusta el CSS de los bloques `<style>` en atributos `style` de cada
+elemento, elimina comentarios y espacios sobrantes y escribe las
+plantillas optimizadas en `app/templates/build/` junto con un
+`manifest.json` que registra el checksum del fuente. `TemplateRegistry`
+carga esos artefactos al iniciar si siguen correspondiendo a su fuente.
+
+Las líneas se cortan en los límites de bloque, donde un salto no afecta
+al render, para poder enviar el HTML como 8bit sin superar el límite de
+998 octetos por línea de RFC 5321.
+
+Las reglas que no se pueden incrustar (`*`, pseudo-clases y
+pseudo-elementos, `@media`) se conservan minificadas en el `<style>`; las
+declaraciones de `@media` se marcan `!important` para que sigan
+prevaleciendo sobre los estilos incrustados.
+
+No importa `app.config`, de modo que se puede ejecutar sin variables SMTP
+(p. ej. al construir la imagen Docker):
+
+    python app/rendering/build.py
+"""
+
+import hashlib
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Optional
+
+
+TEMPLATES_DIR = Path(__file__).parent.parent / "templates"
+BUILD_DIR = TEMPLATES_DIR / "build"
+MANIFEST_NAME = "manifest.json"
+
+# Columna a partir de la cual se corta la línea en el siguiente límite de bloque
+LINE_WIDTH = 78
+
+# Plantillas que se compilan al iniciar la aplicación
+EMAIL_TEMPLATES = ("otp.html", "waitlist.html")
+
+VOID_ELEMENTS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+# Elementos de bloque: los espacios a su alrededor no se muestran
+BLOCK_ELEMENTS = {
+    "html", "head", "body", "title", "meta", "link", "style", "div", "p", "br", "hr",
+    "table", "thead", "tbody", "tr", "td", "th", "ul", "ol", "li", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_WHITESPACE = re.compile(r"\s+")
+_STYLE_BLOCK = re.compile(r"(<style[^>]*>)(.*?)(</style>)", re.S | re.I)
+_STYLE_ATTR = re.compile(r"""\sstyle\s*=\s*(["'])(.*?)\1""", re.S | re.I)
+# Selector compuesto simple: tag, .clase, #id o combinaciones (tag.clase)
+_COMPOUND = re.compile(r"^([a-zA-Z][a-zA-Z0-9]*)?((?:[.#][\w-]+)*)$")
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _minify(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _parse_declarations(body: str) -> list[tuple[str, str]]:
+    declarations = []
+    for item in body.split(";"):
+        prop, sep, value = item.partition(":")
+        if sep and prop.strip() and value.strip():
+            declarations.append((prop.strip().lower(), _minify(value)))
+    return declarations
+
+
+def _format_declarations(declarations: list[tuple[str, str]]) -> str:
+    return ";".join(f"{prop}:{value}" for prop, value in declarations)
+
+
+def _split_rules(css: str) -> list[tuple[str, str]]:
+    """Divide el CSS de primer nivel en pares (prelude, cuerpo), respetando bloques anidados."""
+    rules = []
+    index = 0
+    while True:
+        start = css.find("{", index)
+        if start == -1:
+            break
+        depth = 1
+        end = start + 1
+        while end < len(css) and depth:
+            depth += {"{": 1, "}": -1}.get(css[end], 0)
+            end += 1
+        rules.append((_minify(css[index:start]), css[start + 1:end - 1]))
+        index = end
+    return rules
+
+
+class SimpleSelector:
+    """Selector incrustable: compuestos simples unidos por el combinador descendiente."""
+
+    def __init__(self, parts: list[tuple[Optional[str], set[str], Optional[str]]]):
+        self.parts = parts
+        ids = sum(1 for _, _, element_id in parts if element_id)
+        classes = sum(len(class_names) for _, class_names, _ in parts)
+        types = sum(1 for tag, _, _ in parts if tag)
+        self.specificity = (ids, classes, types)
+
+    @classmethod
+    def parse(cls, selector: str) -> Optional["SimpleSelector"]:
+        parts = []
+        for compound in selector.split():
+            match = _COMPOUND.match(compound)
+            if not match or compound == "":
+                return None
+            tag, rest = match.group(1), match.group(2)
+            class_names = set(re.findall(r"\.([\w-]+)", rest))
+            ids = re.findall(r"#([\w-]+)", rest)
+            parts.append((tag.lower() if tag else None, class_names, ids[0] if ids else None))
+        return cls(parts) if parts else None
+
+    @staticmethod
+    def _matches(part, element: tuple[str, set[str], Optional[str]]) -> bool:
+        tag, class_names, element_id = part
+        el_tag, el_classes, el_id = element
+        return (tag is None or tag == el_tag) and class_names <= el_classes and (element_id is None or element_id == el_id)
+
+    def matches(self, stack: list[tuple[str, set[str], Optional[str]]]) -> bool:
+        """`stack` es la cadena de ancestros; el último elemento es el que se evalúa."""
+        if not stack or not self._matches(self.parts[-1], stack[-1]):
+            return False
+        position = len(stack) - 2
+        for part in reversed(self.parts[:-1]):
+            while position >= 0 and not self._matches(part, stack[position]):
+                position -= 1
+            if position < 0:
+                return False
+            position -= 1
+        return True
+
+
+class Stylesheet:
+    """Reglas CSS de una plantilla separadas en incrustables y residuales."""
+
+    def __init__(self, css: str):
+        self.inline_rules: list[tuple[SimpleSelector, int, list[tuple[str, str]]]] = []
+        residual = []
+        order = 0
+        for prelude, body in _split_rules(_COMMENT.sub("", css)):
+            if prelude.startswith("@"):
+                residual.append(f"{prelude}{{{self._important_block(body)}}}")
+                continue
+            declarations = _parse_declarations(body)
+            kept = []
+            for selector in (s.strip() for s in prelude.split(",")):
+                parsed = SimpleSelector.parse(selector) if selector != "*" else None
+                if parsed is None:
+                    kept.append(selector)
+                else:
+                    self.inline_rules.append((parsed, order, declarations))
+                    order += 1
+            if kept and declarations:
+                residual.append(f"{','.join(kept)}{{{_format_declarations(declarations)}}}")
+        self.residual_css = "\n".join(residual)
+
+    @staticmethod
+    def _important_block(css: str) -> str:
+        rules = []
+        for prelude, body in _split_rules(css):
+            declarations = [
+                (prop, value if value.endswith("!important") else f"{value}!important")
+                for prop, value in _parse_declarations(body)
+            ]
+            rules.append(f"{prelude}{{{_format_declarations(declarations)}}}")
+        return "\n".join(rules)
+
+    def styles_for(self, stack: list[tuple[str, set[str], Optional[str]]]) -> list[tuple[str, str]]:
+        """Declaraciones aplicables al último elemento de `stack`, en orden de cascada."""
+        matched = sorted(
+            (selector.specificity, order, declarations)
+            for selector, order, declarations in self.inline_rules
+            if selector.matches(stack)
+        )
+        merged: dict[str, str] = {}
+        for _, _, declarations in matched:
+            for prop, value in declarations:
+                merged.pop(prop, None)
+                merged[prop] = value
+        return list(merged.items())
+
+
+class _TemplateRewriter(HTMLParser):
+    """Reescribe el HTML de una plantilla incrustando estilos y compactando espacios."""
+
+    def __init__(self, stylesheet: Stylesheet):
+        super().__init__(convert_charrefs=False)
+        self.stylesheet = stylesheet
+        self.out: list[str] = []
+        self.stack: list[tuple[str, set[str], Optional[str]]] = []
+        self._pending = ""
+        self._after_block = True
+        self._raw_text = False
+        self._line = 0
+
+    def _emit(self, text: str) -> None:
+        self.out.append(text)
+        newline = text.rfind("\n")
+        self._line = len(text) - newline - 1 if newline != -1 else self._line + len(text)
+
+    def _break(self) -> None:
+        """Corta la línea en un límite de bloque, donde el salto no afecta al render."""
+        if self._line > LINE_WIDTH:
+            self._emit("\n")
+
+    def _flush(self, next_is_block: bool) -> None:
+        text = self._pending
+        self._pending = ""
+        if self._raw_text:
+            self._emit(text)
+            return
+        text = _WHITESPACE.sub(" ", text)
+        if self._after_block:
+            text = text.lstrip()
+        if next_is_block:
+            text = text.rstrip()
+        self._emit(text)
+        if next_is_block:
+            self._break()
+
+    def handle_decl(self, decl):
+        self._flush(True)
+        self._emit(f"<!{decl}>")
+
+    def handle_starttag(self, tag, attrs):
+        self._flush(tag in BLOCK_ELEMENTS)
+        attributes = dict(attrs)
+        element = (tag, set((attributes.get("class") or "").split()), attributes.get("id"))
+        self.stack.append(element)
+        self._emit(self._with_styles(self.get_starttag_text(), self.stylesheet.styles_for(self.stack)))
+        if tag in VOID_ELEMENTS:
+            self.stack.pop()
+        self._after_block = tag in BLOCK_ELEMENTS
+        if self._after_block and tag not in ("style", "script", "title"):
+            self._break()
+        self._raw_text = tag in ("style", "script")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        self._flush(tag in BLOCK_ELEMENTS)
+        self._raw_text = False
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                del self.stack[index:]
+                break
+        self._emit(f"</{tag}>")
+        self._after_block = tag in BLOCK_ELEMENTS
+        if self._after_block:
+            self._break()
+
+    def handle_data(self, data):
+        self._pending += data
+
+    def handle_entityref(self, name):
+        self._pending += f"&{name};"
+
+    def handle_charref(self, name):
+        self._pending += f"&#{name};"
+
+    def handle_comment(self, data):
+        # Se conservan solo los comentarios condicionales de Outlook
+        if data.lstrip().startswith("[if"):
+            self._flush(False)
+            self._emit(f"<!--{data}-->")
+
+    def close(self):
+        super().close()
+        self._flush(True)
+
+    @staticmethod
+    def _with_styles(start_tag: str, declarations: list[tuple[str, str]]) -> str:
+        start_tag = _WHITESPACE.sub(" ", start_tag)
+        if not declarations:
+            return start_tag
+        existing = _STYLE_ATTR.search(start_tag)
+        if existing:
+            # El estilo propio del elemento prevalece sobre las reglas del <style>
+            own = _parse_declarations(existing.group(2))
+            own_props = {prop for prop, _ in own}
+            merged = [(prop, value) for prop, value in declarations if prop not in own_props] + own
+            return f'{start_tag[:existing.start()]} style="{_format_declarations(merged)}"{start_tag[existing.end():]}'
+        close = -2 if start_tag.endswith("/>") else -1
+        return f'{start_tag[:close].rstrip()} style="{_format_declarations(declarations)}"{start_tag[close:]}'
+
+
+def build_template(source: str) -> str:
+    """Devuelve la plantilla con el CSS incrustado y el HTML minificado."""
+    css = "".join(match.group(2) for match in _STYLE_BLOCK.finditer(source))
+    stylesheet = Stylesheet(css)
+
+    # Un único <style> residual en el lugar del primero
+    blocks = iter(range(len(_STYLE_BLOCK.findall(source))))
+    source = _STYLE_BLOCK.sub(
+        lambda m: f"{m.group(1)}{stylesheet.residual_css}{m.group(3)}" if next(blocks) == 0 else "",
+        source,
+    )
+
+    rewriter = _TemplateRewriter(stylesheet)
+    rewriter.feed(source)
+    rewriter.close()
+    return "".join(rewriter.out)
+
+
+def load_manifest(build_dir: Path = BUILD_DIR) -> dict:
+    path = Path(build_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def build_templates(
+    templates_dir: Path = TEMPLATES_DIR,
+    build_dir: Path = BUILD_DIR,
+    names: tuple[str, ...] = EMAIL_TEMPLATES,
+) -> dict:
+    """
+    Construye las plantillas optimizadas y escribe el manifiesto.
+
+    Returns:
+        dict: **Manifiesto** por plantilla con checksum del fuente y tamaños en bytes.
+    """
+    templates_dir, build_dir = Path(templates_dir), Path(build_dir)
+    build_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for name in names:
+        source = (templates_dir / name).read_text(encoding="utf-8")
+        built = build_template(source)
+        (build_dir / name).write_text(built, encoding="utf-8")
+        manifest[name] = {
+            "source_sha256": sha256(source),
+            "source_bytes": len(source.encode("utf-8")),
+            "built_bytes": len(built.encode("utf-8")),
+        }
+    (build_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main():
+    manifest = build_templates()
+    print(f"🏗️  Plantillas construidas en {BUILD_DIR}\n")
+    for name, entry in manifest.items():
+        saved = 1 - entry["built_bytes"] / entry["source_bytes"]
+        print(f"📄 {name}: {entry['source_bytes']} → {entry['built_bytes']} bytes (-{saved:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
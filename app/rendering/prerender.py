@@ -0,0 +1,103 @@
+import itertools
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from jinja2 import Template
+
+from app.config import settings
+
+
+# Marcador que ocupa el lugar de cada campo por request en el esqueleto
+_SLOT_MARKER = "\x00{}\x00"
+_SLOT_PATTERN = re.compile("\x00(\\w+)\x00")
+
+
+def branding_context() -> dict[str, Any]:
+    """Contexto constante de las plantillas: solo depende de `settings`."""
+    return {
+        "app_name": settings.APP_NAME,
+        "company_name": settings.COMPANY_NAME,
+        "logo_url": settings.COMPANY_LOGO_URL,
+        "support_email": settings.SUPPORT_EMAIL,
+        "website_url": settings.WEBSITE_URL,
+    }
+
+
+@dataclass
+class PrerenderSpec:
+    """
+    Qué partes de una plantilla cambian por request.
+
+    Attributes:
+        slots (tuple[str, ...]): **Campos por request** que solo se imprimen (`{{ campo }}`).
+        variants (dict[str, tuple]): **Campos usados en condiciones** y sus valores posibles;
+            se precalcula un esqueleto por cada combinación.
+        static_context (Callable): **Contexto constante** evaluado al cargar la plantilla.
+    """
+
+    slots: tuple[str, ...]
+    variants: dict[str, tuple] = field(default_factory=dict)
+    static_context: Callable[[], dict[str, Any]] = branding_context
+
+
+class PrerenderedTemplate:
+    """
+    Plantilla evaluada parcialmente contra el contexto constante.
+
+    Al construirse se renderiza una vez por cada combinación de `variants`,
+    con un marcador en lugar de cada slot. El resultado se divide en partes
+    estáticas y nombres de slot, de modo que `render()` solo intercala los
+    valores del request: no evalúa expresiones ni recorre el CSS de nuevo.
+
+    Si el contexto trae un valor de variante no precalculado, se usa el
+    render completo de Jinja.
+    """
+
+    def __init__(self, template: Template, spec: PrerenderSpec):
+        self.template = template
+        self.spec = spec
+        self.static_context = spec.static_context()
+        self._variant_names = tuple(spec.variants)
+        self._skeletons: dict[tuple, tuple[tuple[str, ...], tuple[str, ...]]] = {}
+
+        slot_context = {name: _SLOT_MARKER.format(name) for name in spec.slots}
+        for values in itertools.product(*spec.variants.values()):
+            context = {**self.static_context, **slot_context, **dict(zip(self._variant_names, values))}
+            parts = _SLOT_PATTERN.split(template.render(context))
+            # Partes pares: HTML estático; impares: nombre del slot
+            self._skeletons[values] = (tuple(parts[0::2]), tuple(parts[1::2]))
+
+        self.fallbacks = 0
+
+    @property
+    def variant_count(self) -> int:
+        return len(self._skeletons)
+
+    def render(self, context: dict[str, Any]) -> str:
+        """Renderiza con los campos por request; los constantes se toman del esqueleto."""
+        key = tuple(context.get(name) for name in self._variant_names)
+        skeleton = self._skeletons.get(key)
+        if skeleton is None:
+            self.fallbacks += 1
+            return self.template.render({**self.static_context, **context})
+
+        static, slots = skeleton
+        pieces = [static[0]]
+        for index, name in enumerate(slots, start=1):
+            pieces.append(str(context[name]))
+            pieces.append(static[index])
+        return "".join(pieces)
+
+
+# Campos por request de cada plantilla de email
+EMAIL_PRERENDER_SPECS = {
+    "otp.html": PrerenderSpec(
+        slots=("otp_code", "expiry_minutes", "expiry_suffix", "redirect_url"),
+        variants={"show_expiry": (True, False), "show_redirect_button": (True, False)},
+    ),
+    "waitlist.html": PrerenderSpec(
+        slots=("user_name", "user_email", "website_url", "availability_message", "offerings_text_html"),
+        variants={"show_website_button": (True, False), "message_type": ("platform", "single", "multiple")},
+    ),
+}
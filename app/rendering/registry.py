@@ -0,0 +1,205 @@
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+from app.config import settings
+from app.observability import get_logger
+from app.observability.metrics import observe_phase
+from app.rendering.build import BUILD_DIR, EMAIL_TEMPLATES, TEMPLATES_DIR, load_manifest, sha256
+from app.rendering.prerender import EMAIL_PRERENDER_SPECS, PrerenderSpec, PrerenderedTemplate
+
+
+logger = get_logger(__name__)
+
+
+class BuiltTemplateLoader(FileSystemLoader):
+    """
+    Loader que sirve la versión optimizada de una plantilla si existe.
+
+    Solo se usa el artefacto de `build_dir` cuando el checksum registrado en
+    el manifiesto coincide con el fuente actual; si la plantilla cambió
+    después del build se carga el fuente y se avisa.
+    """
+
+    def __init__(self, templates_dir: Path, build_dir: Path):
+        super().__init__(templates_dir)
+        self.build_dir = Path(build_dir)
+        self.manifest = load_manifest(self.build_dir)
+        self.built: set[str] = set()
+        self.stale: set[str] = set()
+
+    def get_source(self, environment: Environment, template: str):
+        source, filename, uptodate = super().get_source(environment, template)
+        entry = self.manifest.get(template)
+        built_path = self.build_dir / template
+        if entry is None or not built_path.exists():
+            return source, filename, uptodate
+        if entry["source_sha256"] != sha256(source):
+            if template not in self.stale:
+                logger.warning("Plantilla modificada después del build; se usa el fuente sin optimizar",
+                               template=template)
+            self.stale.add(template)
+            return source, filename, uptodate
+        self.built.add(template)
+        return built_path.read_text(encoding="utf-8"), str(built_path), uptodate
+
+
+class TemplateRegistry:
+    """
+    Registro compartido de plantillas Jinja2 compiladas.
+
+    Un único `Environment` para toda la aplicación: las plantillas se compilan
+    una vez al iniciar (`load()`) y se sirven desde memoria en cada request.
+    El bytecode compilado se guarda en disco, de modo que un arranque en frío
+    no vuelve a parsear las plantillas. Sin `auto_reload` no se consulta el
+    sistema de archivos en cada render; los cambios se aplican con `reload()`.
+
+    Las plantillas con un `PrerenderSpec` se evalúan además parcialmente
+    contra el contexto constante (ver `PrerenderedTemplate`).
+
+    Attributes:
+        templates_dir (Path): **Directorio** de las plantillas.
+        names (tuple[str, ...]): **Plantillas** que se compilan al iniciar.
+        auto_reload (bool): **Verificar cambios** en disco en cada `get_template()`.
+    """
+
+    def __init__(
+        self,
+        templates_dir: Path = TEMPLATES_DIR,
+        names: tuple[str, ...] = EMAIL_TEMPLATES,
+        cache_dir: Optional[str] = None,
+        auto_reload: bool = False,
+        prerender_specs: Optional[dict[str, PrerenderSpec]] = None,
+        build_dir: Optional[Path] = None,
+    ):
+        self.templates_dir = Path(templates_dir)
+        self.names = names
+        self.cache_dir = cache_dir
+        self.auto_reload = auto_reload
+        self.prerender_specs = prerender_specs or {}
+        self.build_dir = build_dir
+
+        self._lock = threading.Lock()
+        self._templates: dict[str, Template] = {}
+        self._prerendered: dict[str, PrerenderedTemplate] = {}
+        self.env = self._create_environment()
+
+        # Métricas
+        self.loads = 0
+        self.reloads = 0
+        self.load_ms = 0.0
+
+    def _create_environment(self) -> Environment:
+        bytecode_cache = None
+        if self.cache_dir:
+            Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(self.cache_dir)
+        if self.build_dir:
+            loader = BuiltTemplateLoader(self.templates_dir, self.build_dir)
+        else:
+            loader = FileSystemLoader(self.templates_dir)
+        return Environment(
+            loader=loader,
+            auto_reload=self.auto_reload,
+            bytecode_cache=bytecode_cache,
+        )
+
+    def load(self) -> dict[str, Template]:
+        """Compila (o carga desde el bytecode en disco) todas las plantillas registradas."""
+        started = time.perf_counter()
+        templates = {name: self.env.get_template(name) for name in self.names}
+        prerendered = {
+            name: PrerenderedTemplate(templates.get(name) or self.env.get_template(name), spec)
+            for name, spec in self.prerender_specs.items()
+        }
+        with self._lock:
+            self._templates = templates
+            self._prerendered = prerendered
+            self.loads += 1
+            self.load_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info("Plantillas compiladas", count=len(templates), ms=self.load_ms,
+                    templates_dir=str(self.templates_dir))
+        for name, entry in self.stats()["built"].items():
+            logger.info("Plantilla optimizada en uso", template=name,
+                        source_bytes=entry["source_bytes"], built_bytes=entry["built_bytes"])
+        return templates
+
+    def reload(self) -> dict[str, Template]:
+        """
+        Vuelve a compilar las plantillas desde disco.
+
+        El bytecode en disco se indexa por el checksum del fuente, por lo que
+        las plantillas modificadas se recompilan y el resto se reutiliza.
+        """
+        self.env = self._create_environment()
+        templates = self.load()
+        with self._lock:
+            self.reloads += 1
+        return templates
+
+    def get(self, name: str) -> Template:
+        """Devuelve la plantilla compilada; si no se cargó al iniciar, la compila ahora."""
+        if self.auto_reload:
+            return self.env.get_template(name)
+        template = self._templates.get(name)
+        if template is None:
+            template = self.env.get_template(name)
+            with self._lock:
+                self._templates[name] = template
+        return template
+
+    def get_prerendered(self, name: str) -> PrerenderedTemplate:
+        """Devuelve la plantilla evaluada parcialmente; se construye al vuelo si aún no existe."""
+        prerendered = self._prerendered.get(name)
+        if prerendered is None:
+            prerendered = PrerenderedTemplate(self.get(name), self.prerender_specs[name])
+            with self._lock:
+                self._prerendered[name] = prerendered
+        return prerendered
+
+    def render(self, name: str, context: dict[str, Any]) -> str:
+        """Renderiza `name`; si tiene `PrerenderSpec` solo intercala los campos por request."""
+        started = time.perf_counter()
+        spec = self.prerender_specs.get(name)
+        if spec is None:
+            html = self.get(name).render(context)
+        elif self.auto_reload:
+            # En desarrollo los esqueletos quedarían obsoletos con cada cambio en disco
+            html = self.get(name).render({**spec.static_context(), **context})
+        else:
+            html = self.get_prerendered(name).render(context)
+        observe_phase("render", started)
+        return html
+
+    def stats(self) -> dict:
+        loader = self.env.loader
+        manifest = loader.manifest if isinstance(loader, BuiltTemplateLoader) else {}
+        return {
+            "templates": sorted(self._templates),
+            "built": {
+                name: {"source_bytes": entry["source_bytes"], "built_bytes": entry["built_bytes"]}
+                for name, entry in manifest.items()
+                if name in loader.built
+            },
+            "prerendered": {
+                name: {"variants": template.variant_count, "fallbacks": template.fallbacks}
+                for name, template in self._prerendered.items()
+            },
+            "auto_reload": self.auto_reload,
+            "bytecode_cache": self.cache_dir,
+            "loads": self.loads,
+            "reloads": self.reloads,
+            "last_load_ms": self.load_ms,
+        }
+
+
+# Instancia global compartida por los controladores OTP y waitlist
+template_registry = TemplateRegistry(
+    cache_dir=settings.TEMPLATE_CACHE_DIR or None,
+    auto_reload=settings.TEMPLATE_AUTO_RELOAD,
+    prerender_specs=EMAIL_PRERENDER_SPECS,
+    build_dir=BUILD_DIR if settings.TEMPLATE_USE_BUILD else None,
+)
@@ -0,0 +1,48 @@
+"""
+Módulo de transporte SMTP para SmtpMailer FastAPI.
+
+Proporciona pools de sesiones SMTP autenticadas compartidos por los
+controladores de OTP y waitlist, evitando repetir conexión, STARTTLS y
+AUTH en cada envío. Incluye un cliente SMTP nativo de asyncio y un
+transporte bloqueante (`smtplib`) seleccionables con `SMTP_TRANSPORT`.
+Los envíos se reparten entre uno o varios relays (`SMTP_RELAYS`) por peso,
+con verificación de salud y failover automático; un scheduler por
+presupuesto de envío atiende los OTP antes que el tráfico masivo. Los
+mensajes se serializan con `MessageTemplate`, que precodifica las partes
+estáticas del MIME; los envíos agrupados comparten una sesión con
+PIPELINING cuando el relay lo anuncia. `RelayProber` sondea los relays
+en segundo plano (conexión, EHLO y AUTH) y deja el resultado en caché para
+el readiness.
+"""
+
+from app.smtp.pool import SMTPConnectionPool, SMTPDataInterruptedError, SMTPPoolTimeoutError
+from app.smtp.async_client import AsyncSMTPClient
+from app.smtp.async_pool import AsyncSMTPConnectionPool
+from app.smtp.scheduler import PRIORITY_BULK, PRIORITY_OTP, SendBudgetExceededError
+from app.smtp.relays import NoRelayAvailableError, RelayConfig, Relay, RelayRouter, relay_router
+from app.smtp.mime import MessageTemplate
+from app.smtp.probe import RelayProber, relay_prober
+from app.smtp.transport import send_message, send_message_async, send_messages_async, active_pool_stats
+
+__all__ = [
+    "SMTPConnectionPool",
+    "SMTPPoolTimeoutError",
+    "SMTPDataInterruptedError",
+    "AsyncSMTPClient",
+    "AsyncSMTPConnectionPool",
+    "PRIORITY_BULK",
+    "PRIORITY_OTP",
+    "SendBudgetExceededError",
+    "NoRelayAvailableError",
+    "RelayConfig",
+    "Relay",
+    "RelayRouter",
+    "relay_router",
+    "MessageTemplate",
+    "RelayProber",
+    "relay_prober",
+    "send_message",
+    "send_message_async",
+    "send_messages_async",
+    "active_pool_stats",
+]
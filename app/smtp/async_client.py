@@ -0,0 +1,448 @@
+import asyncio
+import base64
+import smtplib
+import socket
+import ssl
+import time
+from typing import Optional, Sequence, Union
+
+from app.observability.metrics import observe_phase
+from app.observability.transcripts import transcript_command, transcript_event, transcript_reply
+from app.smtp.data import DATA_CHUNK_SIZE, MessageSource, iter_data_chunks
+from app.smtp.pool import SMTPDataInterruptedError
+from app.smtp.tls import ResumableSSLContext, get_ssl_context, tls_stats
+
+
+# Transacción de `send_many()`: remitente, destinatarios, mensaje y opciones de MAIL FROM
+Envelope = tuple[str, Union[str, Sequence[str]], MessageSource, Sequence[str]]
+
+class AsyncSMTPClient:
+    """
+    Cliente SMTP nativo de asyncio.
+
+    Implementa la conversación SMTP (EHLO, STARTTLS, AUTH, MAIL, RCPT, DATA)
+    sobre streams de asyncio, de modo que un envío en curso no bloquea un
+    worker del threadpool. Los errores se reportan con las mismas excepciones
+    de `smtplib` para que los controladores las manejen de forma uniforme.
+
+    Attributes:
+        esmtp_features (dict): **Extensiones ESMTP** anunciadas en el EHLO (claves en minúscula).
+        relay (str): **Relay** al que pertenece la sesión (etiqueta `relay` de las métricas).
+        data_started (bool): **Cuerpo enviado** sin respuesta al `.` todavía; si la sesión
+            se corta en ese punto, el relay pudo haber aceptado el mensaje.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        use_ssl: bool = False,
+        timeout: float = 30,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        local_hostname: str = "localhost",
+        relay: Optional[str] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.local_hostname = local_hostname
+        self.relay = relay or host
+
+        self.esmtp_features: dict[str, str] = {}
+        self.data_started = False
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    # ------------------------------------------------------------------
+    # Protocolo de bajo nivel
+    # ------------------------------------------------------------------
+
+    @property
+    def is_connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def _get_ssl_context(self) -> ssl.SSLContext:
+        if self.ssl_context is None:
+            self.ssl_context = get_ssl_context()
+        return self.ssl_context
+
+    async def _handshake(self) -> None:
+        """Negocia TLS sobre la conexión abierta y registra latencia, CPU y reanudación."""
+        started = time.perf_counter()
+        await asyncio.wait_for(
+            self._writer.start_tls(self._get_ssl_context(), server_hostname=self.host),
+            self.timeout,
+        )
+        observe_phase("tls", started, self.relay)
+        ssl_object = self._writer.get_extra_info("ssl_object")
+        if ssl_object is not None:
+            tls_stats.record(self.host, time.perf_counter() - started,
+                             getattr(ssl_object, "handshake_cpu", 0.0), ssl_object.session_reused)
+
+    def _store_tls_session(self) -> None:
+        """Guarda la sesión TLS (ya con el ticket de TLS 1.3) para la próxima conexión."""
+        context = self.ssl_context
+        ssl_object = self._writer.get_extra_info("ssl_object") if self._writer else None
+        if isinstance(context, ResumableSSLContext) and ssl_object is not None:
+            context.store_session(self.host, ssl_object.session)
+
+    async def _read_reply(self) -> tuple[int, bytes]:
+        """Lee una respuesta SMTP completa (posiblemente multilínea)."""
+        if self._reader is None:
+            raise smtplib.SMTPServerDisconnected("Sin conexión al servidor SMTP")
+
+        lines = []
+        while True:
+            try:
+                line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            except asyncio.TimeoutError:
+                self.close()
+                raise smtplib.SMTPServerDisconnected("Timeout esperando respuesta del servidor SMTP")
+            if not line:
+                self.close()
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+            try:
+                code = int(line[:3])
+            except ValueError:
+                self.close()
+                raise smtplib.SMTPServerDisconnected(f"Respuesta SMTP inválida: {line!r}")
+
+            lines.append(line[4:].rstrip(b"\r\n"))
+            if line[3:4] != b"-":
+                message = b"\n".join(lines)
+                transcript_reply(code, message)
+                return code, message
+
+    async def _write(self, data: bytes) -> None:
+        if not self.is_connected:
+            raise smtplib.SMTPServerDisconnected("Sin conexión al servidor SMTP")
+        self._writer.write(data)
+        await self._drain()
+
+    async def _write_data(self, msg: MessageSource) -> None:
+        """Escribe el contenido de DATA por fragmentos, esperando el drain cada `DATA_CHUNK_SIZE` bytes."""
+        if not self.is_connected:
+            raise smtplib.SMTPServerDisconnected("Sin conexión al servidor SMTP")
+        pending = size = 0
+        for chunk in iter_data_chunks(msg):
+            self._writer.write(chunk)
+            pending += len(chunk)
+            if pending >= DATA_CHUNK_SIZE:
+                await self._drain()
+                size += pending
+                pending = 0
+        await self._drain()
+        transcript_event(f"<{size + pending} bytes>")
+
+    async def _drain(self) -> None:
+        try:
+            await asyncio.wait_for(self._writer.drain(), self.timeout)
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            self.close()
+            raise smtplib.SMTPServerDisconnected(f"Error escribiendo al servidor SMTP: {e}")
+
+    async def command(self, cmd: str, encoding: str = "ascii") -> tuple[int, bytes]:
+        """Envía un comando SMTP y devuelve `(código, mensaje)` de la respuesta."""
+        transcript_command(cmd)
+        await self._write(cmd.encode(encoding) + b"\r\n")
+        return await self._read_reply()
+
+    # ------------------------------------------------------------------
+    # Conversación SMTP
+    # ------------------------------------------------------------------
+
+    async def _open_connection(self) -> None:
+        """Resuelve el host y se conecta a la primera dirección que responda, midiendo cada fase."""
+        started = time.perf_counter()
+        addresses = await asyncio.get_running_loop().getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        observe_phase("dns", started, self.relay)
+
+        started = time.perf_counter()
+        error: OSError = OSError(f"Sin direcciones para {self.host}")
+        for *_, sockaddr in addresses:
+            try:
+                self._reader, self._writer = await asyncio.open_connection(sockaddr[0], self.port)
+            except OSError as e:
+                error = e
+                continue
+            observe_phase("connect", started, self.relay)
+            return
+        raise error
+
+    async def connect(self) -> None:
+        """Abre la conexión, aplica TLS, negocia EHLO y autentica si hay credenciales."""
+        try:
+            await asyncio.wait_for(self._open_connection(), self.timeout)
+            if self.use_ssl:
+                # TLS implícito (puerto 465): handshake antes del saludo del servidor
+                await self._handshake()
+        except asyncio.TimeoutError:
+            self.close()
+            raise TimeoutError(f"Timeout conectando a {self.host}:{self.port}")
+
+        code, msg = await self._read_reply()
+        if code != 220:
+            self.close()
+            raise smtplib.SMTPConnectError(code, msg)
+
+        await self.ehlo()
+
+        if self.use_tls and not self.use_ssl:
+            await self.starttls()
+
+        if self.use_ssl or self.use_tls:
+            self._store_tls_session()
+
+        if self.username and self.password:
+            started = time.perf_counter()
+            await self.login(self.username, self.password)
+            observe_phase("auth", started, self.relay)
+
+    async def ehlo(self) -> None:
+        """Envía EHLO y registra las extensiones ESMTP anunciadas."""
+        code, msg = await self.command(f"EHLO {self.local_hostname}")
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, msg)
+
+        features = {}
+        for line in msg.decode("latin-1").split("\n")[1:]:
+            parts = line.strip().split(None, 1)
+            if parts:
+                features[parts[0].lower()] = parts[1] if len(parts) > 1 else ""
+        self.esmtp_features = features
+
+    def has_extn(self, name: str) -> bool:
+        return name.lower() in self.esmtp_features
+
+    async def starttls(self) -> None:
+        """Actualiza la conexión a TLS con STARTTLS y repite el EHLO."""
+        if not self.has_extn("starttls"):
+            raise smtplib.SMTPNotSupportedError("El servidor no soporta STARTTLS")
+
+        code, msg = await self.command("STARTTLS")
+        if code != 220:
+            raise smtplib.SMTPResponseException(code, msg)
+
+        await self._handshake()
+        await self.ehlo()
+
+    async def login(self, username: str, password: str) -> None:
+        """Autentica con AUTH PLAIN o, si no se anuncia, con AUTH LOGIN."""
+        methods = self.esmtp_features.get("auth", "").upper().split()
+
+        if "PLAIN" in methods or not methods:
+            token = base64.b64encode(f"\0{username}\0{password}".encode("utf-8")).decode("ascii")
+            code, msg = await self.command(f"AUTH PLAIN {token}")
+        else:
+            code, msg = await self.command("AUTH LOGIN")
+            if code == 334:
+                code, msg = await self.command(base64.b64encode(username.encode("utf-8")).decode("ascii"))
+            if code == 334:
+                code, msg = await self.command(base64.b64encode(password.encode("utf-8")).decode("ascii"))
+
+        if code not in (235, 503):
+            raise smtplib.SMTPAuthenticationError(code, msg)
+
+    async def rset(self) -> None:
+        try:
+            await self.command("RSET")
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+    async def sendmail(
+        self,
+        from_addr: str,
+        to_addrs: Union[str, Sequence[str]],
+        msg: MessageSource,
+        mail_options: Sequence[str] = (),
+    ) -> dict:
+        """
+        Envía un mensaje: MAIL FROM, RCPT TO por destinatario y DATA.
+
+        `mail_options` se agregan al MAIL FROM (p. ej. `BODY=8BITMIME`,
+        `SMTPUTF8`); con SMTPUTF8 los comandos viajan en UTF-8.
+
+        Returns:
+            dict: Destinatarios rechazados con su `(código, mensaje)`; vacío si todos fueron aceptados.
+
+        Raises:
+            smtplib.SMTPSenderRefused: Si el servidor rechaza el remitente.
+            smtplib.SMTPRecipientsRefused: Si todos los destinatarios son rechazados.
+            smtplib.SMTPDataError: Si el servidor rechaza el contenido del mensaje.
+        """
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        encoding = "utf-8" if "SMTPUTF8" in mail_options else "ascii"
+        options = "".join(f" {option}" for option in mail_options)
+
+        code, resp = await self.command(f"MAIL FROM:<{from_addr}>{options}", encoding)
+        if code != 250:
+            await self.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+        refused = {}
+        for addr in to_addrs:
+            code, resp = await self.command(f"RCPT TO:<{addr}>", encoding)
+            if code not in (250, 251):
+                refused[addr] = (code, resp)
+        if len(refused) == len(to_addrs):
+            await self.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        started = time.perf_counter()
+        code, resp = await self.command("DATA")
+        if code != 354:
+            await self.rset()
+            raise smtplib.SMTPDataError(code, resp)
+
+        self.data_started = True
+        await self._write_data(msg)
+        code, resp = await self._read_reply()
+        self.data_started = False
+        observe_phase("data", started, self.relay)
+        if code != 250:
+            await self.rset()
+            raise smtplib.SMTPDataError(code, resp)
+
+        return refused
+
+    async def send_many(self, envelopes: Sequence[Envelope]) -> list[Union[dict, Exception]]:
+        """
+        Envía varios mensajes seguidos en la misma sesión.
+
+        Si el servidor anuncia PIPELINING (RFC 2920), cada transacción se
+        escribe como un solo grupo (MAIL FROM, los RCPT TO y DATA) y la
+        respuesta al `.` del mensaje anterior se lee junto con las del grupo
+        siguiente: cada mensaje cuesta un viaje de ida y vuelta en lugar de
+        tres más uno por destinatario. Sin PIPELINING se usa `sendmail()` por
+        mensaje.
+
+        Un rechazo afecta solo a su transacción: se cierra con RSET y se sigue
+        con la siguiente.
+
+        Args:
+            envelopes (Sequence[Envelope]): **Transacciones** como
+                `(remitente, destinatarios, mensaje, opciones de MAIL FROM)`.
+
+        Returns:
+            list[dict | Exception]: Por transacción y en el mismo orden, los destinatarios
+                rechazados (como `sendmail()`) o la excepción de `smtplib` que la hizo
+                fallar. Si la sesión se corta, la transacción que ya envió su cuerpo
+                recibe `SMTPDataInterruptedError` y las demás sin confirmar,
+                `SMTPServerDisconnected`.
+        """
+        results: list[Union[dict, Exception]] = []
+        try:
+            if self.has_extn("pipelining"):
+                await self._send_pipelined(envelopes, results)
+            else:
+                for from_addr, to_addrs, msg, mail_options in envelopes:
+                    try:
+                        results.append(await self.sendmail(from_addr, to_addrs, msg, mail_options))
+                    except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                        results.append(e)
+        except smtplib.SMTPServerDisconnected as e:
+            if self.data_started:
+                # El relay pudo haber aceptado el mensaje en curso: no debe reenviarse
+                results.append(SMTPDataInterruptedError(f"Sesión cortada durante DATA: {e}"))
+            results.extend([e] * (len(envelopes) - len(results)))
+        return results
+
+    async def _send_pipelined(self, envelopes: Sequence[Envelope], results: list) -> None:
+        """Conversación de `send_many()` con PIPELINING; agrega los resultados a `results`."""
+        in_flight: Optional[tuple[dict, float]] = None  # Mensaje cuyo "." aún no se confirmó: (rechazados, inicio)
+        needs_reset = False
+
+        for from_addr, to_addrs, msg, mail_options in envelopes:
+            if isinstance(to_addrs, str):
+                to_addrs = [to_addrs]
+            encoding = "utf-8" if "SMTPUTF8" in mail_options else "ascii"
+            options = "".join(f" {option}" for option in mail_options)
+            commands = [f"MAIL FROM:<{from_addr}>{options}", *(f"RCPT TO:<{addr}>" for addr in to_addrs), "DATA"]
+            if needs_reset:
+                commands.insert(0, "RSET")
+            for command in commands:
+                transcript_command(command)
+            await self._write(b"".join(command.encode(encoding) + b"\r\n" for command in commands))
+
+            if in_flight is not None:
+                results.append(await self._finish_data(*in_flight))
+                in_flight = None
+            if needs_reset:
+                await self._read_reply()
+                needs_reset = False
+
+            mail_code, mail_resp = await self._read_reply()
+            refused = {}
+            for addr in to_addrs:
+                code, resp = await self._read_reply()
+                if code not in (250, 251):
+                    refused[addr] = (code, resp)
+            data_code, data_resp = await self._read_reply()
+
+            if mail_code != 250:
+                error = smtplib.SMTPSenderRefused(mail_code, mail_resp, from_addr)
+            elif len(refused) == len(to_addrs):
+                error = smtplib.SMTPRecipientsRefused(refused)
+            elif data_code != 354:
+                error = smtplib.SMTPDataError(data_code, data_resp)
+            else:
+                started = time.perf_counter()
+                self.data_started = True
+                await self._write_data(msg)
+                in_flight = (refused, started)
+                continue
+
+            if data_code == 354:
+                # DATA aceptado sin transacción válida: se cierra con un mensaje vacío
+                transcript_command(".")
+                await self._write(b".\r\n")
+                await self._read_reply()
+            results.append(error)
+            needs_reset = True
+
+        if in_flight is not None:
+            results.append(await self._finish_data(*in_flight))
+        if needs_reset:
+            # La última transacción fue rechazada: la sesión vuelve al pool sin un MAIL abierto
+            await self.rset()
+
+    async def _finish_data(self, refused: dict, started: float) -> Union[dict, Exception]:
+        """Lee la respuesta al `.` de un mensaje; un rechazo termina la transacción sin RSET."""
+        code, resp = await self._read_reply()
+        self.data_started = False
+        observe_phase("data", started, self.relay)
+        if code != 250:
+            return smtplib.SMTPDataError(code, resp)
+        return refused
+
+    async def noop(self) -> tuple[int, bytes]:
+        return await self.command("NOOP")
+
+    async def quit(self) -> None:
+        """Cierra la sesión de forma ordenada (QUIT) ignorando errores."""
+        try:
+            if self.is_connected:
+                await self.command("QUIT")
+        except Exception:
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+        self._reader = None
+        self._writer = None
@@ -0,0 +1,376 @@
+import asyncio
+import smtplib
+import ssl
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, Sequence, Union
+
+from app.observability import get_logger
+from app.smtp.async_client import AsyncSMTPClient
+from app.smtp.mime import negotiate_transfer
+from app.smtp.pool import RECONNECTABLE_ERRORS, SMTPDataInterruptedError, SMTPPoolTimeoutError
+
+
+logger = get_logger(__name__)
+
+
+class AsyncPooledSMTPConnection:
+    """Sesión SMTP asíncrona administrada por el pool, con sus metadatos de uso."""
+
+    def __init__(self, client: AsyncSMTPClient):
+        self.client = client
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_used
+
+    async def is_alive(self) -> bool:
+        """Verifica la sesión con un comando NOOP."""
+        try:
+            code, _ = await self.client.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        await self.client.quit()
+
+
+class AsyncSMTPConnectionPool:
+    """
+    Pool de sesiones SMTP autenticadas para el transporte asyncio.
+
+    Equivalente asíncrono de `SMTPConnectionPool`: mismas reglas de
+    reutilización (NOOP, idle timeout, límite de mensajes por sesión) y
+    reconexión transparente, pero sin ocupar workers del threadpool. Las
+    sesiones quedan ligadas al event loop que las creó; si el loop cambia
+    (por ejemplo, entre clientes de prueba) el pool se reinicia.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        use_ssl: bool = False,
+        timeout: float = 30,
+        min_size: int = 0,
+        max_size: int = 4,
+        idle_timeout: float = 60,
+        noop_interval: float = 15,
+        max_messages_per_session: int = 100,
+        acquire_timeout: float = 30,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        client_factory: Optional[Callable[[], Awaitable[AsyncSMTPClient]]] = None,
+        name: Optional[str] = None,
+    ):
+        self.host = host
+        self.name = name or host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.noop_interval = noop_interval
+        self.max_messages_per_session = max(1, max_messages_per_session)
+        self.acquire_timeout = acquire_timeout
+        self.ssl_context = ssl_context
+        self._client_factory = client_factory or self._open_client
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cond: Optional[asyncio.Condition] = None
+        self._idle: deque[AsyncPooledSMTPConnection] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+
+        # Métricas del pool
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.discarded = 0
+        self.reconnects = 0
+
+    def _ensure_loop(self) -> asyncio.Condition:
+        """Asocia el pool al event loop actual, reiniciándolo si cambió."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Las sesiones del loop anterior no pueden reutilizarse
+            for conn in self._idle:
+                conn.client.close()
+            self._idle.clear()
+            self._size = 0
+            self._in_use = 0
+            self._closed = False
+            self._loop = loop
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def _open_client(self) -> AsyncSMTPClient:
+        client = AsyncSMTPClient(
+            self.host,
+            self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            use_ssl=self.use_ssl,
+            timeout=self.timeout,
+            ssl_context=self.ssl_context,
+            relay=self.name,
+        )
+        await client.connect()
+        return client
+
+    async def _create_connection(self) -> AsyncPooledSMTPConnection:
+        client = await self._client_factory()
+        self.created += 1
+        return AsyncPooledSMTPConnection(client)
+
+    async def _discard(self, conn: AsyncPooledSMTPConnection) -> None:
+        await conn.close()
+        cond = self._ensure_loop()
+        async with cond:
+            self._size -= 1
+            self.discarded += 1
+            cond.notify()
+
+    async def _checkout(self) -> AsyncPooledSMTPConnection:
+        """Obtiene una sesión reutilizable o reserva lugar para una nueva."""
+        cond = self._ensure_loop()
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            async with cond:
+                if self._closed:
+                    raise RuntimeError("El pool SMTP está cerrado")
+
+                candidate = self._idle.pop() if self._idle else None
+                reserve_new = False
+
+                if candidate is None:
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self._in_use += 1
+                        self.misses += 1
+                        reserve_new = True
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise SMTPPoolTimeoutError(
+                                f"Sin sesiones SMTP disponibles tras {self.acquire_timeout}s"
+                            )
+                        try:
+                            await asyncio.wait_for(cond.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                else:
+                    self._in_use += 1
+
+            if reserve_new:
+                try:
+                    return await self._create_connection()
+                except BaseException:
+                    async with cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        cond.notify()
+                    raise
+
+            idle = candidate.idle_seconds()
+            reusable = idle < self.idle_timeout and (
+                idle < self.noop_interval or await candidate.is_alive()
+            )
+            if reusable:
+                self.hits += 1
+                return candidate
+
+            self._in_use -= 1
+            await self._discard(candidate)
+
+    async def _checkin(self, conn: AsyncPooledSMTPConnection, broken: bool = False) -> None:
+        """Devuelve una sesión al pool o la recicla si ya no debe reutilizarse."""
+        conn.last_used = time.monotonic()
+        recycle = broken or self._closed or conn.messages_sent >= self.max_messages_per_session
+        self._in_use -= 1
+
+        if recycle:
+            await self._discard(conn)
+            return
+
+        cond = self._ensure_loop()
+        async with cond:
+            self._idle.append(conn)
+            cond.notify()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncPooledSMTPConnection]:
+        """Context manager asíncrono que presta una sesión SMTP autenticada."""
+        conn = await self._checkout()
+        broken = False
+        try:
+            yield conn
+        except BaseException as e:
+            # Los rechazos del servidor dejan la sesión utilizable (se envía RSET)
+            broken = not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused))
+            raise
+        finally:
+            await self._checkin(conn, broken=broken)
+
+    async def sendmail(
+        self,
+        from_addr: str,
+        to_addrs: Union[str, Sequence[str]],
+        msg: Union[str, bytes],
+    ) -> dict:
+        """
+        Envía un mensaje usando una sesión del pool, reconectando una vez si el relay la cerró.
+
+        Como en el pool bloqueante, un corte después de empezar el cuerpo no se
+        reintenta (`SMTPDataInterruptedError`). La codificación del cuerpo se
+        adapta a las extensiones del relay (8BITMIME, SMTPUTF8).
+
+        Returns:
+            dict: Destinatarios rechazados (vacío si todos fueron aceptados).
+        """
+        for attempt in range(2):
+            client = None
+            try:
+                async with self.connection() as conn:
+                    client = conn.client
+                    data, options = negotiate_transfer(msg, from_addr, to_addrs, client.esmtp_features)
+                    result = await client.sendmail(from_addr, to_addrs, data, options)
+                    conn.messages_sent += 1
+                    return result
+            except RECONNECTABLE_ERRORS as e:
+                if client is not None and client.data_started:
+                    raise SMTPDataInterruptedError(f"Sesión cortada durante DATA: {e}") from e
+                if attempt:
+                    raise
+                self.reconnects += 1
+                logger.warning("Sesión SMTP asíncrona cerrada por el relay, reconectando", host=self.host)
+
+    async def send_many(
+        self,
+        messages: Sequence[tuple[str, Union[str, Sequence[str]], Union[str, bytes]]],
+    ) -> list[Union[dict, Exception]]:
+        """
+        Envía varios mensajes por sesiones del pool (con PIPELINING si el relay lo anuncia).
+
+        Cada sesión recibe como máximo lo que le queda de `max_messages_per_session`;
+        el resto del grupo sigue en la siguiente sesión. Si una sesión se corta,
+        los mensajes sin confirmar que no llegaron a enviar el cuerpo se reintentan
+        una vez en una sesión nueva, igual que en `sendmail()`; el que estaba en
+        DATA se devuelve como `SMTPDataInterruptedError`.
+
+        Args:
+            messages (Sequence[tuple]): **Mensajes** como `(remitente, destinatarios, mensaje)`.
+
+        Returns:
+            list[dict | Exception]: Por mensaje, los destinatarios rechazados o el error de envío.
+        """
+        results: list[Union[dict, Exception, None]] = [None] * len(messages)
+        pending = list(range(len(messages)))
+        reconnected = False
+        while pending:
+            try:
+                conn = await self._checkout()
+            except RECONNECTABLE_ERRORS as e:
+                if reconnected:
+                    for index in pending:
+                        results[index] = e
+                    break
+                reconnected = True
+                self.reconnects += 1
+                logger.warning("No se pudo abrir sesión SMTP asíncrona, reintentando", host=self.host, error=str(e))
+                continue
+
+            allowance = max(1, self.max_messages_per_session - conn.messages_sent)
+            chunk, pending = pending[:allowance], pending[allowance:]
+            broken = True
+            try:
+                envelopes, sendable = [], []
+                for index in chunk:
+                    from_addr, to_addrs, msg = messages[index]
+                    try:
+                        data, options = negotiate_transfer(msg, from_addr, to_addrs, conn.client.esmtp_features)
+                    except smtplib.SMTPNotSupportedError as e:
+                        results[index] = e
+                        continue
+                    envelopes.append((from_addr, to_addrs, data, options))
+                    sendable.append(index)
+
+                outcomes = await conn.client.send_many(envelopes)
+                broken = not conn.client.is_connected
+                conn.messages_sent += sum(1 for outcome in outcomes if isinstance(outcome, dict))
+            finally:
+                await self._checkin(conn, broken=broken)
+
+            retry = []
+            for index, outcome in zip(sendable, outcomes):
+                results[index] = outcome
+                if isinstance(outcome, RECONNECTABLE_ERRORS) and not isinstance(outcome, SMTPDataInterruptedError):
+                    retry.append(index)
+            if retry and not reconnected:
+                reconnected = True
+                self.reconnects += 1
+                logger.warning("Sesión SMTP asíncrona cerrada por el relay, reenviando en una sesión nueva",
+                               host=self.host, messages=len(retry))
+                pending = retry + pending
+        return results
+
+    async def warm_up(self) -> int:
+        """Abre sesiones hasta alcanzar `min_size`."""
+        cond = self._ensure_loop()
+        opened = 0
+        while not self._closed and self._size < min(self.min_size, self.max_size):
+            self._size += 1
+            try:
+                conn = await self._create_connection()
+            except BaseException:
+                self._size -= 1
+                raise
+            async with cond:
+                self._idle.append(conn)
+                cond.notify()
+            opened += 1
+        return opened
+
+    async def close(self) -> None:
+        """Cierra todas las sesiones ociosas y marca el pool como cerrado."""
+        if self._loop is None:
+            return
+        self._closed = True
+        idle = list(self._idle)
+        self._idle.clear()
+        for conn in idle:
+            await conn.close()
+            self._size -= 1
+            self.discarded += 1
+
+    def stats(self) -> dict:
+        """Métricas del pool: hits/misses, sesiones abiertas, ociosas y en uso."""
+        total = self.hits + self.misses
+        return {
+            "host": self.host,
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "created": self.created,
+            "discarded": self.discarded,
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,158 @@
+import smtplib
+import socket
+import time
+from typing import Iterable, Iterator, Union
+
+from app.observability.metrics import observe_phase
+from app.observability.transcripts import transcript_command, transcript_event, transcript_reply
+
+
+CRLF = b"\r\n"
+
+# Tamaño máximo de cada escritura al socket durante DATA
+DATA_CHUNK_SIZE = 64 * 1024
+
+MessageSource = Union[str, bytes, bytearray, Iterable[bytes]]
+
+
+def _normalize_eols(msg: bytes) -> bytes:
+    """Convierte `\\r` y `\\n` sueltos a CRLF; solo copia si el mensaje los contiene."""
+    crlf = msg.count(CRLF)
+    if msg.count(b"\n") == crlf and msg.count(b"\r") == crlf:
+        return msg
+    return msg.replace(CRLF, b"\n").replace(b"\r", b"\n").replace(b"\n", CRLF)
+
+
+def _slices(view: memoryview, start: int, end: int, chunk_size: int) -> Iterator[memoryview]:
+    for offset in range(start, end, chunk_size):
+        yield view[offset:min(offset + chunk_size, end)]
+
+
+def iter_data_chunks(msg: MessageSource, chunk_size: int = DATA_CHUNK_SIZE) -> Iterator[Union[bytes, memoryview]]:
+    """
+    Recorre el contenido de DATA listo para el socket, sin copiar el mensaje.
+
+    Aplica dot-stuffing (RFC 5321 §4.5.2) de forma incremental: entrega
+    `memoryview`s del buffer original y un `b"."` adicional antes de cada
+    línea que empieza con punto. Termina con CRLF (si falta) y `.` CRLF.
+
+    Args:
+        msg (str | bytes | Iterable[bytes]): **Mensaje** completo o en partes; las
+            partes de un generador deben venir ya con CRLF.
+        chunk_size (int): **Tamaño máximo** de cada fragmento entregado.
+    """
+    if isinstance(msg, str):
+        msg = msg.encode("utf-8")
+    if isinstance(msg, (bytes, bytearray)):
+        chunks: Iterable[bytes] = (_normalize_eols(bytes(msg)),)
+    else:
+        chunks = msg
+
+    at_line_start = True
+    tail = b""
+    for buffer in chunks:
+        if not buffer:
+            continue
+        view = memoryview(buffer)
+        if at_line_start and buffer[:1] == b".":
+            yield b"."
+        start = 0
+        position = buffer.find(b"\n.")
+        while position != -1:
+            end = position + 1
+            yield from _slices(view, start, end, chunk_size)
+            yield b"."
+            start = end
+            position = buffer.find(b"\n.", end)
+        yield from _slices(view, start, len(buffer), chunk_size)
+
+        at_line_start = buffer.endswith(b"\n")
+        tail = (tail + bytes(buffer[-2:]))[-2:]
+
+    if tail != CRLF:
+        yield CRLF
+    yield b"." + CRLF
+
+
+class StreamingDataMixin:
+    """
+    Reemplaza `smtplib.SMTP.data()` por una versión que escribe el mensaje por fragmentos.
+
+    `smtplib` aplica dot-stuffing con una expresión regular sobre una copia
+    completa del mensaje y la envía de una vez; aquí se envían las vistas
+    de `iter_data_chunks()` directamente al socket.
+
+    También mide la resolución DNS y la conexión por separado y registra
+    comandos y respuestas en la transcripción SMTP en curso.
+    """
+
+    data_chunk_size = DATA_CHUNK_SIZE
+    # Se activa al empezar a enviar el cuerpo: desde ahí el relay pudo haber aceptado el mensaje
+    data_started = False
+
+    def __init__(self, *args, relay: str = "-", **kwargs):
+        # Etiqueta `relay` de las métricas; antes de `super().__init__()`, que ya conecta
+        self.relay = relay
+        super().__init__(*args, **kwargs)
+
+    def _get_socket(self, host, port, timeout):
+        started = time.perf_counter()
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        observe_phase("dns", started, self.relay)
+
+        started = time.perf_counter()
+        error: OSError = OSError(f"Sin direcciones para {host}")
+        for *_, sockaddr in addresses:
+            try:
+                # Con SMTP_SSL el handshake usa el nombre original (`self._host`)
+                sock = super()._get_socket(sockaddr[0], port, timeout)
+            except OSError as e:
+                error = e
+                continue
+            observe_phase("connect", started, self.relay)
+            return sock
+        raise error
+
+    def putcmd(self, cmd, args=""):
+        transcript_command(f"{cmd} {args}" if args else cmd)
+        super().putcmd(cmd, args)
+
+    def getreply(self):
+        code, message = super().getreply()
+        transcript_reply(code, message)
+        return code, message
+
+    def mail(self, sender, options=()):
+        self.data_started = False
+        return super().mail(sender, options)
+
+    def data(self, msg: MessageSource) -> tuple[int, bytes]:
+        started = time.perf_counter()
+        self.putcmd("data")
+        code, reply = self.getreply()
+        if code != 354:
+            raise smtplib.SMTPDataError(code, reply)
+        if not self.sock:
+            raise smtplib.SMTPServerDisconnected("please run connect() first")
+        self.data_started = True
+        size = 0
+        try:
+            for chunk in iter_data_chunks(msg, self.data_chunk_size):
+                self.sock.sendall(chunk)
+                size += len(chunk)
+        except OSError:
+            # Igual que `smtplib.SMTP.send()`
+            self.close()
+            raise smtplib.SMTPServerDisconnected("Server not connected")
+        transcript_event(f"<{size} bytes>")
+        reply = self.getreply()
+        observe_phase("data", started, self.relay)
+        return reply
+
+
+class StreamingSMTP(StreamingDataMixin, smtplib.SMTP):
+    """`smtplib.SMTP` con DATA por fragmentos."""
+
+
+class StreamingSMTP_SSL(StreamingDataMixin, smtplib.SMTP_SSL):
+    """`smtplib.SMTP_SSL` con DATA por fragmentos."""
@@ -0,0 +1,234 @@
+import binascii
+import random
+import smtplib
+import threading
+import time
+from email import policy
+from email.header import Header
+from email.parser import BytesParser
+from email.utils import formataddr, formatdate, make_msgid
+from typing import Optional, Sequence, Union
+
+from app.observability.metrics import observe_phase
+
+
+CRLF = b"\r\n"
+
+# Límite de línea de RFC 5321 §4.5.3.1.6 (sin contar CRLF) para cuerpos 7bit/8bit
+MAX_LINE_OCTETS = 998
+
+CTE_7BIT = "7bit"
+CTE_8BIT = "8bit"
+CTE_QUOTED_PRINTABLE = "quoted-printable"
+
+
+def _encode_header(name: str, value: str, raw_utf8: bool = False) -> bytes:
+    """
+    Codifica una cabecera como RFC 2047 si no es ASCII, plegada a 78 columnas.
+
+    Con `raw_utf8` se escribe en UTF-8 sin codificar (RFC 6532), necesario
+    para direcciones internacionalizadas que solo viajan con SMTPUTF8.
+    """
+    if value.isascii() or raw_utf8:
+        return f"{name}: {value}".encode("utf-8") + CRLF
+    encoded = Header(value, "utf-8", header_name=name).encode(linesep="\r\n")
+    return f"{name}: {encoded}".encode("ascii") + CRLF
+
+
+def _new_boundary() -> str:
+    # Mismo formato que `email.generator`: '=' seguido de otro carácter nunca aparece en quoted-printable
+    return "=" * 15 + f"{random.randrange(10 ** 19):019d}" + "=="
+
+
+def encode_qp_body(data: bytes) -> bytes:
+    """Cuerpo en quoted-printable con líneas de hasta 76 caracteres terminadas en CRLF."""
+    return binascii.b2a_qp(data.replace(CRLF, b"\n"), istext=True).replace(b"\n", CRLF)
+
+
+def encode_body(text: str) -> tuple[str, bytes]:
+    """
+    Elige la codificación de transferencia más compacta para un cuerpo de texto.
+
+    El texto se envía tal cual (7bit si es ASCII, 8bit si no) mientras
+    ninguna línea supere 998 octetos; si no, se usa quoted-printable, que
+    mantiene el mensaje legible y crece mucho menos que base64 para texto
+    mayormente ASCII.
+
+    Returns:
+        tuple[str, bytes]: Content-Transfer-Encoding y cuerpo codificado con CRLF.
+    """
+    data = text.replace("\r\n", "\n").replace("\n", "\r\n").encode("utf-8")
+    if max(map(len, data.split(CRLF))) <= MAX_LINE_OCTETS:
+        return (CTE_7BIT if data.isascii() else CTE_8BIT), data
+    return CTE_QUOTED_PRINTABLE, encode_qp_body(data)
+
+
+def downgrade_8bit(msg: bytes) -> bytes:
+    """
+    Recodifica las partes 8bit de un mensaje como quoted-printable.
+
+    Solo se usa con relays que no anuncian 8BITMIME (RFC 6152).
+    """
+    message = BytesParser(policy=policy.SMTP).parsebytes(msg)
+    for part in message.walk():
+        if part.is_multipart() or part.get("Content-Transfer-Encoding", "").lower() != CTE_8BIT:
+            continue
+        payload = part.get_payload(decode=True)
+        part.set_payload(encode_qp_body(payload).decode("ascii"))
+        part.replace_header("Content-Transfer-Encoding", CTE_QUOTED_PRINTABLE)
+    return message.as_bytes()
+
+
+class TransferEncodingStats:
+    """Conteo de mensajes enviados por modo de transferencia negociado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"7bit": 0, "8bitmime": 0, "smtputf8": 0, "downgraded": 0}
+
+    def record(self, mode: str) -> None:
+        with self._lock:
+            self.counts[mode] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def negotiate_transfer(
+    msg: Union[str, bytes],
+    from_addr: str,
+    to_addrs: Union[str, Sequence[str]],
+    esmtp_features: dict,
+) -> tuple[Union[str, bytes], list[str]]:
+    """
+    Adapta el mensaje a las extensiones anunciadas en el EHLO del relay.
+
+    - Mensaje 8bit y relay con 8BITMIME: se envía tal cual con `BODY=8BITMIME`.
+    - Mensaje 8bit y relay sin 8BITMIME: las partes 8bit pasan a quoted-printable.
+    - Direcciones no ASCII: requieren SMTPUTF8 (RFC 6531).
+
+    Args:
+        esmtp_features (dict): **Extensiones** del EHLO, con claves en minúscula.
+
+    Returns:
+        tuple: Mensaje a enviar y opciones para `MAIL FROM`.
+
+    Raises:
+        smtplib.SMTPNotSupportedError: Direcciones internacionalizadas y el relay no anuncia SMTPUTF8.
+    """
+    addresses = [from_addr, *([to_addrs] if isinstance(to_addrs, str) else to_addrs)]
+    options = []
+
+    if not all(address.isascii() for address in addresses):
+        if "smtputf8" not in esmtp_features:
+            raise smtplib.SMTPNotSupportedError("El relay no soporta SMTPUTF8 para direcciones internacionalizadas")
+        options.append("SMTPUTF8")
+
+    if msg.isascii():
+        mode = "7bit"
+    elif isinstance(msg, str):
+        return negotiate_transfer(msg.encode("utf-8"), from_addr, to_addrs, esmtp_features)
+    elif "8bitmime" in esmtp_features:
+        options.append("BODY=8BITMIME")
+        mode = "8bitmime"
+    else:
+        msg = downgrade_8bit(msg)
+        mode = "downgraded"
+    transfer_stats.record("smtputf8" if "SMTPUTF8" in options else mode)
+    return msg, options
+
+
+# Métricas globales de codificación de transferencia
+transfer_stats = TransferEncodingStats()
+
+
+class MessageTemplate:
+    """
+    Constructor de mensajes MIME con las partes estáticas precodificadas.
+
+    Las cabeceras comunes (From, Subject, Content-Type con el boundary,
+    MIME-Version) y las cabeceras de cada parte se codifican una sola vez
+    como bytes. `build()` solo codifica lo que cambia por destinatario
+    (To, Date, Message-ID y los cuerpos) y devuelve un único buffer con
+    CRLF listo para DATA, sin pasar por `email.generator`.
+
+    Cada parte se codifica como 7bit/8bit o quoted-printable según su
+    contenido (ver `encode_body()`); nunca base64. `negotiate_transfer()`
+    adapta el resultado al relay en el momento del envío.
+
+    Attributes:
+        from_addr (str): **Remitente** (dirección de la cabecera From).
+        subtypes (tuple[str, ...]): **Partes de texto** en orden (p. ej. `("plain", "html")`).
+        multipart (str): **Subtipo multipart** (`mixed`, `alternative`).
+    """
+
+    def __init__(
+        self,
+        from_addr: str,
+        subject: str,
+        subtypes: Sequence[str] = ("html",),
+        multipart: str = "mixed",
+        from_name: Optional[str] = None,
+    ):
+        self.from_addr = from_addr
+        self.subtypes = tuple(subtypes)
+        self.multipart = multipart
+        self.boundary = _new_boundary()
+        self._msgid_domain = from_addr.rpartition("@")[2] or None
+
+        delimiter = f"--{self.boundary}".encode("ascii")
+        self._head = b"".join([
+            f'Content-Type: multipart/{multipart};{CRLF.decode()} boundary="{self.boundary}"'.encode("ascii") + CRLF,
+            b"MIME-Version: 1.0" + CRLF,
+            _encode_header("Subject", subject),
+            _encode_header("From", formataddr((from_name, from_addr), charset="utf-8") if from_name else from_addr),
+        ])
+        self._part_heads = tuple(
+            {
+                cte: delimiter + CRLF
+                + f'Content-Type: text/{subtype}; charset="utf-8"'.encode("ascii") + CRLF
+                + b"MIME-Version: 1.0" + CRLF
+                + f"Content-Transfer-Encoding: {cte}".encode("ascii") + CRLF
+                + CRLF
+                for cte in (CTE_7BIT, CTE_8BIT, CTE_QUOTED_PRINTABLE)
+            }
+            for subtype in self.subtypes
+        )
+        self._delimiter = delimiter
+        self._tail = delimiter + b"--" + CRLF
+
+    def build(self, to_addr: str, bodies: Sequence[str]) -> bytes:
+        """
+        Construye el mensaje completo para un destinatario.
+
+        Args:
+            to_addr (str): **Destinatario** de la cabecera To.
+            bodies (Sequence[str]): **Cuerpos** en el mismo orden que `subtypes`.
+
+        Returns:
+            bytes: **Mensaje RFC 5322** con CRLF, listo para DATA o para el spool.
+        """
+        if len(bodies) != len(self.subtypes):
+            raise ValueError(f"Se esperaban {len(self.subtypes)} cuerpos, se recibieron {len(bodies)}")
+        started = time.perf_counter()
+
+        pieces = [
+            self._head,
+            _encode_header("To", to_addr, raw_utf8=True),
+            b"Date: " + formatdate().encode("ascii") + CRLF,
+            b"Message-ID: " + make_msgid(domain=self._msgid_domain).encode("ascii") + CRLF,
+            CRLF,
+        ]
+        for part_heads, body in zip(self._part_heads, bodies):
+            cte, encoded = encode_body(body)
+            if cte != CTE_QUOTED_PRINTABLE and self._delimiter in encoded:
+                # El boundary aparece en el texto: quoted-printable nunca lo contiene
+                cte, encoded = CTE_QUOTED_PRINTABLE, encode_qp_body(encoded)
+            pieces.append(part_heads[cte])
+            pieces.append(encoded)
+            pieces.append(CRLF)
+        pieces.append(self._tail)
+        message = b"".join(pieces)
+        observe_phase("mime", started)
+        return message
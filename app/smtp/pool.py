@@ -0,0 +1,413 @@
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Sequence, Union
+
+from app.observability import get_logger
+from app.observability.metrics import observe_phase
+from app.smtp.data import StreamingSMTP, StreamingSMTP_SSL
+from app.smtp.mime import negotiate_transfer
+from app.smtp.tls import ResumableSSLContext, get_ssl_context
+
+
+logger = get_logger(__name__)
+
+# Errores que indican que el relay cerró la sesión y vale la pena reconectar
+RECONNECTABLE_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class SMTPPoolTimeoutError(Exception):
+    """Se agotó el tiempo de espera por una sesión SMTP libre en el pool."""
+
+
+class SMTPDataInterruptedError(smtplib.SMTPServerDisconnected):
+    """
+    La sesión se cortó después de empezar a enviar el cuerpo del mensaje.
+
+    El relay pudo haber aceptado el mensaje antes del corte: reenviarlo
+    podría duplicarlo, por lo que no se reintenta.
+    """
+
+
+class PooledSMTPConnection:
+    """
+    Sesión SMTP autenticada administrada por el pool.
+
+    Guarda la conexión `smtplib` junto con los metadatos necesarios para
+    decidir si puede reutilizarse: momento de creación, último uso y
+    cantidad de mensajes enviados en la sesión.
+    """
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+    def idle_seconds(self) -> float:
+        """Segundos transcurridos desde el último uso de la sesión."""
+        return time.monotonic() - self.last_used
+
+    def is_alive(self) -> bool:
+        """Verifica la sesión con un comando NOOP."""
+        try:
+            code, _ = self.server.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        """Cierra la sesión de forma ordenada (QUIT) ignorando errores."""
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPConnectionPool:
+    """
+    Pool thread-safe de sesiones SMTP ya autenticadas.
+
+    Evita repetir conexión TCP, STARTTLS y AUTH en cada envío reutilizando
+    sesiones abiertas entre requests. Las sesiones ociosas se verifican con
+    NOOP antes de reutilizarse, se descartan si superan el tiempo máximo de
+    inactividad y se reciclan al alcanzar el límite de mensajes por sesión.
+    Si el relay cierra una sesión durante el envío, se reconecta y se
+    reintenta una vez de forma transparente.
+
+    Attributes:
+        min_size (int): **Sesiones abiertas** durante el warm-up.
+        max_size (int): **Máximo de sesiones** simultáneas (ociosas + en uso).
+        idle_timeout (float): **Segundos de inactividad** tras los que se descarta una sesión.
+        noop_interval (float): **Segundos de inactividad** tras los que se verifica con NOOP.
+        max_messages_per_session (int): **Mensajes por sesión** antes de reciclarla.
+        name (str): **Relay** al que pertenece el pool (etiqueta `relay` de las métricas).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        use_ssl: bool = False,
+        timeout: float = 30,
+        min_size: int = 0,
+        max_size: int = 4,
+        idle_timeout: float = 60,
+        noop_interval: float = 15,
+        max_messages_per_session: int = 100,
+        acquire_timeout: float = 30,
+        ssl_context: Optional[ssl.SSLContext] = None,
+        connection_factory: Optional[Callable[[], smtplib.SMTP]] = None,
+        name: Optional[str] = None,
+    ):
+        self.host = host
+        self.name = name or host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.noop_interval = noop_interval
+        self.max_messages_per_session = max(1, max_messages_per_session)
+        self.acquire_timeout = acquire_timeout
+        self.ssl_context = ssl_context
+        self._connection_factory = connection_factory or self._open_server
+
+        self._idle: deque[PooledSMTPConnection] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Métricas del pool
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.discarded = 0
+        self.reconnects = 0
+
+    # ------------------------------------------------------------------
+    # Creación de sesiones
+    # ------------------------------------------------------------------
+
+    def _open_server(self) -> smtplib.SMTP:
+        """Abre una conexión SMTP nueva, aplica TLS y autentica."""
+        if self.ssl_context is None:
+            # Contexto compartido: el almacén de CAs se carga una sola vez
+            self.ssl_context = get_ssl_context()
+
+        if self.use_ssl:
+            # Puerto 465: conexión segura desde el inicio (connect incluye el handshake TLS)
+            server = StreamingSMTP_SSL(
+                self.host,
+                self.port,
+                context=self.ssl_context,
+                timeout=self.timeout,
+                relay=self.name,
+            )
+        else:
+            server = StreamingSMTP(self.host, self.port, timeout=self.timeout, relay=self.name)
+            if self.use_tls:
+                # Puerto 587: conexión normal que se actualiza a segura
+                started = time.perf_counter()
+                server.starttls(context=self.ssl_context)
+                observe_phase("tls", started, self.name)
+
+        if isinstance(self.ssl_context, ResumableSSLContext) and isinstance(server.sock, ssl.SSLSocket):
+            # Guardar la sesión TLS tras el EHLO para reanudarla en la próxima conexión
+            server.ehlo_or_helo_if_needed()
+            self.ssl_context.store_session(self.host, server.sock.session)
+
+        if self.username and self.password:
+            started = time.perf_counter()
+            server.login(self.username, self.password)
+            observe_phase("auth", started, self.name)
+        return server
+
+    def _create_connection(self) -> PooledSMTPConnection:
+        server = self._connection_factory()
+        with self._cond:
+            self.created += 1
+        return PooledSMTPConnection(server)
+
+    def _discard(self, conn: PooledSMTPConnection) -> None:
+        """Cierra una sesión y libera su lugar en el pool."""
+        conn.close()
+        with self._cond:
+            self._size -= 1
+            self.discarded += 1
+            self._cond.notify()
+
+    # ------------------------------------------------------------------
+    # Adquisición y liberación
+    # ------------------------------------------------------------------
+
+    def _checkout(self) -> PooledSMTPConnection:
+        """Obtiene una sesión reutilizable o reserva lugar para una nueva."""
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("El pool SMTP está cerrado")
+
+                candidate = self._idle.pop() if self._idle else None
+                reserve_new = False
+
+                if candidate is None:
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self._in_use += 1
+                        self.misses += 1
+                        reserve_new = True
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise SMTPPoolTimeoutError(
+                                f"Sin sesiones SMTP disponibles tras {self.acquire_timeout}s"
+                            )
+                        self._cond.wait(remaining)
+                        continue
+                else:
+                    self._in_use += 1
+
+            if reserve_new:
+                try:
+                    return self._create_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+
+            # Validar la sesión ociosa fuera del lock (NOOP es I/O)
+            idle = candidate.idle_seconds()
+            reusable = idle < self.idle_timeout and (
+                idle < self.noop_interval or candidate.is_alive()
+            )
+            if reusable:
+                with self._cond:
+                    self.hits += 1
+                return candidate
+
+            with self._cond:
+                self._in_use -= 1
+            self._discard(candidate)
+
+    def _checkin(self, conn: PooledSMTPConnection, broken: bool = False) -> None:
+        """Devuelve una sesión al pool o la recicla si ya no debe reutilizarse."""
+        conn.last_used = time.monotonic()
+        recycle = broken or self._closed or conn.messages_sent >= self.max_messages_per_session
+
+        with self._cond:
+            self._in_use -= 1
+            if not recycle:
+                self._idle.append(conn)
+                self._cond.notify()
+                return
+
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledSMTPConnection]:
+        """
+        Context manager que presta una sesión SMTP autenticada.
+
+        La sesión vuelve al pool al salir del bloque; si ocurre un error de
+        conexión se descarta en lugar de reutilizarse.
+        """
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+        except BaseException as e:
+            # Los rechazos del servidor dejan la sesión utilizable (smtplib envía RSET)
+            broken = not isinstance(e, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused))
+            raise
+        finally:
+            self._checkin(conn, broken=broken)
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def sendmail(
+        self,
+        from_addr: str,
+        to_addrs: Union[str, Sequence[str]],
+        msg: Union[str, bytes],
+    ) -> dict:
+        """
+        Envía un mensaje usando una sesión del pool.
+
+        Si el relay cerró la sesión (desconexión, reset o timeout) antes de
+        empezar a enviar el cuerpo del mensaje, se descarta, se abre una nueva
+        y se reintenta el envío una sola vez. Un corte durante o después del
+        cuerpo no se reintenta (`SMTPDataInterruptedError`): el relay pudo
+        haberlo aceptado. La codificación del cuerpo se adapta a las
+        extensiones del relay (8BITMIME, SMTPUTF8).
+
+        Args:
+            from_addr (str): **Remitente** del sobre SMTP.
+            to_addrs (str | Sequence[str]): **Destinatarios** del sobre SMTP.
+            msg (str | bytes): **Mensaje serializado** listo para DATA.
+
+        Returns:
+            dict: Destinatarios rechazados (vacío si todos fueron aceptados).
+        """
+        for attempt in range(2):
+            server = None
+            try:
+                with self.connection() as conn:
+                    server = conn.server
+                    data, options = negotiate_transfer(msg, from_addr, to_addrs, server.esmtp_features)
+                    result = server.sendmail(from_addr, to_addrs, data, options)
+                    conn.messages_sent += 1
+                    return result
+            except RECONNECTABLE_ERRORS as e:
+                if getattr(server, "data_started", False):
+                    raise SMTPDataInterruptedError(f"Sesión cortada durante DATA: {e}") from e
+                if attempt:
+                    raise
+                with self._cond:
+                    self.reconnects += 1
+                logger.warning("Sesión SMTP cerrada por el relay, reconectando", host=self.host)
+
+    def warm_up(self) -> int:
+        """
+        Abre sesiones hasta alcanzar `min_size`.
+
+        Returns:
+            int: Número de sesiones abiertas durante el warm-up.
+        """
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= min(self.min_size, self.max_size):
+                    return opened
+                self._size += 1
+            try:
+                conn = self._create_connection()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+            opened += 1
+
+    def prune_idle(self) -> int:
+        """
+        Cierra sesiones ociosas que superaron `idle_timeout`, respetando `min_size`.
+
+        Returns:
+            int: Número de sesiones cerradas.
+        """
+        expired = []
+        with self._cond:
+            keep = deque()
+            while self._idle:
+                conn = self._idle.popleft()
+                if conn.idle_seconds() >= self.idle_timeout and self._size - len(expired) > self.min_size:
+                    expired.append(conn)
+                else:
+                    keep.append(conn)
+            self._idle = keep
+            self._in_use += len(expired)
+
+        for conn in expired:
+            with self._cond:
+                self._in_use -= 1
+            self._discard(conn)
+        return len(expired)
+
+    def close(self) -> None:
+        """Cierra todas las sesiones ociosas y marca el pool como cerrado."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._in_use += len(idle)
+
+        for conn in idle:
+            with self._cond:
+                self._in_use -= 1
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        """Métricas del pool: hits/misses, sesiones abiertas, ociosas y en uso."""
+        with self._cond:
+            total = self.hits + self.misses
+            return {
+                "host": self.host,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "created": self.created,
+                "discarded": self.discarded,
+                "reconnects": self.reconnects,
+            }
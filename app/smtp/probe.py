@@ -0,0 +1,194 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.config import settings
+from app.observability import get_logger
+from app.smtp.async_client import AsyncSMTPClient
+from app.smtp.relays import (
+    FAILURE_CONNECT,
+    FAILURE_PERMANENT,
+    Relay,
+    RelayRouter,
+    classify_failure,
+    relay_router,
+)
+from app.smtp.tls import get_ssl_context
+
+
+logger = get_logger(__name__)
+
+
+class RelayProber:
+    """
+    Sondeo periódico de los relays en segundo plano, con el último resultado en caché.
+
+    Cada sondeo abre una conexión nueva, fuera del pool, y recorre la
+    conversación de una sesión real: conexión, EHLO, STARTTLS o TLS
+    implícito y, con `auth`, AUTH con las credenciales del relay; luego
+    cierra con QUIT. A diferencia del NOOP sobre una sesión ya autenticada,
+    detecta credenciales revocadas. El resultado alimenta el circuit breaker
+    de cada relay y queda en caché: `snapshot()` nunca abre conexiones, por
+    lo que el readiness puede consultarse con cualquier frecuencia. Si un
+    sondeo se cancela (p. ej. por el plazo del arranque), los relays sin
+    respuesta quedan registrados como caídos.
+
+    Attributes:
+        interval (float): **Segundos** entre sondeos (0 = solo sondeos explícitos).
+        ttl (float): **Antigüedad máxima** de un resultado para considerarlo vigente.
+        timeout (float): **Segundos** máximos por relay.
+        auth (bool): **Incluir AUTH** en el sondeo.
+    """
+
+    def __init__(self, router: RelayRouter, interval: float = 30, ttl: float = 90, timeout: float = 10,
+                 auth: bool = True):
+        self.router = router
+        self.interval = interval
+        self.ttl = ttl
+        self.timeout = timeout
+        self.auth = auth
+
+        self._results: dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.checked_at: Optional[float] = None
+
+        # Métricas
+        self.probes = 0
+        self.failures = 0
+
+    async def _probe(self, relay: Relay) -> dict:
+        config = relay.config
+        client = AsyncSMTPClient(
+            config.host,
+            config.port,
+            username=config.username if self.auth else None,
+            password=config.password if self.auth else None,
+            use_tls=config.use_tls,
+            use_ssl=config.use_ssl,
+            timeout=self.timeout,
+            ssl_context=get_ssl_context(),
+            relay=relay.name,
+        )
+        started = time.perf_counter()
+        error: Optional[Exception] = None
+        try:
+            await asyncio.wait_for(client.connect(), self.timeout)
+        except asyncio.CancelledError:
+            # Sin QUIT: esperar la respuesta demoraría la cancelación
+            client.close()
+            raise
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"Timeout sondeando {config.host}:{config.port}")
+        except Exception as e:
+            error = e
+        await client.quit()
+        return self._record(relay, error, time.perf_counter() - started)
+
+    def _record(self, relay: Relay, error: Optional[Exception], latency: float) -> dict:
+        """Aplica el resultado de un sondeo al circuit breaker del relay y lo devuelve como dict."""
+        config = relay.config
+        self.probes += 1
+        if error is None:
+            relay.mark_healthy()
+            kind = None
+        else:
+            self.failures += 1
+            kind = classify_failure(error)
+            relay.mark_down(FAILURE_CONNECT if kind == FAILURE_PERMANENT else kind, error)
+        return {
+            "relay": relay.name,
+            "ok": error is None,
+            "auth": self.auth and bool(config.username and config.password),
+            "latency_ms": round(latency * 1000, 1),
+            "error": f"{type(error).__name__}: {error}" if error else None,
+            "failure": kind,
+            "checked_at": time.time(),
+        }
+
+    async def run_once(self) -> list[dict]:
+        """
+        Sondea todos los relays en paralelo y actualiza la caché.
+
+        Si se cancela antes de terminar, los relays que no respondieron se
+        registran como caídos y la caché se actualiza igual.
+        """
+        started = time.perf_counter()
+        completed: dict[str, dict] = {}
+
+        async def probe(relay: Relay) -> None:
+            completed[relay.name] = await self._probe(relay)
+
+        try:
+            await asyncio.gather(*(probe(relay) for relay in self.router.relays))
+        except asyncio.CancelledError:
+            error = TimeoutError("Sondeo cancelado antes de recibir respuesta")
+            for relay in self.router.relays:
+                if relay.name not in completed:
+                    completed[relay.name] = self._record(relay, error, time.perf_counter() - started)
+            self._store(completed)
+            raise
+        return self._store(completed)
+
+    def _store(self, completed: dict[str, dict]) -> list[dict]:
+        """Guarda los resultados del sondeo en la caché en el orden de los relays."""
+        results = [completed[relay.name] for relay in self.router.relays if relay.name in completed]
+        self._results = {result["relay"]: result for result in results}
+        self.checked_at = time.time()
+        down = [result["relay"] for result in results if not result["ok"]]
+        if down:
+            logger.warning("Relays SMTP sin respuesta al sondeo", down=down, total=len(results))
+        return list(results)
+
+    def start(self) -> None:
+        """Inicia el sondeo periódico en el event loop actual."""
+        if self._task is not None or self.interval <= 0:
+            return
+
+        async def loop():
+            # Sin un resultado previo (sondeo de arranque desactivado) el primero corre de inmediato
+            if self.checked_at is not None:
+                await asyncio.sleep(self.interval)
+            while True:
+                try:
+                    await self.run_once()
+                except Exception as e:
+                    logger.error("Error sondeando relays SMTP", exc_info=e)
+                await asyncio.sleep(self.interval)
+
+        self._task = asyncio.create_task(loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def snapshot(self) -> dict:
+        """
+        Último resultado en caché, sin abrir conexiones.
+
+        Con sondeo periódico, un resultado más antiguo que `ttl` se marca
+        `stale` (el sondeo se atrasó o dejó de correr).
+        """
+        age = time.time() - self.checked_at if self.checked_at is not None else None
+        return {
+            "checked_at": self.checked_at,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "stale": age is not None and self.interval > 0 and age > self.ttl,
+            "healthy": sum(1 for result in self._results.values() if result["ok"]),
+            "relays": list(self._results.values()),
+        }
+
+    def stats(self) -> dict:
+        return {"running": self._task is not None, "probes": self.probes, "failures": self.failures}
+
+
+# Instancia global: alimenta /health/ready y el circuit breaker de cada relay
+relay_prober = RelayProber(
+    relay_router,
+    interval=settings.RELAY_PROBE_INTERVAL,
+    ttl=settings.RELAY_PROBE_TTL,
+    timeout=settings.RELAY_PROBE_TIMEOUT,
+    auth=settings.RELAY_PROBE_AUTH,
+)
@@ -0,0 +1,682 @@
+import asyncio
+import json
+import smtplib
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional, Sequence, Union
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.config import settings
+from app.observability import get_logger
+from app.observability.metrics import current_route, smtp_sends_total
+from app.observability.tracing import start_span
+from app.observability.transcripts import record_transcript
+from app.smtp.async_pool import AsyncSMTPConnectionPool
+from app.smtp.pool import SMTPConnectionPool, SMTPDataInterruptedError, SMTPPoolTimeoutError
+from app.smtp.retry import CircuitBreaker, RetryPolicy
+from app.smtp.tls import get_ssl_context
+from app.smtp.scheduler import (
+    PRIORITY_BULK, PRIORITY_OTP, SendBudgetExceededError, SendScheduler, TokenBucket
+)
+
+
+logger = get_logger(__name__)
+
+# Tipos de fallo que provocan failover hacia otro relay
+FAILURE_AUTH = "auth"
+FAILURE_TRANSIENT = "4xx"
+FAILURE_CONNECT = "connect"
+FAILURE_PERMANENT = "5xx"
+# Rechazo temporal de los destinatarios (greylisting, buzón lleno): se reintenta en el mismo relay
+FAILURE_RECIPIENT = "rcpt_4xx"
+
+
+class NoRelayAvailableError(Exception):
+    """Ningún relay SMTP está disponible (circuitos abiertos o relays ya intentados)."""
+
+
+class RelayConfig(BaseModel):
+    """
+    Configuración de un relay SMTP.
+
+    Attributes:
+        name (str): **Nombre único** del relay, usado en métricas y logs.
+        host (str): **Servidor SMTP** del relay.
+        port (int): **Puerto** (587 para STARTTLS, 465 para SSL).
+        username (Optional[str]): **Usuario** para AUTH; sin usuario no se autentica.
+        password (Optional[str]): **Contraseña** o app password.
+        use_tls (bool): **STARTTLS** tras conectar.
+        use_ssl (bool): **TLS implícito** desde el inicio (puerto 465).
+        from_email (Optional[str]): **Remitente del sobre** para este relay; por defecto el del mensaje.
+        weight (int): **Peso** en el balanceo; 0 deja el relay solo como respaldo.
+        daily_quota (Optional[int]): **Mensajes por día** (UTC) antes de dejar de usarlo.
+        max_per_minute (Optional[int]): **Mensajes por minuto** permitidos por el proveedor.
+    """
+
+    name: str
+    host: str
+    port: int = 587
+    username: Optional[str] = None
+    password: Optional[str] = None
+    use_tls: bool = True
+    use_ssl: bool = False
+    from_email: Optional[str] = None
+    weight: int = Field(1, ge=0)
+    daily_quota: Optional[int] = Field(None, ge=0)
+    max_per_minute: Optional[int] = Field(None, gt=0)
+
+
+class RateWindow:
+    """Contador de eventos del último minuto en 60 cubetas de un segundo (O(1) por evento)."""
+
+    def __init__(self, seconds: int = 60):
+        self.seconds = seconds
+        self._buckets = [0] * seconds
+        self._stamps = [0] * seconds
+
+    def add(self, count: int = 1) -> None:
+        now = int(time.monotonic())
+        slot = now % self.seconds
+        if self._stamps[slot] != now:
+            self._stamps[slot] = now
+            self._buckets[slot] = 0
+        self._buckets[slot] += count
+
+    def total(self) -> int:
+        now = int(time.monotonic())
+        return sum(
+            count for count, stamp in zip(self._buckets, self._stamps)
+            if now - stamp < self.seconds
+        )
+
+
+def classify_failure(error: Exception) -> str:
+    """
+    Clasifica un error de envío para decidir si hacer failover.
+
+    Returns:
+        str: `auth`, `4xx` o `connect` (se reintenta en otro relay), `rcpt_4xx` (rechazo
+             temporal de los destinatarios; se reintenta en el mismo relay sin contarlo
+             como fallo suyo) o `5xx` (rechazo permanente del mensaje o destinatario; no
+             tiene sentido cambiar de relay).
+    """
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return FAILURE_AUTH
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return FAILURE_RECIPIENT if codes and all(400 <= code < 500 for code in codes) else FAILURE_PERMANENT
+    if isinstance(error, smtplib.SMTPResponseException):
+        if 400 <= error.smtp_code < 500:
+            return FAILURE_TRANSIENT
+        # SMTPConnectError / SMTPHeloError con código 5xx siguen siendo fallos del relay
+        if isinstance(error, (smtplib.SMTPConnectError, smtplib.SMTPHeloError)):
+            return FAILURE_CONNECT
+        return FAILURE_PERMANENT
+    if isinstance(error, smtplib.SMTPNotSupportedError):
+        # Falta una extensión que pide este mensaje (p. ej. SMTPUTF8): no es una caída del relay
+        return FAILURE_PERMANENT
+    if isinstance(error, (smtplib.SMTPServerDisconnected, SMTPPoolTimeoutError, OSError, TimeoutError)):
+        return FAILURE_CONNECT
+    return FAILURE_PERMANENT
+
+
+class Relay:
+    """
+    Relay SMTP con sus pools de sesiones (síncrono y asíncrono), estado de salud y métricas.
+
+    Un circuit breaker saca al relay de rotación durante `cooldown` segundos
+    tras `failure_threshold` fallos consecutivos de conexión o 4xx, o tras un
+    error de autenticación. Su presupuesto de envío (token bucket por
+    minuto y cuota diaria) reserva la fracción `otp_reserve` para tráfico OTP:
+    el tráfico masivo deja de usar el relay antes de agotarlo.
+    """
+
+    def __init__(self, config: RelayConfig, cooldown: float = 30, otp_reserve: float = 0.0,
+                 failure_threshold: int = 3):
+        self.config = config
+        self.name = config.name
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=cooldown)
+
+        self.bucket: Optional[TokenBucket] = None
+        self._bucket_reserve = 0.0
+        if config.max_per_minute:
+            self.bucket = TokenBucket(rate=config.max_per_minute / 60, capacity=config.max_per_minute)
+            self._bucket_reserve = config.max_per_minute * otp_reserve
+        self._quota_reserve = (config.daily_quota or 0) * otp_reserve
+
+        pool_options = dict(
+            host=config.host,
+            port=config.port,
+            username=config.username,
+            password=config.password,
+            use_tls=config.use_tls,
+            use_ssl=config.use_ssl,
+            timeout=settings.SMTP_TIMEOUT,
+            min_size=settings.SMTP_POOL_MIN_SIZE,
+            max_size=settings.SMTP_POOL_MAX_SIZE,
+            idle_timeout=settings.SMTP_POOL_IDLE_TIMEOUT,
+            noop_interval=settings.SMTP_POOL_NOOP_INTERVAL,
+            max_messages_per_session=settings.SMTP_POOL_MAX_MESSAGES_PER_SESSION,
+            acquire_timeout=settings.SMTP_POOL_ACQUIRE_TIMEOUT,
+            ssl_context=get_ssl_context(),
+            name=config.name,
+        )
+        self.pool = SMTPConnectionPool(**pool_options)
+        self.async_pool = AsyncSMTPConnectionPool(**pool_options)
+
+        self._lock = threading.Lock()
+        self.last_error: Optional[str] = None
+
+        # Métricas
+        self.sent = 0
+        self.failed = 0
+        self.bytes_sent = 0
+        self.latency_total = 0.0
+        self.errors = {FAILURE_AUTH: 0, FAILURE_TRANSIENT: 0, FAILURE_CONNECT: 0, FAILURE_PERMANENT: 0,
+                       FAILURE_RECIPIENT: 0}
+        self.throughput = RateWindow()
+        self._quota_day = self._today()
+        self.quota_used = 0
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _roll_quota(self) -> None:
+        today = self._today()
+        if today != self._quota_day:
+            self._quota_day = today
+            self.quota_used = 0
+
+    def available(self) -> bool:
+        """Indica si el relay está en rotación (circuito cerrado o semiabierto libre)."""
+        return self.breaker.can_attempt()
+
+    def _quota_left(self, priority: int) -> bool:
+        if self.config.daily_quota is None:
+            return True
+        reserve = self._quota_reserve if priority == PRIORITY_BULK else 0
+        return self.quota_used < self.config.daily_quota - reserve
+
+    def has_budget(self, priority: int) -> bool:
+        """Indica si queda presupuesto de envío para la clase `priority`."""
+        with self._lock:
+            self._roll_quota()
+            if not self._quota_left(priority):
+                return False
+        reserve = self._bucket_reserve if priority == PRIORITY_BULK else 0
+        return self.bucket is None or self.bucket.available(reserve)
+
+    def take_budget(self, priority: int) -> bool:
+        """Consume un envío del presupuesto (cuota diaria y token bucket)."""
+        with self._lock:
+            self._roll_quota()
+            if not self._quota_left(priority):
+                return False
+            reserve = self._bucket_reserve if priority == PRIORITY_BULK else 0
+            if self.bucket is not None and not self.bucket.try_take(reserve):
+                return False
+            self.quota_used += 1
+            return True
+
+    def budget_wait(self, priority: int) -> float:
+        """Segundos estimados hasta que haya presupuesto para la clase `priority`."""
+        with self._lock:
+            self._roll_quota()
+            if not self._quota_left(priority):
+                now = datetime.now(timezone.utc)
+                midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+                return 86400 - (now - midnight).total_seconds()
+        if self.bucket is None:
+            return 0.0
+        return self.bucket.wait_time(self._bucket_reserve if priority == PRIORITY_BULK else 0)
+
+    def record_success(self, nbytes: int, elapsed: float) -> None:
+        with self._lock:
+            self._roll_quota()
+            self.sent += 1
+            self.bytes_sent += nbytes
+            self.latency_total += elapsed
+        self.breaker.record_success()
+        self.throughput.add()
+        smtp_sends_total.inc(current_route.get(), self.name, "sent")
+
+    def record_failure(self, kind: str, error: Exception) -> None:
+        """Registra un envío fallido; salvo rechazos de mensaje o destinatario, cuenta como fallo del relay."""
+        with self._lock:
+            self.failed += 1
+            self.errors[kind] += 1
+        smtp_sends_total.inc(current_route.get(), self.name, kind)
+        if kind not in (FAILURE_PERMANENT, FAILURE_RECIPIENT):
+            self.mark_down(kind, error)
+        else:
+            # El relay funciona; el rechazo es del mensaje o del destinatario
+            self.last_error = f"{type(error).__name__}: {error}"
+            self.breaker.record_success()
+
+    def mark_down(self, kind: str, error: Exception) -> None:
+        """Registra un fallo del relay en el circuit breaker."""
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.breaker.record_failure(trip=kind == FAILURE_AUTH):
+            logger.warning("Circuito del relay abierto", relay=self.name, seconds=self.breaker.reset_timeout,
+                           kind=kind, error=str(error))
+
+    def mark_healthy(self) -> None:
+        self.breaker.record_success()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._roll_quota()
+            return {
+                "name": self.name,
+                "host": self.config.host,
+                "weight": self.config.weight,
+                "available": self.breaker.can_attempt(),
+                "circuit": self.breaker.stats(),
+                "sent": self.sent,
+                "failed": self.failed,
+                "errors": dict(self.errors),
+                "bytes_sent": self.bytes_sent,
+                "avg_latency_ms": round(self.latency_total / self.sent * 1000, 2) if self.sent else 0.0,
+                "sent_last_minute": self.throughput.total(),
+                "daily_quota": self.config.daily_quota,
+                "quota_used": self.quota_used,
+                "max_per_minute": self.config.max_per_minute,
+                "tokens": round(self.bucket.tokens, 2) if self.bucket is not None else None,
+                "last_error": self.last_error,
+            }
+
+
+class RelayRouter:
+    """
+    Enrutador de envíos entre varios relays SMTP.
+
+    Reparte el tráfico con round-robin ponderado suave (estilo nginx) entre los
+    relays disponibles y hace failover automático al siguiente relay cuando uno
+    devuelve errores de autenticación, 4xx o de conexión. Cuando ya se probaron
+    todos los relays, los errores transitorios se reintentan con espera
+    exponencial y jitter hasta agotar los intentos de la `RetryPolicy`. Los relays con peso 0
+    solo se usan como respaldo cuando ningún relay ponderado está disponible.
+
+    Cada envío consume presupuesto del relay elegido; cuando no queda, los
+    envíos esperan en el `SendScheduler`, donde el tráfico OTP pasa delante
+    del masivo.
+    """
+
+    def __init__(self, relays: list[Relay], scheduler: Optional[SendScheduler] = None,
+                 retry: Optional[RetryPolicy] = None):
+        if not relays:
+            raise ValueError("Se requiere al menos un relay SMTP")
+        self.relays = relays
+        self.retry = retry or RetryPolicy(max_attempts=len(relays), base_delay=0)
+        self.retries = 0
+        self.scheduler = scheduler or SendScheduler({PRIORITY_OTP: 0, PRIORITY_BULK: 0})
+        self._current = {relay.name: 0 for relay in relays}
+        self._lock = threading.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+
+    def _candidates(self, exclude: Sequence[Relay]) -> list[Relay]:
+        return [r for r in self.relays if r not in exclude and r.available()]
+
+    def _pick(self, candidates: list[Relay]) -> Optional[Relay]:
+        weighted = [r for r in candidates if r.config.weight > 0]
+        if not weighted:
+            # Solo relays de respaldo: el primero disponible en orden de configuración
+            return candidates[0] if candidates else None
+
+        with self._lock:
+            total = 0
+            best = None
+            for relay in weighted:
+                self._current[relay.name] += relay.config.weight
+                total += relay.config.weight
+                if best is None or self._current[relay.name] > self._current[best.name]:
+                    best = relay
+            self._current[best.name] -= total
+            return best
+
+    def select(self, exclude: Sequence[Relay] = (), priority: int = PRIORITY_BULK) -> Optional[Relay]:
+        """
+        Elige el siguiente relay por peso entre los disponibles, no excluidos y con
+        presupuesto para `priority`, y consume un envío de su presupuesto.
+        """
+        candidates = [r for r in self._candidates(exclude) if r.has_budget(priority)]
+        while candidates:
+            relay = self._pick(candidates)
+            if relay.breaker.begin_attempt():
+                if relay.take_budget(priority):
+                    return relay
+                relay.breaker.cancel_attempt()
+            candidates.remove(relay)
+        return None
+
+    def budget_wait(self, exclude: Sequence[Relay] = (), priority: int = PRIORITY_BULK) -> float:
+        """Segundos estimados hasta que algún relay tenga presupuesto para `priority`."""
+        waits = [r.budget_wait(priority) for r in self._candidates(exclude)]
+        return min(waits) if waits else 1.0
+
+    def _can_retry(self, last_error: Optional[Exception]) -> bool:
+        """Tras probar todos los relays, indica si vale la pena otra ronda."""
+        return last_error is not None and bool(self._candidates(()))
+
+    def _handle_failure(self, relay: Relay, error: Exception) -> str:
+        kind = classify_failure(error)
+        relay.record_failure(kind, error)
+        # Tras un corte durante DATA el mensaje pudo entregarse: otro relay lo duplicaría
+        if kind == FAILURE_PERMANENT or isinstance(error, SMTPDataInterruptedError):
+            raise error
+        return kind
+
+    def _pin(self, relay: Relay) -> list[Relay]:
+        """Exclusiones para que el próximo intento use solo `relay` (rechazo temporal del destinatario)."""
+        return [r for r in self.relays if r is not relay]
+
+    def send(self, from_addr: str, to_addrs: Union[str, Sequence[str]], msg: Union[str, bytes],
+             priority: int = PRIORITY_BULK) -> dict:
+        """
+        Envía un mensaje con el transporte bloqueante, con failover y reintentos.
+
+        Sin presupuesto disponible no espera: lanza `SendBudgetExceededError`.
+
+        Returns:
+            dict: Destinatarios rechazados (vacío si todos fueron aceptados).
+        """
+        tried: list[Relay] = []
+        last_error: Optional[Exception] = None
+        retry_round = 0
+        for _ in range(self.retry.max_attempts):
+            if not self._candidates(tried):
+                if not self._can_retry(last_error):
+                    break
+                # Todos los relays disponibles fallaron: nueva ronda con espera exponencial y jitter
+                self.retries += 1
+                tried = []
+                time.sleep(self.retry.delay(retry_round))
+                retry_round += 1
+            relay = self.select(exclude=tried, priority=priority)
+            if relay is None:
+                raise SendBudgetExceededError(
+                    "Presupuesto de envío agotado en todos los relays",
+                    retry_after=self.budget_wait(tried, priority),
+                )
+            tried.append(relay)
+            started = time.monotonic()
+            try:
+                with start_span("smtp.send", relay=relay.name), record_transcript(relay.name):
+                    result = relay.pool.sendmail(relay.config.from_email or from_addr, to_addrs, msg)
+            except Exception as e:
+                last_error = e
+                if self._handle_failure(relay, e) == FAILURE_RECIPIENT:
+                    # El destinatario no acepta por ahora: mismo relay tras la espera, sin failover
+                    self.retries += 1
+                    tried = self._pin(relay)
+                    time.sleep(self.retry.delay(retry_round))
+                    retry_round += 1
+                continue
+            relay.record_success(len(msg), time.monotonic() - started)
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise NoRelayAvailableError("No hay relays SMTP disponibles")
+
+    async def send_async(self, from_addr: str, to_addrs: Union[str, Sequence[str]],
+                         msg: Union[str, bytes], priority: int = PRIORITY_BULK) -> dict:
+        """
+        Envía un mensaje con el transporte asyncio, con failover y reintentos.
+
+        Sin presupuesto disponible, espera su turno en el scheduler según `priority`.
+
+        Returns:
+            dict: Destinatarios rechazados (vacío si todos fueron aceptados).
+
+        Raises:
+            SendBudgetExceededError: Si no hubo presupuesto dentro de la espera máxima.
+        """
+        tried: list[Relay] = []
+        last_error: Optional[Exception] = None
+        retry_round = 0
+        for _ in range(self.retry.max_attempts):
+            if not self._candidates(tried):
+                if not self._can_retry(last_error):
+                    break
+                # Todos los relays disponibles fallaron: nueva ronda con espera exponencial y jitter
+                self.retries += 1
+                tried = []
+                await asyncio.sleep(self.retry.delay(retry_round))
+                retry_round += 1
+            relay = await self.scheduler.acquire(
+                priority,
+                lambda: self.select(exclude=tried, priority=priority),
+                lambda: self.budget_wait(tried, priority),
+            )
+            tried.append(relay)
+            started = time.monotonic()
+            try:
+                with start_span("smtp.send", relay=relay.name), record_transcript(relay.name):
+                    result = await relay.async_pool.sendmail(relay.config.from_email or from_addr, to_addrs, msg)
+            except Exception as e:
+                last_error = e
+                if self._handle_failure(relay, e) == FAILURE_RECIPIENT:
+                    # El destinatario no acepta por ahora: mismo relay tras la espera, sin failover
+                    self.retries += 1
+                    tried = self._pin(relay)
+                    await asyncio.sleep(self.retry.delay(retry_round))
+                    retry_round += 1
+                continue
+            relay.record_success(len(msg), time.monotonic() - started)
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise NoRelayAvailableError("No hay relays SMTP disponibles")
+
+    async def send_many_async(
+        self,
+        messages: Sequence[tuple[str, Union[str, Sequence[str]], Union[str, bytes]]],
+        priority: int = PRIORITY_BULK,
+    ) -> list[Union[dict, Exception]]:
+        """
+        Envía varios mensajes por una sola sesión de un relay, con PIPELINING si lo anuncia.
+
+        El relay se elige una vez para todo el grupo y cada mensaje consume un
+        envío de su presupuesto. Los rechazos permanentes (5xx) se devuelven
+        tal cual; los mensajes que fallan por error transitorio o de conexión,
+        y los que no alcanzaron presupuesto en el relay elegido, se reenvían
+        uno por uno con `send_async()` (failover y reintentos).
+
+        Args:
+            messages (Sequence[tuple]): **Mensajes** como `(remitente, destinatarios, mensaje)`.
+
+        Returns:
+            list[dict | Exception]: Por mensaje y en el mismo orden, los destinatarios
+                rechazados o el error con el que terminó su envío.
+        """
+        if len(messages) <= 1:
+            return list(await asyncio.gather(
+                *(self.send_async(*message, priority) for message in messages), return_exceptions=True
+            ))
+
+        try:
+            relay = await self.scheduler.acquire(
+                priority,
+                lambda: self.select(priority=priority),
+                lambda: self.budget_wait((), priority),
+            )
+        except SendBudgetExceededError as e:
+            return [e] * len(messages)
+
+        # `select()` ya consumió el envío del primer mensaje
+        batch = [0] + [index for index in range(1, len(messages)) if relay.take_budget(priority)]
+        batched = set(batch)
+        fallback = [index for index in range(len(messages)) if index not in batched]
+
+        results: list[Union[dict, Exception, None]] = [None] * len(messages)
+        started = time.monotonic()
+        try:
+            with start_span("smtp.send_many", relay=relay.name, messages=len(batch)), \
+                    record_transcript(relay.name, len(batch)):
+                outcomes = await relay.async_pool.send_many([
+                    (relay.config.from_email or messages[index][0], *messages[index][1:]) for index in batch
+                ])
+        except Exception as e:
+            outcomes = [e] * len(batch)
+        elapsed = (time.monotonic() - started) / len(batch)
+
+        relay_failed = False
+        for index, outcome in zip(batch, outcomes):
+            if not isinstance(outcome, Exception):
+                relay.record_success(len(messages[index][2]), elapsed)
+                results[index] = outcome
+                continue
+            kind = classify_failure(outcome)
+            if kind == FAILURE_PERMANENT:
+                relay.record_failure(kind, outcome)
+                results[index] = outcome
+                continue
+            if isinstance(outcome, SMTPDataInterruptedError):
+                # El mensaje pudo entregarse antes del corte: no se reenvía
+                results[index] = outcome
+                if not relay_failed:
+                    relay.record_failure(kind, outcome)
+                    relay_failed = True
+                continue
+            if kind == FAILURE_RECIPIENT:
+                # Rechazo temporal del destinatario: se reintenta sin contar como fallo del relay
+                relay.record_failure(kind, outcome)
+                fallback.append(index)
+                continue
+            # Un corte de sesión afecta a varios mensajes: cuenta como un solo fallo del relay
+            if not relay_failed:
+                relay.record_failure(kind, outcome)
+                relay_failed = True
+            fallback.append(index)
+
+        if fallback:
+            retried = await asyncio.gather(
+                *(self.send_async(*messages[index], priority) for index in fallback), return_exceptions=True
+            )
+            for index, outcome in zip(fallback, retried):
+                results[index] = outcome
+        return results
+
+    async def health_check(self, use_async: bool = True) -> None:
+        """
+        Verifica cada relay con una sesión del pool y NOOP.
+
+        Los relays que responden cierran su circuito y vuelven a rotación; los
+        que fallan suman un fallo en su circuit breaker.
+        """
+        for relay in self.relays:
+            try:
+                if use_async:
+                    async with relay.async_pool.connection() as conn:
+                        code, msg = await conn.client.noop()
+                else:
+                    def probe():
+                        with relay.pool.connection() as conn:
+                            return conn.server.noop()
+                    code, msg = await run_in_threadpool(probe)
+                if code != 250:
+                    raise smtplib.SMTPResponseException(code, msg)
+                relay.mark_healthy()
+            except Exception as e:
+                kind = classify_failure(e)
+                relay.mark_down(FAILURE_CONNECT if kind == FAILURE_PERMANENT else kind, e)
+
+    def start_health_checks(self, interval: float, use_async: bool = True) -> None:
+        """Inicia la verificación periódica de relays en el event loop actual."""
+        if self._health_task is not None or interval <= 0:
+            return
+
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                await self.health_check(use_async)
+
+        self._health_task = asyncio.create_task(loop())
+
+    async def stop_health_checks(self) -> None:
+        if self._health_task is None:
+            return
+        self._health_task.cancel()
+        await asyncio.gather(self._health_task, return_exceptions=True)
+        self._health_task = None
+
+    async def warm_up(self, use_async: bool = True) -> int:
+        """Abre las sesiones mínimas de cada relay; devuelve el total abierto."""
+        opened = 0
+        for relay in self.relays:
+            try:
+                if use_async:
+                    opened += await relay.async_pool.warm_up()
+                else:
+                    opened += await run_in_threadpool(relay.pool.warm_up)
+            except Exception as e:
+                relay.mark_down(classify_failure(e), e)
+        return opened
+
+    async def close(self) -> None:
+        await self.stop_health_checks()
+        for relay in self.relays:
+            await relay.async_pool.close()
+            await run_in_threadpool(relay.pool.close)
+
+    def stats(self, use_async: bool = True) -> list[dict]:
+        """Métricas por relay, incluyendo el pool del transporte activo."""
+        return [
+            {**relay.stats(), "pool": (relay.async_pool if use_async else relay.pool).stats()}
+            for relay in self.relays
+        ]
+
+    def scheduler_stats(self) -> dict:
+        return {**self.scheduler.stats(), "retries": self.retries}
+
+
+def load_relay_configs() -> list[RelayConfig]:
+    """
+    Lee la lista de relays de `SMTP_RELAYS` (JSON) o, si está vacía, construye
+    un único relay `default` con las variables `SMTP_*`.
+    """
+    if settings.SMTP_RELAYS.strip():
+        return TypeAdapter(list[RelayConfig]).validate_python(json.loads(settings.SMTP_RELAYS))
+    return [
+        RelayConfig(
+            name="default",
+            host=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+            use_ssl=settings.SMTP_USE_SSL,
+        )
+    ]
+
+
+def create_relay_router() -> RelayRouter:
+    """Crea el enrutador de relays a partir de la configuración."""
+    scheduler = SendScheduler({
+        PRIORITY_OTP: settings.SCHEDULER_OTP_MAX_WAIT,
+        PRIORITY_BULK: settings.SCHEDULER_BULK_MAX_WAIT,
+    })
+    retry = RetryPolicy(
+        max_attempts=settings.SMTP_RETRY_MAX_ATTEMPTS,
+        base_delay=settings.SMTP_RETRY_BASE_DELAY,
+        max_delay=settings.SMTP_RETRY_MAX_DELAY,
+    )
+    return RelayRouter([
+        Relay(
+            config,
+            cooldown=settings.SMTP_RELAY_COOLDOWN,
+            otp_reserve=settings.SMTP_OTP_RESERVE_RATIO,
+            failure_threshold=settings.SMTP_BREAKER_FAILURE_THRESHOLD,
+        )
+        for config in load_relay_configs()
+    ], scheduler, retry)
+
+
+# Instancia global compartida por los controladores y los workers del spool
+relay_router = create_relay_router()
@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from typing import Optional
+
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+def backoff_delay(base: float, attempt: int, cap: Optional[float] = None) -> float:
+    """
+    Espera exponencial con jitter ("equal jitter") para el reintento número `attempt`.
+
+    La espera nominal es `base * 2**attempt` (acotada por `cap`); se devuelve un
+    valor aleatorio entre la mitad y el total, de modo que los clientes que
+    fallaron a la vez no reintenten sincronizados.
+    """
+    delay = base * (2 ** attempt)
+    if cap is not None:
+        delay = min(delay, cap)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryPolicy:
+    """
+    Política de reintentos para errores SMTP transitorios (4xx y de conexión).
+
+    Attributes:
+        max_attempts (int): **Intentos totales** por mensaje, sumando todos los relays.
+        base_delay (float): **Espera base** en segundos antes del primer reintento.
+        max_delay (float): **Espera máxima** entre reintentos.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 5.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry: int) -> float:
+        """Segundos a esperar antes del reintento `retry` (0 para el primero)."""
+        return backoff_delay(self.base_delay, retry, self.max_delay)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de un relay SMTP.
+
+    Tras `failure_threshold` fallos consecutivos (o uno de autenticación) el
+    circuito se abre y el relay deja de recibir envíos durante `reset_timeout`
+    segundos. Después pasa a semiabierto y deja pasar un único envío de prueba:
+    si tiene éxito el circuito se cierra; si falla, vuelve a abrirse.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = BREAKER_CLOSED
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        self.consecutive_failures = 0
+        self.opens = 0
+
+    def _current_state(self) -> str:
+        if self._state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = BREAKER_HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def can_attempt(self) -> bool:
+        """Indica si el relay admite un envío ahora, sin reservarlo."""
+        with self._lock:
+            state = self._current_state()
+            return state == BREAKER_CLOSED or (state == BREAKER_HALF_OPEN and not self._trial_in_flight)
+
+    def begin_attempt(self) -> bool:
+        """Reserva el envío; en semiabierto solo se concede un envío de prueba a la vez."""
+        with self._lock:
+            state = self._current_state()
+            if state == BREAKER_CLOSED:
+                return True
+            if state == BREAKER_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def cancel_attempt(self) -> None:
+        """Libera un envío reservado con `begin_attempt()` que no llegó a realizarse."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        """Segundos hasta que el circuito pase a semiabierto (0 si no está abierto)."""
+        with self._lock:
+            if self._current_state() != BREAKER_OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = BREAKER_CLOSED
+            self._trial_in_flight = False
+            self.consecutive_failures = 0
+
+    def record_failure(self, trip: bool = False) -> bool:
+        """
+        Registra un fallo del relay.
+
+        Args:
+            trip (bool): Abre el circuito de inmediato (p. ej. credenciales inválidas).
+
+        Returns:
+            bool: True si el circuito quedó abierto con este fallo.
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            state = self._current_state()
+            if state == BREAKER_OPEN:
+                return False
+            if trip or state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                self.opens += 1
+                return True
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self.consecutive_failures,
+                "opens": self.opens,
+            }
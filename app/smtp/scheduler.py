@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+
+# Clases de prioridad: un número menor se atiende primero
+PRIORITY_OTP = 0
+PRIORITY_BULK = 1
+
+PRIORITY_NAMES = {PRIORITY_OTP: "otp", PRIORITY_BULK: "bulk"}
+
+T = TypeVar("T")
+
+
+class SendBudgetExceededError(Exception):
+    """No hay presupuesto de envío (cuota por minuto o diaria) dentro del tiempo de espera."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket con recarga continua.
+
+    `rate` es la cantidad de tokens por segundo y `capacity` el máximo acumulable
+    (la ráfaga permitida). Un `reserve` mayor que cero deja esa cantidad de
+    tokens intacta, de modo que solo el tráfico prioritario pueda consumirla.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self, reserve: float = 0) -> bool:
+        with self._lock:
+            self._refill()
+            return self.tokens - 1 >= reserve
+
+    def try_take(self, reserve: float = 0) -> bool:
+        """Consume un token si, tras hacerlo, quedan al menos `reserve` tokens."""
+        with self._lock:
+            self._refill()
+            if self.tokens - 1 < reserve:
+                return False
+            self.tokens -= 1
+            return True
+
+    def wait_time(self, reserve: float = 0) -> float:
+        """Segundos hasta que `try_take(reserve)` pueda tener éxito."""
+        with self._lock:
+            self._refill()
+            missing = reserve + 1 - self.tokens
+            return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+
+class SendScheduler:
+    """
+    Cola de espera por prioridad para el presupuesto de envío de los relays.
+
+    Cuando no queda presupuesto, los envíos esperan en orden de prioridad y
+    llegada: un OTP siempre pasa delante de cualquier correo masivo en espera.
+    Cada clase tiene su tiempo máximo de espera; al vencer, el envío se
+    descarta con `SendBudgetExceededError` para que el llamador lo difiera.
+    """
+
+    def __init__(self, max_wait: dict[int, float]):
+        self.max_wait = max_wait
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Métricas por clase de prioridad
+        self.granted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.deferred = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.shed = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.wait_total = {name: 0.0 for name in PRIORITY_NAMES.values()}
+
+    def _ensure_loop(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self._waiters = []
+        return self._condition
+
+    def _ahead(self, priority: int) -> bool:
+        """Indica si hay envíos de igual o mayor prioridad esperando."""
+        return bool(self._waiters) and self._waiters[0][0] <= priority
+
+    async def acquire(
+        self,
+        priority: int,
+        try_grant: Callable[[], Optional[T]],
+        retry_after: Callable[[], float],
+    ) -> T:
+        """
+        Obtiene presupuesto para un envío respetando la prioridad.
+
+        Args:
+            priority (int): **Clase** del envío (`PRIORITY_OTP` o `PRIORITY_BULK`).
+            try_grant (Callable): Intenta consumir presupuesto; devuelve el recurso
+                                  concedido (p. ej. el relay) o None si no hay.
+            retry_after (Callable): Segundos estimados hasta que haya presupuesto.
+
+        Raises:
+            SendBudgetExceededError: Si no hubo presupuesto dentro de la espera máxima.
+        """
+        name = PRIORITY_NAMES[priority]
+        condition = self._ensure_loop()
+
+        if not self._ahead(priority):
+            granted = try_grant()
+            if granted is not None:
+                self.granted[name] += 1
+                return granted
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.max_wait.get(priority, 0)
+        ticket = (priority, next(self._sequence))
+        self.deferred[name] += 1
+
+        async with condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    if self._waiters[0] == ticket:
+                        granted = try_grant()
+                        if granted is not None:
+                            self.granted[name] += 1
+                            self.wait_total[name] += loop.time() - started
+                            return granted
+                        delay = retry_after()
+                    else:
+                        delay = None
+
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        self.shed[name] += 1
+                        raise SendBudgetExceededError(
+                            f"Presupuesto de envío agotado para tráfico {name}",
+                            retry_after=retry_after(),
+                        )
+                    try:
+                        await asyncio.wait_for(
+                            condition.wait(),
+                            min(remaining, delay) if delay is not None else remaining,
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                condition.notify_all()
+
+    def stats(self) -> dict:
+        waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _ in self._waiters:
+            waiting[PRIORITY_NAMES[priority]] += 1
+        return {
+            "waiting": waiting,
+            "granted": dict(self.granted),
+            "deferred": dict(self.deferred),
+            "shed": dict(self.shed),
+            "avg_wait_ms": {
+                name: round(self.wait_total[name] / self.deferred[name] * 1000, 2) if self.deferred[name] else 0.0
+                for name in PRIORITY_NAMES.values()
+            },
+        }
@@ -0,0 +1,477 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+from app.config import settings
+from app.observability import get_logger
+from app.observability.metrics import Counter, current_route, metrics_registry
+from app.smtp.pool import SMTPDataInterruptedError
+from app.smtp.retry import backoff_delay
+from app.smtp.scheduler import PRIORITY_BULK, SendBudgetExceededError
+from app.smtp.transport import send_message_async, send_messages_async
+
+
+logger = get_logger(__name__)
+
+DELIVERY_DIRECT = "direct"
+DELIVERY_QUEUED = "queued"
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+STATUS_SUPERSEDED = "superseded"
+
+# Estados finales: sus filas se borran al vencer la retención
+_FINISHED = (STATUS_SENT, STATUS_FAILED, STATUS_SUPERSEDED)
+
+# Segundos entre purgas de mensajes terminados
+PURGE_INTERVAL = 300
+
+spool_superseded_total = metrics_registry.register(Counter(
+    "spool_superseded_total", "Mensajes pendientes reemplazados por uno más nuevo antes de entregarse.", ("route",)
+))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbound (
+    id TEXT PRIMARY KEY,
+    route TEXT NOT NULL,
+    from_addr TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    message BLOB NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    supersede_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbound_ready ON outbound (status, next_attempt_at);
+"""
+
+# Columnas agregadas después de la primera versión del esquema
+_MIGRATIONS = {
+    "priority": "ALTER TABLE outbound ADD COLUMN priority INTEGER NOT NULL DEFAULT 1",
+    "supersede_key": "ALTER TABLE outbound ADD COLUMN supersede_key TEXT",
+}
+
+_PRIORITY_INDEX = "CREATE INDEX IF NOT EXISTS idx_outbound_priority ON outbound (status, priority, next_attempt_at)"
+
+# Índice por destinatario de los mensajes reemplazables (OTP): ubicar el pendiente
+# anterior no depende del tamaño de la cola
+_SUPERSEDE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_outbound_supersede ON outbound (supersede_key, status) "
+    "WHERE supersede_key IS NOT NULL"
+)
+
+# Un mensaje que vuelve a la cola queda reemplazado si ya se encoló uno más nuevo con su clave
+_STATUS_UNLESS_SUPERSEDED = (
+    "CASE WHEN supersede_key IS NOT NULL AND EXISTS (SELECT 1 FROM outbound AS newer "
+    "WHERE newer.supersede_key = outbound.supersede_key AND newer.rowid > outbound.rowid) "
+    f"THEN '{STATUS_SUPERSEDED}' ELSE ? END"
+)
+
+
+@dataclass
+class SpoolItem:
+    """Mensaje encolado en el spool, listo para entregarse al relay."""
+
+    id: str
+    route: str
+    from_addr: str
+    recipients: list[str]
+    message: bytes
+    attempts: int
+    priority: int = PRIORITY_BULK
+
+
+class OutboundSpool:
+    """
+    Spool durable de correos salientes sobre SQLite en modo WAL.
+
+    Cada mensaje se guarda ya renderizado y serializado, de modo que los
+    workers solo necesitan entregarlo al relay. Los mensajes sobreviven a un
+    reinicio: al abrir el spool, los que quedaron en estado `sending` por una
+    caída vuelven a `pending`. La conexión se abre de forma perezosa para no
+    crear el archivo cuando el modo de entrega es directo.
+
+    Los mensajes se reservan por prioridad: los OTP listos salen antes que
+    cualquier correo masivo.
+
+    Un mensaje encolado con `supersede_key` reemplaza al pendiente anterior
+    con la misma clave (p. ej. un OTP reenviado al mismo destinatario): el
+    anterior pasa a `superseded` sin llegar al relay. Lo mismo ocurre si un
+    mensaje ya reservado vuelve a la cola tras un fallo y existe uno más nuevo.
+
+    Los mensajes terminados (`sent`, `failed`, `superseded`) guardan en
+    `next_attempt_at` el momento en que terminaron; `purge()` los borra al
+    vencer la retención.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(outbound)")}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.execute(_PRIORITY_INDEX)
+            conn.execute(_SUPERSEDE_INDEX)
+            # Recuperar mensajes que quedaron a medio entregar antes de un reinicio
+            conn.execute(
+                f"UPDATE outbound SET status = {_STATUS_UNLESS_SUPERSEDED} WHERE status = ?",
+                (STATUS_PENDING, STATUS_SENDING)
+            )
+            self._conn = conn
+        return self._conn
+
+    def enqueue(self, route: str, from_addr: str, recipients: list[str], message: bytes,
+                priority: int = PRIORITY_BULK, supersede_key: Optional[str] = None) -> str:
+        """
+        Guarda un mensaje en el spool.
+
+        Args:
+            supersede_key (str, optional): **Clave de reemplazo**; los mensajes pendientes
+                                           con la misma clave se descartan.
+
+        Returns:
+            str: Identificador del mensaje encolado.
+        """
+        message_id = uuid.uuid4().hex
+        now = time.time()
+        superseded = 0
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if supersede_key is not None:
+                    superseded = conn.execute(
+                        "UPDATE outbound SET status = ?, message = x'', next_attempt_at = ? "
+                        "WHERE supersede_key = ? AND status = ?",
+                        (STATUS_SUPERSEDED, now, supersede_key, STATUS_PENDING)
+                    ).rowcount
+                conn.execute(
+                    "INSERT INTO outbound (id, route, from_addr, recipients, message, status, priority, "
+                    "created_at, next_attempt_at, supersede_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (message_id, route, from_addr, json.dumps(recipients), message, STATUS_PENDING, priority,
+                     now, now, supersede_key)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if superseded:
+            spool_superseded_total.inc(route, amount=superseded)
+            logger.debug("Mensajes pendientes reemplazados", route=route, message_id=message_id,
+                         superseded=superseded)
+        return message_id
+
+    def claim(self) -> Optional[SpoolItem]:
+        """Reserva el siguiente mensaje listo para envío (estado `sending`)."""
+        items = self.claim_many(1)
+        return items[0] if items else None
+
+    def claim_many(self, limit: int) -> list[SpoolItem]:
+        """
+        Reserva hasta `limit` mensajes listos de la misma prioridad, los más antiguos primero.
+
+        Se toman solo de la prioridad más urgente con mensajes listos, para que
+        un grupo nunca mezcle OTP con correo masivo.
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._connection().execute(
+                "UPDATE outbound SET status = ?, attempts = attempts + 1 "
+                "WHERE id IN (SELECT id FROM outbound WHERE status = ? AND next_attempt_at <= ? "
+                "AND priority = (SELECT MIN(priority) FROM outbound WHERE status = ? AND next_attempt_at <= ?) "
+                "ORDER BY next_attempt_at LIMIT ?) "
+                "RETURNING id, route, from_addr, recipients, message, attempts, priority, next_attempt_at",
+                (STATUS_SENDING, STATUS_PENDING, now, STATUS_PENDING, now, max(1, limit))
+            ).fetchall()
+        # RETURNING no garantiza el orden de la subconsulta
+        rows.sort(key=lambda row: row[7])
+        return [
+            SpoolItem(
+                id=row[0],
+                route=row[1],
+                from_addr=row[2],
+                recipients=json.loads(row[3]),
+                message=row[4],
+                attempts=row[5],
+                priority=row[6],
+            )
+            for row in rows
+        ]
+
+    def mark_sent(self, message_id: str) -> None:
+        """Marca el mensaje como entregado y libera su contenido."""
+        with self._lock:
+            self._connection().execute(
+                "UPDATE outbound SET status = ?, message = x'', last_error = NULL, next_attempt_at = ? "
+                "WHERE id = ?",
+                (STATUS_SENT, time.time(), message_id)
+            )
+
+    def mark_failed(self, message_id: str, error: str, retry_at: Optional[float] = None) -> None:
+        """
+        Registra un fallo; si `retry_at` se indica, el mensaje vuelve a la cola
+        (o queda `superseded` si ya hay uno más nuevo con su clave).
+        """
+        if retry_at is not None:
+            status_sql, status = _STATUS_UNLESS_SUPERSEDED, STATUS_PENDING
+        else:
+            status_sql, status = "?", STATUS_FAILED
+        with self._lock:
+            self._connection().execute(
+                f"UPDATE outbound SET status = {status_sql}, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (status, error, retry_at or time.time(), message_id)
+            )
+
+    def defer(self, message_id: str, retry_at: float) -> None:
+        """Devuelve el mensaje a la cola sin contar el intento (falta de presupuesto de envío)."""
+        with self._lock:
+            self._connection().execute(
+                f"UPDATE outbound SET status = {_STATUS_UNLESS_SUPERSEDED}, attempts = attempts - 1, "
+                "next_attempt_at = ? WHERE id = ?",
+                (STATUS_PENDING, retry_at, message_id)
+            )
+
+    def purge(self, older_than: float) -> int:
+        """
+        Borra los mensajes terminados hace más de `older_than` segundos.
+
+        Returns:
+            int: Cantidad de mensajes borrados.
+        """
+        placeholders = ", ".join("?" for _ in _FINISHED)
+        with self._lock:
+            return self._connection().execute(
+                f"DELETE FROM outbound WHERE status IN ({placeholders}) AND next_attempt_at < ?",
+                (*_FINISHED, time.time() - older_than)
+            ).rowcount
+
+    def depth(self) -> int:
+        """Cantidad de mensajes pendientes o en envío."""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM outbound WHERE status IN (?, ?)",
+                (STATUS_PENDING, STATUS_SENDING)
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        """Conteo de mensajes por estado."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) FROM outbound GROUP BY status"
+            ).fetchall()
+        counts = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0, STATUS_SUPERSEDED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SpoolWorkers:
+    """
+    Workers en segundo plano que vacían el spool hacia el relay SMTP.
+
+    Cada worker reserva hasta `batch_size` mensajes listos, los entrega por
+    una sola sesión del relay (con PIPELINING) y los marca como enviados; los fallos se reintentan con espera exponencial
+    y jitter hasta `SPOOL_MAX_ATTEMPTS`. Si el relay no tiene presupuesto de envío, el
+    mensaje se difiere sin consumir un intento. Al detenerse, los workers siguen vaciando la
+    cola hasta que no quedan mensajes listos o vence el plazo de drenado. Cada
+    `PURGE_INTERVAL` segundos uno de ellos borra los mensajes terminados más
+    antiguos que `retention` (0 = conservarlos).
+    """
+
+    def __init__(self, spool: OutboundSpool, concurrency: int = 4, max_attempts: int = 5,
+                 retry_delay: float = 30, poll_interval: float = 1, batch_size: int = 1,
+                 retention: float = 0):
+        self.spool = spool
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.retention = retention
+
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._purged_at = 0.0
+
+        # Métricas de entrega
+        self.delivered = 0
+        self.retried = 0
+        self.deferred = 0
+        self.failed = 0
+        self.purged = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def notify(self) -> None:
+        """Despierta a los workers tras encolar un mensaje nuevo."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _deliver(self, items: list[SpoolItem]) -> None:
+        """Entrega los mensajes reservados; varios comparten una sesión SMTP (PIPELINING)."""
+        # Las métricas del envío se etiquetan con la ruta que encoló el mensaje
+        current_route.set(items[0].route)
+        if len(items) == 1:
+            item = items[0]
+            try:
+                outcome = await send_message_async(item.from_addr, item.recipients, item.message, item.priority)
+            except Exception as e:
+                outcome = e
+            await self._settle(item, outcome)
+            return
+
+        outcomes = await send_messages_async(
+            [(item.from_addr, item.recipients, item.message) for item in items], items[0].priority
+        )
+        for item, outcome in zip(items, outcomes):
+            await self._settle(item, outcome)
+
+    async def _settle(self, item: SpoolItem, outcome: Union[dict, Exception]) -> None:
+        """Marca un mensaje como enviado, diferido o fallido según el resultado de su entrega."""
+        if isinstance(outcome, SendBudgetExceededError):
+            self.deferred += 1
+            retry_at = time.time() + max(outcome.retry_after, self.poll_interval)
+            await asyncio.to_thread(self.spool.defer, item.id, retry_at)
+        elif isinstance(outcome, Exception):
+            # Un corte durante DATA pudo haber entregado el mensaje: no se reenvía
+            if item.attempts < self.max_attempts and not isinstance(outcome, SMTPDataInterruptedError):
+                retry_at = time.time() + backoff_delay(self.retry_delay, item.attempts - 1)
+                self.retried += 1
+                logger.warning("Fallo entregando mensaje del spool, reintentando",
+                               message_id=item.id, attempt=item.attempts, error=str(outcome))
+            else:
+                retry_at = None
+                self.failed += 1
+                logger.error("Mensaje del spool descartado", message_id=item.id, attempts=item.attempts,
+                             error=str(outcome))
+            await asyncio.to_thread(self.spool.mark_failed, item.id, str(outcome), retry_at)
+        else:
+            if outcome:
+                logger.warning("Destinatarios rechazados", message_id=item.id, refused=list(outcome))
+            await asyncio.to_thread(self.spool.mark_sent, item.id)
+            self.delivered += 1
+
+    async def _purge(self) -> None:
+        """Borra los mensajes terminados vencidos si pasó `PURGE_INTERVAL` desde la última purga."""
+        if self.retention <= 0 or time.monotonic() - self._purged_at < PURGE_INTERVAL:
+            return
+        # Se marca antes de esperar para que los demás workers no purguen a la vez
+        self._purged_at = time.monotonic()
+        try:
+            purged = await asyncio.to_thread(self.spool.purge, self.retention)
+        except Exception as e:
+            logger.error("Error purgando mensajes terminados del spool", exc_info=e)
+            return
+        self.purged += purged
+        if purged:
+            logger.debug("Mensajes terminados purgados del spool", purged=purged)
+
+    async def _run(self) -> None:
+        while True:
+            await self._purge()
+            items = await asyncio.to_thread(self.spool.claim_many, self.batch_size)
+            if items:
+                await self._deliver(items)
+                continue
+
+            if self._stopping:
+                return
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Inicia los workers en el event loop actual."""
+        if self._tasks:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        logger.info("Workers de spool iniciados", workers=self.concurrency, path=self.spool.path)
+
+    async def stop(self, drain_timeout: float = 30) -> None:
+        """Drena los mensajes listos dentro del plazo y detiene los workers."""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self.notify()
+        done, pending = await asyncio.wait(self._tasks, timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning("Plazo de drenado vencido", remaining=await asyncio.to_thread(self.spool.depth))
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": self.concurrency,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "deferred": self.deferred,
+            "failed": self.failed,
+            "purged": self.purged,
+        }
+
+
+# Instancias globales del spool y sus workers (modo DELIVERY_MODE="queued")
+outbound_spool = OutboundSpool(settings.SPOOL_PATH)
+spool_workers = SpoolWorkers(
+    outbound_spool,
+    concurrency=settings.SPOOL_WORKERS,
+    max_attempts=settings.SPOOL_MAX_ATTEMPTS,
+    retry_delay=settings.SPOOL_RETRY_DELAY,
+    poll_interval=settings.SPOOL_POLL_INTERVAL,
+    batch_size=settings.SMTP_PIPELINE_MAX_MESSAGES,
+    retention=settings.SPOOL_RETENTION_SECONDS,
+)
+
+
+async def enqueue_message(route: str, from_addr: str, recipients: list[str], message: bytes,
+                          priority: int = PRIORITY_BULK, supersede_key: Optional[str] = None) -> str:
+    """
+    Encola un mensaje en el spool durable y despierta a los workers.
+
+    Con `supersede_key` reemplaza al mensaje pendiente con la misma clave.
+
+    Returns:
+        str: Identificador del mensaje encolado.
+    """
+    message_id = await asyncio.to_thread(
+        outbound_spool.enqueue, route, from_addr, recipients, message, priority, supersede_key
+    )
+    spool_workers.notify()
+    return message_id
@@ -0,0 +1,153 @@
+import ssl
+import threading
+import time
+from typing import Optional
+
+from app.config import settings
+
+
+class TimedSSLObject(ssl.SSLObject):
+    """`SSLObject` que acumula el tiempo de CPU del handshake (transporte asyncio)."""
+
+    handshake_cpu = 0.0
+
+    def do_handshake(self) -> None:
+        started = time.thread_time()
+        try:
+            super().do_handshake()
+        finally:
+            # En modo no bloqueante se llama varias veces hasta completar el handshake
+            self.handshake_cpu += time.thread_time() - started
+
+
+class TimedSSLSocket(ssl.SSLSocket):
+    """`SSLSocket` que acumula el tiempo de CPU del handshake (transporte `smtplib`)."""
+
+    handshake_cpu = 0.0
+
+    def do_handshake(self, block: bool = False) -> None:
+        started = time.thread_time()
+        try:
+            super().do_handshake(block)
+        finally:
+            self.handshake_cpu += time.thread_time() - started
+
+
+class TLSHandshakeStats:
+    """Métricas de handshakes TLS por servidor: cantidad, reanudados, latencia y CPU."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: dict[str, dict] = {}
+
+    def record(self, host: str, latency: float, cpu: float, resumed: bool) -> None:
+        with self._lock:
+            entry = self._hosts.setdefault(
+                host, {"handshakes": 0, "resumed": 0, "latency_total": 0.0, "cpu_total": 0.0}
+            )
+            entry["handshakes"] += 1
+            entry["resumed"] += int(resumed)
+            entry["latency_total"] += latency
+            entry["cpu_total"] += cpu
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                host: {
+                    "handshakes": entry["handshakes"],
+                    "resumed": entry["resumed"],
+                    "resumption_ratio": round(entry["resumed"] / entry["handshakes"], 4),
+                    "avg_latency_ms": round(entry["latency_total"] / entry["handshakes"] * 1000, 2),
+                    "avg_cpu_ms": round(entry["cpu_total"] / entry["handshakes"] * 1000, 3),
+                }
+                for host, entry in self._hosts.items()
+            }
+
+
+class ResumableSSLContext(ssl.SSLContext):
+    """
+    Contexto SSL compartido que reanuda sesiones TLS por servidor.
+
+    Guarda la última sesión TLS de cada servidor y la ofrece en el siguiente
+    handshake hacia el mismo host, tanto en `wrap_socket()` (usado por
+    `smtplib`) como en `wrap_bio()` (usado por asyncio). Con reanudación el
+    servidor evita el intercambio de claves completo y la validación de la
+    cadena de certificados.
+    """
+
+    sslobject_class = TimedSSLObject
+    sslsocket_class = TimedSSLSocket
+
+    def __init__(self, protocol: int = ssl.PROTOCOL_TLS_CLIENT, resumption: bool = True):
+        # SSLContext se inicializa en __new__ con `protocol`
+        self.resumption_enabled = resumption
+        self._sessions: dict[str, ssl.SSLSession] = {}
+        self._session_lock = threading.Lock()
+
+    def get_session(self, host: Optional[str]) -> Optional[ssl.SSLSession]:
+        if not self.resumption_enabled or host is None:
+            return None
+        with self._session_lock:
+            return self._sessions.get(host)
+
+    def store_session(self, host: str, session: Optional[ssl.SSLSession]) -> None:
+        """Guarda la sesión para reanudarla en la próxima conexión a `host`."""
+        if not self.resumption_enabled or session is None:
+            return
+        with self._session_lock:
+            self._sessions[host] = session
+
+    def wrap_socket(self, sock, server_side=False, do_handshake_on_connect=True,
+                    suppress_ragged_eofs=True, server_hostname=None, session=None):
+        started = time.perf_counter()
+        wrapped = super().wrap_socket(
+            sock,
+            server_side=server_side,
+            do_handshake_on_connect=do_handshake_on_connect,
+            suppress_ragged_eofs=suppress_ragged_eofs,
+            server_hostname=server_hostname,
+            session=session or self.get_session(server_hostname),
+        )
+        if do_handshake_on_connect and not server_side:
+            tls_stats.record(server_hostname or "?", time.perf_counter() - started,
+                             wrapped.handshake_cpu, wrapped.session_reused)
+        return wrapped
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        return super().wrap_bio(
+            incoming,
+            outgoing,
+            server_side=server_side,
+            server_hostname=server_hostname,
+            session=session or self.get_session(server_hostname),
+        )
+
+
+def create_ssl_context(resumption: bool = True) -> ResumableSSLContext:
+    """Crea un contexto equivalente a `ssl.create_default_context()` con reanudación de sesiones."""
+    context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT, resumption=resumption)
+    context.verify_flags |= ssl.VERIFY_X509_PARTIAL_CHAIN | ssl.VERIFY_X509_STRICT
+    context.load_default_certs(ssl.Purpose.SERVER_AUTH)
+    return context
+
+
+# Métricas globales de handshakes TLS
+tls_stats = TLSHandshakeStats()
+
+_default_context: Optional[ResumableSSLContext] = None
+_default_lock = threading.Lock()
+
+
+def get_ssl_context() -> ResumableSSLContext:
+    """
+    Contexto SSL compartido por todos los relays.
+
+    Se construye una sola vez (cargar el almacén de CAs es costoso) y se
+    reutiliza en cada conexión SMTP, síncrona o asíncrona.
+    """
+    global _default_context
+    if _default_context is None:
+        with _default_lock:
+            if _default_context is None:
+                _default_context = create_ssl_context(settings.SMTP_TLS_SESSION_RESUMPTION)
+    return _default_context
@@ -0,0 +1,97 @@
+from typing import Sequence, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.smtp.mime import transfer_stats
+from app.smtp.relays import relay_router
+from app.smtp.scheduler import PRIORITY_BULK
+from app.smtp.tls import tls_stats
+
+
+TRANSPORT_ASYNC = "async"
+TRANSPORT_SYNC = "sync"
+
+
+def send_message(
+    from_addr: str,
+    to_addrs: Union[str, Sequence[str]],
+    msg: Union[str, bytes],
+    priority: int = PRIORITY_BULK,
+) -> dict:
+    """
+    Envía un mensaje con el transporte bloqueante (`smtplib`) a través de los relays.
+
+    Returns:
+        dict: Destinatarios rechazados (vacío si todos fueron aceptados).
+    """
+    return relay_router.send(from_addr, to_addrs, msg, priority)
+
+
+async def send_message_async(
+    from_addr: str,
+    to_addrs: Union[str, Sequence[str]],
+    msg: Union[str, bytes],
+    priority: int = PRIORITY_BULK,
+) -> dict:
+    """
+    Envía un mensaje con el transporte configurado en `SMTP_TRANSPORT`.
+
+    - `async`: cliente SMTP nativo de asyncio, sin ocupar el threadpool.
+    - `sync`: pool `smtplib` bloqueante ejecutado en el threadpool de Starlette.
+
+    Ambos caminos se mantienen disponibles para poder compararlos en benchmarks.
+    En los dos casos el relay se elige por peso, con failover entre relays, y el
+    envío consume presupuesto del relay según `priority` (OTP antes que masivo).
+
+    Returns:
+        dict: Destinatarios rechazados (vacío si todos fueron aceptados).
+    """
+    if settings.SMTP_TRANSPORT == TRANSPORT_SYNC:
+        return await run_in_threadpool(relay_router.send, from_addr, to_addrs, msg, priority)
+    return await relay_router.send_async(from_addr, to_addrs, msg, priority)
+
+
+async def send_messages_async(
+    messages: Sequence[tuple[str, Union[str, Sequence[str]], Union[str, bytes]]],
+    priority: int = PRIORITY_BULK,
+) -> list[Union[dict, Exception]]:
+    """
+    Envía varios mensajes seguidos con el transporte configurado en `SMTP_TRANSPORT`.
+
+    - `async`: una sola sesión del relay con PIPELINING (si el relay lo anuncia).
+    - `sync`: `smtplib` no implementa PIPELINING; los mensajes se envían uno por
+      uno en el threadpool.
+
+    Args:
+        messages (Sequence[tuple]): **Mensajes** como `(remitente, destinatarios, mensaje)`.
+
+    Returns:
+        list[dict | Exception]: Por mensaje y en el mismo orden, los destinatarios
+            rechazados o el error con el que terminó su envío.
+    """
+    if settings.SMTP_TRANSPORT != TRANSPORT_SYNC:
+        return await relay_router.send_many_async(messages, priority)
+
+    results: list[Union[dict, Exception]] = []
+    for from_addr, to_addrs, msg in messages:
+        try:
+            results.append(await run_in_threadpool(relay_router.send, from_addr, to_addrs, msg, priority))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def uses_async_transport() -> bool:
+    return settings.SMTP_TRANSPORT != TRANSPORT_SYNC
+
+
+def active_pool_stats() -> dict:
+    """Métricas por relay del transporte activo."""
+    return {
+        "transport": settings.SMTP_TRANSPORT,
+        "relays": relay_router.stats(use_async=uses_async_transport()),
+        "scheduler": relay_router.scheduler_stats(),
+        "tls": tls_stats.stats(),
+        "transfer_encoding": transfer_stats.stats(),
+    }
@@ -0,0 +1,161 @@
+import asyncio
+import codecs
+import json
+from typing import Any, AsyncIterator, Union
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive
+
+
+# Tamaño máximo de un elemento del lote; evita acumular memoria con entradas malformadas
+MAX_ITEM_BYTES = 64 * 1024
+
+
+class BatchItemError(Exception):
+    """Elemento del lote que no pudo decodificarse como JSON."""
+
+
+async def iter_json_items(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Union[Any, BatchItemError]]]:
+    """
+    Decodifica de forma incremental un cuerpo NDJSON o un array JSON.
+
+    El formato se detecta por el primer carácter no vacío: `[` indica un array
+    JSON; cualquier otro, NDJSON (un objeto por línea). Solo se mantiene en
+    memoria el elemento en curso, por lo que el consumo es constante sin
+    importar el tamaño del lote.
+
+    En un array los elementos deben separarse con exactamente una coma y tras
+    el `]` solo se admiten espacios; cualquier otra cosa termina el lote con
+    un `BatchItemError`, ya que no es posible resincronizar.
+
+    Args:
+        chunks (AsyncIterator[bytes]): **Cuerpo del request** en fragmentos (`request.stream()`).
+
+    Yields:
+        tuple[int, Any | BatchItemError]: Índice del elemento y su valor decodificado,
+        o un `BatchItemError` si el elemento es inválido.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    json_decoder = json.JSONDecoder()
+    buffer = ""
+    mode = None
+    # Modo array: lo que se espera a continuación ("first", "value", "separator" o "end")
+    expect = "first"
+    index = 0
+    finished = False
+
+    async def more() -> bool:
+        nonlocal buffer
+        try:
+            chunk = await anext(chunks)
+        except StopAsyncIteration:
+            buffer += decoder.decode(b"", final=True)
+            return False
+        buffer += decoder.decode(chunk)
+        return True
+
+    has_more = True
+    while not finished:
+        if mode is None:
+            stripped = buffer.lstrip()
+            if not stripped:
+                if not has_more:
+                    return
+                buffer = ""
+                has_more = await more()
+                continue
+            buffer = stripped
+            mode = "array" if buffer[0] == "[" else "ndjson"
+            if mode == "array":
+                buffer = buffer[1:]
+
+        if mode == "ndjson":
+            newline = buffer.find("\n")
+            if newline == -1 and has_more:
+                if len(buffer) > MAX_ITEM_BYTES:
+                    yield index, BatchItemError(f"Elemento excede {MAX_ITEM_BYTES} bytes")
+                    return
+                has_more = await more()
+                continue
+
+            line, buffer = (buffer[:newline], buffer[newline + 1:]) if newline != -1 else (buffer, "")
+            line = line.strip()
+            if line:
+                try:
+                    yield index, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield index, BatchItemError(f"JSON inválido: {e.msg}")
+                index += 1
+            if newline == -1 and not has_more:
+                finished = True
+            continue
+
+        # Modo array: un valor, luego exactamente una coma o el cierre
+        buffer = buffer.lstrip()
+        if not buffer:
+            if not has_more:
+                if expect != "end":
+                    yield index, BatchItemError("Array JSON sin cerrar")
+                return
+            has_more = await more()
+            continue
+        if expect == "end":
+            yield index, BatchItemError("Datos inesperados después del cierre del array")
+            return
+        if expect == "separator" or (expect == "first" and buffer[0] == "]"):
+            if buffer[0] == "]":
+                expect = "end"
+            elif buffer[0] == ",":
+                expect = "value"
+            else:
+                yield index, BatchItemError("Se esperaba ',' o ']' entre elementos del array")
+                return
+            buffer = buffer[1:]
+            continue
+        try:
+            value, end = json_decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            if has_more and len(buffer) <= MAX_ITEM_BYTES:
+                has_more = await more()
+                continue
+            # En un array no es posible resincronizar tras un elemento malformado
+            yield index, BatchItemError(f"JSON inválido: {e.msg}")
+            return
+        if end == len(buffer) and has_more:
+            # Un número o literal al final del fragmento puede continuar en el siguiente
+            has_more = await more()
+            continue
+        buffer = buffer[end:]
+        expect = "separator"
+        yield index, value
+        index += 1
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que produce resultados mientras aún consume el cuerpo del request.
+
+    `StreamingResponse` escucha `http.disconnect` en paralelo leyendo `receive()`,
+    lo que competiría con `request.stream()` y descartaría fragmentos del cuerpo.
+    Esta variante solo empieza a escuchar desconexiones cuando el cuerpo se
+    terminó de leer.
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], body_consumed: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_consumed = body_consumed
+
+    async def listen_for_disconnect(self, receive: Receive) -> None:
+        await self.body_consumed.wait()
+        await super().listen_for_disconnect(receive)
+
+
+async def iter_request_body(request: Request, body_consumed: asyncio.Event) -> AsyncIterator[bytes]:
+    """Itera el cuerpo del request y marca `body_consumed` al terminar."""
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                yield chunk
+    finally:
+        body_consumed.set()
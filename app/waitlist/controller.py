@@ -1,12 +1,26 @@
+import asyncio
 import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader
-from pathlib import Path
+from typing import Any, AsyncIterator, Optional, Union
+from pydantic import ValidationError
+from app.admission import recipient_wait
 from app.config import settings
+from app.observability import get_logger
+from app.observability.tracing import start_span
 from app.waitlist.models import WaitlistEmailRequest, WaitlistEmailResponse
+from app.rendering import template_registry
+from app.smtp import send_message, send_message_async, send_messages_async
+from app.smtp.mime import MessageTemplate
+from app.smtp.scheduler import SendBudgetExceededError
+from app.smtp.spool import DELIVERY_QUEUED, enqueue_message
+from app.smtp.transport import uses_async_transport
+from app.waitlist.batch import BatchItemError
+
+
+SPOOL_ROUTE = "/waitlist/send_confirmation"
+
+# Logs por envío: los INFO se muestrean con LOG_SEND_SAMPLE_RATE
+logger = get_logger(__name__, sampled=True)
 
 
 class EmailWaitlistApplication:
@@ -19,13 +33,17 @@ class EmailWaitlistApplication:
     """
     
     def __init__(self):
-        """Inicializa el controlador con configuración de templates."""
-        # Configurar Jinja2 para templates
-        template_dir = Path(__file__).parent.parent / "templates"
-        self.jinja_env = Environment(loader=FileSystemLoader(template_dir))
-        
-        print(f"[INFO] EmailWaitlistApplication inicializado")
-        print(f"[INFO] Template directory: {template_dir}")
+        """Inicializa el controlador; las plantillas vienen del registro compartido."""
+        logger.debug("EmailWaitlistApplication inicializado", templates_dir=str(template_registry.templates_dir))
+        # Cabeceras y estructura MIME precodificadas; por request solo To y los cuerpos
+        #subject = f"¡Gracias por registrarte! - {settings.APP_NAME}"
+        self._message = MessageTemplate(
+            settings.SMTP_FROM_EMAIL,
+            "¡Gracias por unirte a la lista de espera!",
+            ("plain", "html"),
+            multipart="alternative",
+            from_name=settings.SMTP_FROM_NAME,
+        )
     
     def send_waitlist_email(self, request: WaitlistEmailRequest) -> WaitlistEmailResponse:
         """
@@ -57,101 +75,318 @@ class EmailWaitlistApplication:
             'multiple'
         """
         try:
-            print(f"[INFO] Iniciando envío de email de waitlist a: {request.email}")
-            print(f"[INFO] Ofertas especificadas: {request.offerings}")
-            
-            # Preparar datos básicos para la plantilla
-            user_name = request.user_name or "Usuario"
-            website_url = request.website_url or settings.WEBSITE_URL
-            show_website_button = bool(website_url and website_url.strip())
-            
-            # Generar texto personalizado según las ofertas
-            offerings_data = self._generate_offerings_text(request.offerings)
-            
-            template_data = {
-                "app_name": settings.APP_NAME,
-                "company_name": settings.COMPANY_NAME,
-                "logo_url": settings.COMPANY_LOGO_URL,
-                "support_email": settings.SUPPORT_EMAIL,
-                "website_url": website_url,
-                "user_name": user_name,
-                "user_email": request.email,
-                "show_website_button": show_website_button,
-                **offerings_data  # Incluir datos de ofertas
-            }
+            message, template_data = self._prepare_message(request)
             
-            print(f"[INFO] Datos de plantilla preparados para: {user_name}")
-            print(f"[INFO] Tipo de mensaje: {offerings_data['message_type']}")
-            
-            # Renderizar plantilla HTML
-            template = self.jinja_env.get_template("waitlist.html")
-            html_content = template.render(**template_data)
-            
-            print(f"[INFO] Plantilla HTML renderizada exitosamente")
-            
-            # Crear mensaje de email
-            message = MIMEMultipart("alternative")
-            #message["Subject"] = f"¡Gracias por registrarte! - {settings.APP_NAME}"
-            message["Subject"] = "¡Gracias por unirte a la lista de espera!"
-            message["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
-            message["To"] = request.email
+            # Enviar email
+            self._send_email_smtp(message, request.email)
             
-            # Crear versión de texto plano como fallback
-            text_content = self._generate_text_content(
-                user_name, request.email, website_url, show_website_button, offerings_data
-            )
+            return self._build_response(request, template_data)
             
-            # Adjuntar ambas versiones
-            part1 = MIMEText(text_content, "plain", "utf-8")
-            part2 = MIMEText(html_content, "html", "utf-8")
+        except Exception as e:
+            return self._build_error_response(request, e)
+    
+    async def send_waitlist_email_async(self, request: WaitlistEmailRequest) -> WaitlistEmailResponse:
+        """
+        Versión asíncrona de `send_waitlist_email()`.
+        
+        Usa el transporte configurado en `SMTP_TRANSPORT`: el cliente SMTP
+        asyncio nativo o el pool `smtplib` ejecutado en el threadpool.
+        
+        Args:
+            request (WaitlistEmailRequest): **Datos del email** con información
+                                          del usuario, ofertas y configuración opcional.
+        
+        Returns:
+            WaitlistEmailResponse: **Resultado del envío** con detalles completos.
+        """
+        try:
+            message, template_data = self._prepare_message(request)
             
-            message.attach(part1)
-            message.attach(part2)
+            await self._send_email_smtp_async(message, request.email)
             
-            print(f"[INFO] Mensaje de email preparado")
+            return self._build_response(request, template_data)
             
-            # Enviar email
-            self._send_email_smtp(message, request.email)
+        except Exception as e:
+            return self._build_error_response(request, e)
+    
+    async def send_waitlist_emails_async(self, requests: list[WaitlistEmailRequest]) -> list[WaitlistEmailResponse]:
+        """
+        Envía varias confirmaciones de waitlist por una sola sesión SMTP.
+        
+        Los mensajes viajan seguidos con PIPELINING cuando el relay lo anuncia,
+        de modo que cada uno cuesta un solo viaje de ida y vuelta. Un rechazo
+        afecta solo a su destinatario.
+        
+        Args:
+            requests (list[WaitlistEmailRequest]): **Datos de cada email** del grupo.
+        
+        Returns:
+            list[WaitlistEmailResponse]: **Resultado por email**, en el mismo orden.
+        """
+        responses: list[Optional[WaitlistEmailResponse]] = [None] * len(requests)
+        prepared = []
+        for position, request in enumerate(requests):
+            try:
+                message, template_data = self._prepare_message(request)
+                prepared.append((position, template_data, message))
+            except Exception as e:
+                responses[position] = self._build_error_response(request, e)
+        
+        logger.debug("Enviando emails de waitlist en una sesión", count=len(prepared),
+                     transport=settings.SMTP_TRANSPORT)
+        outcomes = await send_messages_async(
+            [(settings.SMTP_FROM_EMAIL, [requests[position].email], message) for position, _, message in prepared]
+        )
+        
+        for (position, template_data, _), outcome in zip(prepared, outcomes):
+            request = requests[position]
+            if isinstance(outcome, Exception):
+                responses[position] = self._build_error_response(request, self._translate_smtp_error(outcome))
+            else:
+                responses[position] = self._build_response(request, template_data)
+        return responses
+    
+    async def queue_waitlist_email(self, request: WaitlistEmailRequest) -> WaitlistEmailResponse:
+        """
+        Renderiza el email de waitlist y lo encola en el spool durable (modo `queued`).
+        
+        Args:
+            request (WaitlistEmailRequest): **Datos del email** a encolar.
+        
+        Returns:
+            WaitlistEmailResponse: **Confirmación** con el `message_id` asignado en el spool.
+        """
+        try:
+            message, template_data = self._prepare_message(request)
             
-            # Crear respuesta exitosa
-            response = WaitlistEmailResponse(
-                success=True,
-                message="Email de confirmación de waitlist enviado exitosamente",
-                email_sent_to=request.email,
-                timestamp=datetime.utcnow().isoformat() + "Z",
-                user_name=user_name,
-                has_website_button=show_website_button,
-                logo_used=settings.COMPANY_LOGO_URL,
-                offerings_count=len(request.offerings),
-                message_type=offerings_data['message_type'],
-                offerings_text=offerings_data['offerings_text'],
-                offerings_text_html=offerings_data['offerings_text_html']
+            message_id = await enqueue_message(
+                SPOOL_ROUTE, settings.SMTP_FROM_EMAIL, [request.email], message
             )
+            logger.info("Email de waitlist encolado", email=request.email, message_id=message_id)
             
-            print(f"[INFO] Email de waitlist enviado exitosamente a: {request.email}")
-            return response
+            return self._build_response(request, template_data, message_id=message_id)
             
         except Exception as e:
-            error_msg = f"Error enviando email de waitlist: {str(e)}"
-            print(f"[ERROR] {error_msg}")
+            return self._build_error_response(request, e)
+    
+    async def send_waitlist_batch(
+        self, items: AsyncIterator[tuple[int, Union[Any, BatchItemError]]]
+    ) -> AsyncIterator[dict]:
+        """
+        Envía un lote de confirmaciones de waitlist de forma incremental.
+        
+        Valida y renderiza cada elemento a medida que llega, mantiene como máximo
+        `WAITLIST_BATCH_CONCURRENCY` envíos en curso (reutilizando las sesiones del
+        pool SMTP) y produce un resultado por elemento en cuanto termina. Un
+        elemento inválido o rechazado no afecta al resto del lote.
+        
+        Con el transporte asyncio y entrega directa, los elementos se agrupan de a
+        `SMTP_PIPELINE_MAX_MESSAGES` y cada grupo viaja por una sola sesión con
+        PIPELINING; la concurrencia cuenta grupos en lugar de emails.
+        
+        Args:
+            items (AsyncIterator): **Elementos del lote** como `(índice, valor)`,
+                                   por ejemplo desde `iter_json_items()`.
+        
+        Yields:
+            dict: **Resultado por elemento** con `index`, `success` y `message`;
+                  al final, un resumen con `total`, `sent` y `failed`.
+        """
+        concurrency = max(1, settings.WAITLIST_BATCH_CONCURRENCY)
+        pipelined = settings.DELIVERY_MODE != DELIVERY_QUEUED and uses_async_transport()
+        group_size = max(1, settings.SMTP_PIPELINE_MAX_MESSAGES) if pipelined else 1
+        group: list[tuple[int, WaitlistEmailRequest]] = []
+        pending: set[asyncio.Task] = set()
+        total = sent = 0
+        
+        def collect(done: set[asyncio.Task]) -> list[dict]:
+            nonlocal sent
+            results = [result for task in done for result in task.result()]
+            sent += sum(1 for result in results if result["success"])
+            return results
+        
+        try:
+            async for index, item in items:
+                total += 1
+                
+                if isinstance(item, BatchItemError):
+                    yield self._batch_error(index, None, str(item))
+                    continue
+                
+                try:
+                    request = WaitlistEmailRequest.model_validate(item)
+                except ValidationError as e:
+                    email = item.get("email") if isinstance(item, dict) else None
+                    errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                    yield self._batch_error(index, email, f"Datos inválidos: {errors}")
+                    continue
+                
+                wait = recipient_wait(request.email)
+                if wait > 0:
+                    yield self._batch_error(
+                        index, request.email, f"Límite de envíos al destinatario excedido, reintentar en {wait:.0f}s"
+                    )
+                    continue
+                
+                group.append((index, request))
+                if len(group) < group_size:
+                    continue
+                pending.add(asyncio.create_task(self._send_batch_group(group)))
+                group = []
+                
+                # Con la ventana llena, esperar a que termine al menos un envío
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for result in collect(done):
+                        yield result
+                else:
+                    done = {task for task in pending if task.done()}
+                    pending -= done
+                    for result in collect(done):
+                        yield result
             
-            # Generar datos de ofertas para respuesta de error
-            offerings_data = self._generate_offerings_text(request.offerings)
+            if group:
+                pending.add(asyncio.create_task(self._send_batch_group(group)))
             
-            # Crear respuesta de error
-            return WaitlistEmailResponse(
-                success=False,
-                message=error_msg,
-                email_sent_to=request.email,
-                timestamp=datetime.utcnow().isoformat() + "Z",
-                user_name=request.user_name or "Usuario",
-                has_website_button=bool(request.website_url),
-                logo_used=settings.COMPANY_LOGO_URL,
-                offerings_count=len(request.offerings),
-                message_type=offerings_data['message_type'],
-                offerings_text=offerings_data['offerings_text'],
-                offerings_text_html=offerings_data['offerings_text_html']
-            )
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for result in collect(done):
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        logger.info("Lote de waitlist procesado", total=total, sent=sent, failed=total - sent)
+        yield {"summary": {"total": total, "sent": sent, "failed": total - sent}}
+    
+    async def _send_batch_group(self, group: list[tuple[int, WaitlistEmailRequest]]) -> list[dict]:
+        """Envía un grupo de elementos del lote por una sola sesión SMTP y resume sus resultados."""
+        if len(group) == 1:
+            return [await self._send_batch_item(*group[0])]
+        responses = await self.send_waitlist_emails_async([request for _, request in group])
+        return [self._batch_result(index, response) for (index, _), response in zip(group, responses)]
+    
+    async def _send_batch_item(self, index: int, request: WaitlistEmailRequest) -> dict:
+        """Envía (o encola, en modo `queued`) un elemento del lote y resume su resultado."""
+        if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+            response = await self.queue_waitlist_email(request)
+        else:
+            response = await self.send_waitlist_email_async(request)
+        return self._batch_result(index, response)
+    
+    def _batch_result(self, index: int, response: WaitlistEmailResponse) -> dict:
+        """Resultado de un elemento del lote a partir de su respuesta."""
+        return {
+            "index": index,
+            "email": response.email_sent_to,
+            "success": response.success,
+            "message": response.message,
+            "message_id": response.message_id,
+        }
+    
+    def _batch_error(self, index: int, email: Optional[str], message: str) -> dict:
+        """Resultado de error para un elemento del lote que no llegó a enviarse."""
+        return {
+            "index": index,
+            "email": email,
+            "success": False,
+            "message": message,
+            "message_id": None,
+        }
+    
+    def _prepare_message(self, request: WaitlistEmailRequest) -> tuple[bytes, dict]:
+        """
+        Renderiza la plantilla de waitlist y construye el mensaje MIME.
+        
+        Args:
+            request (WaitlistEmailRequest): **Datos del email** a preparar.
+        
+        Returns:
+            tuple[bytes, dict]: **Mensaje serializado listo para envío** y datos usados en la plantilla.
+        """
+        logger.debug("Preparando email de waitlist", email=request.email, offerings=request.offerings)
+        
+        # Preparar datos básicos para la plantilla
+        user_name = request.user_name or "Usuario"
+        website_url = request.website_url or settings.WEBSITE_URL
+        show_website_button = bool(website_url and website_url.strip())
+        
+        # Generar texto personalizado según las ofertas
+        offerings_data = self._generate_offerings_text(request.offerings)
+        
+        # Los datos de marca (app_name, logo, soporte) ya están en el esqueleto
+        # precalculado de la plantilla; aquí solo van los campos por request
+        template_data = {
+            "website_url": website_url,
+            "user_name": user_name,
+            "user_email": request.email,
+            "show_website_button": show_website_button,
+            **offerings_data  # Incluir datos de ofertas
+        }
+        
+        # Renderizar plantilla HTML
+        html_content = template_registry.render("waitlist.html", template_data)
+        
+        # Crear versión de texto plano como fallback
+        text_content = self._generate_text_content(
+            user_name, request.email, website_url, show_website_button, offerings_data
+        )
+        
+        # Mensaje multipart/alternative con ambas versiones
+        message = self._message.build(request.email, (text_content, html_content))
+        
+        logger.debug("Mensaje de waitlist preparado", email=request.email,
+                     message_type=offerings_data['message_type'], bytes=len(message))
+        
+        return message, template_data
+    
+    def _build_response(self, request: WaitlistEmailRequest, template_data: dict,
+                        message_id: Optional[str] = None) -> WaitlistEmailResponse:
+        """Construye la respuesta exitosa a partir de los datos usados en la plantilla."""
+        response = WaitlistEmailResponse(
+            success=True,
+            message=(
+                "Email de confirmación de waitlist encolado para envío" if message_id
+                else "Email de confirmación de waitlist enviado exitosamente"
+            ),
+            email_sent_to=request.email,
+            timestamp=datetime.utcnow().isoformat() + "Z",
+            user_name=template_data['user_name'],
+            has_website_button=template_data['show_website_button'],
+            logo_used=settings.COMPANY_LOGO_URL,
+            offerings_count=len(request.offerings),
+            message_type=template_data['message_type'],
+            offerings_text=template_data['offerings_text'],
+            offerings_text_html=template_data['offerings_text_html'],
+            message_id=message_id
+        )
+        
+        if not message_id:
+            logger.info("Email de waitlist enviado", email=request.email)
+        return response
+    
+    def _build_error_response(self, request: WaitlistEmailRequest, error: Exception) -> WaitlistEmailResponse:
+        """Construye la respuesta de error conservando los metadatos de ofertas."""
+        error_msg = f"Error enviando email de waitlist: {str(error)}"
+        logger.error("Error enviando email de waitlist", email=request.email, error=str(error))
+        
+        # Generar datos de ofertas para respuesta de error
+        offerings_data = self._generate_offerings_text(request.offerings)
+        
+        # Crear respuesta de error
+        return WaitlistEmailResponse(
+            success=False,
+            message=error_msg,
+            email_sent_to=request.email,
+            timestamp=datetime.utcnow().isoformat() + "Z",
+            user_name=request.user_name or "Usuario",
+            has_website_button=bool(request.website_url),
+            logo_used=settings.COMPANY_LOGO_URL,
+            offerings_count=len(request.offerings),
+            message_type=offerings_data['message_type'],
+            offerings_text=offerings_data['offerings_text'],
+            offerings_text_html=offerings_data['offerings_text_html']
+        )
     
     def _generate_offerings_text(self, offerings: list[str]) -> dict:
         """
@@ -244,56 +479,68 @@ Puedes escribirnos a {settings.SUPPORT_EMAIL} si necesitas más información sob
 Este es un mensaje automático, no respondas directamente.
         """.strip()
 
-    def _send_email_smtp(self, message: MIMEMultipart, recipient_email: str) -> None:
+    def _send_email_smtp(self, message: bytes, recipient_email: str) -> None:
         """
         Envía el email usando configuración SMTP.
         
-        Método privado que maneja la conexión SMTP y el envío real del mensaje
-        utilizando la configuración de variables de entorno.
+        Método privado que delega el envío real del mensaje a los relays SMTP,
+        reutilizando sesiones ya autenticadas y con failover entre relays.
         
         Args:
-            message (MIMEMultipart): **Mensaje preparado** para envío.
+            message (bytes): **Mensaje serializado** para envío.
             recipient_email (str): **Email del destinatario** para logging.
         
         Raises:
             Exception: Si falla la conexión SMTP o el envío del mensaje.
         """
         try:
-            print(f"[INFO] Conectando a servidor SMTP: {settings.SMTP_HOST}:{settings.SMTP_PORT}")
-            
-            # Crear contexto SSL
-            context = ssl.create_default_context()
-            
-            # Conectar al servidor SMTP
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                if settings.SMTP_USE_TLS:
-                    server.starttls(context=context)
-                    print(f"[INFO] TLS habilitado")
-                
-                # Autenticarse
-                server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-                print(f"[INFO] Autenticación SMTP exitosa")
-                
-                # Enviar mensaje
-                server.send_message(message)
-                print(f"[INFO] Mensaje enviado exitosamente via SMTP a: {recipient_email}")
+            # Enviar mensaje usando una sesión autenticada de alguno de los relays
+            with start_span("waitlist.send", transport="sync"):
+                send_message(settings.SMTP_FROM_EMAIL, [recipient_email], message)
+            logger.debug("Mensaje entregado al relay", email=recipient_email, transport="sync")
                 
-        except smtplib.SMTPAuthenticationError as e:
-            error_msg = f"Error de autenticación SMTP: {str(e)}"
-            print(f"[ERROR] {error_msg}")
-            raise Exception(error_msg)
+        except Exception as e:
+            raise self._translate_smtp_error(e)
+    
+    async def _send_email_smtp_async(self, message: bytes, recipient_email: str) -> None:
+        """
+        Envía el email con el transporte configurado en `SMTP_TRANSPORT`.
+        
+        Args:
+            message (bytes): **Mensaje serializado** para envío.
+            recipient_email (str): **Email del destinatario** para logging.
+        
+        Raises:
+            Exception: Si falla la conexión SMTP o el envío del mensaje.
+        """
+        try:
+            with start_span("waitlist.send", transport=settings.SMTP_TRANSPORT):
+                await send_message_async(settings.SMTP_FROM_EMAIL, [recipient_email], message)
+            logger.debug("Mensaje entregado al relay", email=recipient_email, transport=settings.SMTP_TRANSPORT)
             
-        except smtplib.SMTPRecipientsRefused as e:
+        except Exception as e:
+            raise self._translate_smtp_error(e)
+    
+    def _translate_smtp_error(self, e: Exception) -> Exception:
+        """
+        Convierte errores SMTP en excepciones con mensaje descriptivo.
+        
+        Args:
+            e (Exception): **Error original** del transporte SMTP.
+        
+        Returns:
+            Exception: Excepción con mensaje legible para la respuesta.
+        """
+        if isinstance(e, SendBudgetExceededError):
+            error_msg = f"Envío diferido, sin presupuesto SMTP: {str(e)} (reintentar en {e.retry_after:.0f}s)"
+        elif isinstance(e, smtplib.SMTPAuthenticationError):
+            error_msg = f"Error de autenticación SMTP: {str(e)}"
+        elif isinstance(e, smtplib.SMTPRecipientsRefused):
             error_msg = f"Destinatario rechazado por servidor SMTP: {str(e)}"
-            print(f"[ERROR] {error_msg}")
-            raise Exception(error_msg)
-            
-        except smtplib.SMTPException as e:
+        elif isinstance(e, smtplib.SMTPException):
             error_msg = f"Error SMTP: {str(e)}"
-            print(f"[ERROR] {error_msg}")
-            raise Exception(error_msg)
-            
-        except Exception as e:
+        else:
             error_msg = f"Error de conexión: {str(e)}"
-            print(f"[ERROR] {error_msg}")
-            raise Exception(error_msg)
\ No newline at end of file
+        
+        logger.debug("Error SMTP traducido", error=error_msg)
+        return Exception(error_msg)
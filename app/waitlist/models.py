@@ -145,6 +145,7 @@ class WaitlistEmailResponse(BaseModel):
         offerings_count (int): **Cantidad de ofertas** - Número de ofertas especificadas.
         message_type (str): **Tipo de mensaje** - single/multiple/platform según ofertas.
         offerings_text (str): **Texto de ofertas** - Texto generado para las ofertas.
+        message_id (Optional[str]): **ID del mensaje encolado** - Solo en modo `queued`.
     """
     
     success: bool = Field(
@@ -202,6 +203,11 @@ class WaitlistEmailResponse(BaseModel):
         description="**Texto de ofertas HTML** - Texto con formato HTML para ofertas en negrita"
     )
     
+    message_id: Optional[str] = Field(
+        None,
+        description="**ID del mensaje encolado** - Solo en modo de entrega `queued` (202 Accepted)"
+    )
+    
     class Config:
         schema_extra = {
             "examples": [
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from app.admission import IDEMPOTENCY_HEADER, REPLAYED_HEADER, enforce_recipient_limit, send_once
+from app.config import settings
+from app.observability import get_logger
 from app.waitlist.controller import EmailWaitlistApplication
 from app.waitlist.models import WaitlistEmailRequest, WaitlistEmailResponse
-
-controller = EmailWaitlistApplication()
+from app.smtp.spool import DELIVERY_QUEUED
+from app.waitlist.batch import RequestStreamingResponse, iter_json_items, iter_request_body
 
 MODULE_NAME = "waitlist"
 
+logger = get_logger(__name__)
+
 router_waitlist = APIRouter(
     prefix=f"/{MODULE_NAME}",
     tags=[MODULE_NAME])
@@ -39,6 +47,11 @@ TAG_WAITLIST = {
 - **Configuración automática** - Branding desde variables de entorno
 - **Manejo robusto** - Validación y errores SMTP cubiertos
 
+### 📦 Envío por Lotes:
+- **`POST /waitlist/send_confirmation/batch`** - Cuerpo NDJSON o array JSON en streaming
+- **Resultados en streaming** - Una línea NDJSON por elemento en cuanto termina
+- **Errores aislados** - Un email inválido no afecta al resto del lote
+
 ### 🔧 Tipos de Respuesta:
 - **message_type: "platform"** - Sin ofertas específicas
 - **message_type: "single"** - Una sola oferta
@@ -47,8 +60,18 @@ TAG_WAITLIST = {
 """
 }
 
+def get_waitlist_controller(request: Request) -> EmailWaitlistApplication:
+    """Controlador de waitlist creado en el lifespan de la aplicación (`app.state.waitlist_controller`)."""
+    return request.app.state.waitlist_controller
+
+
 @router_waitlist.post("/send_confirmation", response_model=WaitlistEmailResponse)
-def enviar_confirmacion_waitlist(request: WaitlistEmailRequest) -> WaitlistEmailResponse:
+async def enviar_confirmacion_waitlist(
+    request: WaitlistEmailRequest,
+    http_response: Response,
+    controller: EmailWaitlistApplication = Depends(get_waitlist_controller),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+) -> WaitlistEmailResponse:
     """
     Envía email de confirmación de registro en lista de espera con personalización de ofertas.
     
@@ -91,6 +114,7 @@ def enviar_confirmacion_waitlist(request: WaitlistEmailRequest) -> WaitlistEmail
     Args:
         request (WaitlistEmailRequest): **Datos del usuario** con email obligatorio,
                                       ofertas de interés y personalización opcional.
+        idempotency_key (str, optional): **Header `Idempotency-Key`** para reintentos seguros.
     
     Returns:
         WaitlistEmailResponse: **Confirmación detallada** del envío con metadatos
@@ -127,11 +151,35 @@ def enviar_confirmacion_waitlist(request: WaitlistEmailRequest) -> WaitlistEmail
         - Máximo 10 ofertas permitidas, cada una con máximo 100 caracteres
         - El tipo de mensaje se incluye en la respuesta para debugging
         - Todos los elementos de branding se toman automáticamente de variables de entorno
+        - Con `DELIVERY_MODE=queued` el email se encola en el spool durable y se
+          responde `202 Accepted` con `message_id`; la entrega ocurre en segundo plano
+        - Se responde `429` con `Retry-After` si la IP o el destinatario superan su
+          límite de envíos (`MAX_REQUESTS_PER_*`, `MAX_EMAILS_PER_RECIPIENT_PER_*`)
+        - Un reintento con el mismo header `Idempotency-Key` (o, sin header, mismo cuerpo
+          dentro de `IDEMPOTENCY_DERIVED_TTL_SECONDS`) recibe la respuesta ya enviada
+          con `Idempotent-Replayed: true`, sin reenviar el email
+        - Reutilizar un `Idempotency-Key` con otro cuerpo responde `422` sin enviar
     """
     
-    try:
+    async def send() -> WaitlistEmailResponse:
+        # Límite por destinatario antes de renderizar o tocar SMTP; los reintentos no lo consumen
+        enforce_recipient_limit(request.email)
+        
         # Enviar email de confirmación de waitlist
-        response = controller.send_waitlist_email(request)
+        if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+            # Modo spool: validar, renderizar y encolar; la entrega es en segundo plano
+            return await controller.queue_waitlist_email(request)
+        return await controller.send_waitlist_email_async(request)
+    
+    try:
+        response, replayed = await send_once(
+            f"/{MODULE_NAME}/send_confirmation", request.email, idempotency_key,
+            request.model_dump_json(), send
+        )
+        if replayed:
+            http_response.headers[REPLAYED_HEADER] = "true"
+        if settings.DELIVERY_MODE == DELIVERY_QUEUED:
+            http_response.status_code = status.HTTP_202_ACCEPTED
         
         # Si el envío falló, lanzar HTTPException
         if not response.success:
@@ -147,8 +195,81 @@ def enviar_confirmacion_waitlist(request: WaitlistEmailRequest) -> WaitlistEmail
         raise
     except Exception as e:
         # Capturar cualquier otro error inesperado
-        print(f"[ERROR] Error inesperado en endpoint send_confirmation: {str(e)}")
+        logger.error("Error inesperado en endpoint send_confirmation", exc_info=e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error interno del servidor: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+async def _ndjson_lines(results: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Serializa cada resultado del lote como una línea NDJSON."""
+    async for result in results:
+        yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@router_waitlist.post(
+    "/send_confirmation/batch",
+    status_code=status.HTTP_200_OK,
+    response_class=RequestStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/WaitlistEmailRequest"}}
+                },
+            },
+        }
+    },
+)
+async def enviar_confirmaciones_waitlist_batch(
+    http_request: Request,
+    controller: EmailWaitlistApplication = Depends(get_waitlist_controller),
+) -> RequestStreamingResponse:
+    """
+    Envía confirmaciones de waitlist en lote a partir de un cuerpo en streaming.
+    
+    Pensado para importaciones masivas de registros: el cuerpo se lee y valida
+    de forma incremental, los emails se envían reutilizando unas pocas sesiones
+    SMTP y los resultados se devuelven en streaming, una línea por elemento en
+    cuanto termina su envío. La memoria se mantiene constante sin importar el
+    tamaño del lote.
+    
+    ### 📥 Formatos de Entrada:
+    - **NDJSON** (`application/x-ndjson`): un `WaitlistEmailRequest` por línea
+    - **Array JSON** (`application/json`): `[{...}, {...}]`
+    
+    ### 📤 Formato de Salida (NDJSON):
+    - Una línea por elemento: `index`, `email`, `success`, `message`, `message_id`
+    - Una línea final con `summary`: `total`, `sent`, `failed`
+    
+    Args:
+        http_request (Request): **Request HTTP** cuyo cuerpo se consume en streaming.
+    
+    Returns:
+        RequestStreamingResponse: **Resultados NDJSON** en el orden en que terminan los envíos.
+    
+    Example:
+        ```
+        {"email": "ana@empresa.com", "offerings": ["CRM Avanzado"]}
+        {"email": "juan@startup.com", "user_name": "Juan Pérez"}
+        ```
+    
+    Note:
+        - Un elemento con JSON o datos inválidos produce una línea con `success: false`
+          y el procesamiento continúa con el siguiente
+        - La concurrencia se controla con `WAITLIST_BATCH_CONCURRENCY`
+        - Con el transporte asyncio los emails viajan en grupos de `SMTP_PIPELINE_MAX_MESSAGES`
+          por sesión SMTP (PIPELINING); cada grupo se reporta cuando termina
+        - Con `DELIVERY_MODE=queued` los elementos se encolan en el spool en lugar de enviarse
+    """
+    body_consumed = asyncio.Event()
+    items = iter_json_items(iter_request_body(http_request, body_consumed))
+    results = controller.send_waitlist_batch(items)
+    return RequestStreamingResponse(
+        _ndjson_lines(results),
+        body_consumed=body_consumed,
+        media_type="application/x-ndjson"
+    )
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de la serialización MIME.
+
+Compara `MIMEMultipart` + `MIMEText` + `as_string()` (ruta anterior) contra
+`MessageTemplate.build()` con cabeceras y estructura precodificadas, usando
+un mensaje con el tamaño de la plantilla de waitlist.
+
+Uso:
+    python benchmarks/bench_mime.py [iteraciones]
+"""
+
+import sys
+import timeit
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.smtp.mime import MessageTemplate
+
+
+FROM_ADDR = "noreply@example.com"
+FROM_NAME = "SmtpMailer API"
+SUBJECT = "¡Gracias por unirte a la lista de espera!"
+TEXT = "Hola Ana,\n\nHemos registrado exitosamente tu correo en nuestra lista de espera.\n" * 8
+HTML = "<div class=\"content\"><p>Hola <strong>Ana</strong>, ¡gracias por registrarte!</p></div>" * 60
+
+
+def build_email_package(to_addr: str) -> bytes:
+    message = MIMEMultipart("alternative")
+    message["Subject"] = SUBJECT
+    message["From"] = f"{FROM_NAME} <{FROM_ADDR}>"
+    message["To"] = to_addr
+    message.attach(MIMEText(TEXT, "plain", "utf-8"))
+    message.attach(MIMEText(HTML, "html", "utf-8"))
+    return message.as_string().encode("ascii")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    template = MessageTemplate(FROM_ADDR, SUBJECT, ("plain", "html"), multipart="alternative", from_name=FROM_NAME)
+
+    legacy = timeit.timeit(lambda: build_email_package("ana@example.com"), number=iterations)
+    fast = timeit.timeit(lambda: template.build("ana@example.com", (TEXT, HTML)), number=iterations)
+
+    print(f"🚀 Serialización MIME ({iterations} iteraciones, ~{len(HTML) + len(TEXT)} caracteres de cuerpo)\n")
+    print(f"   email.generator:   {legacy / iterations * 1e6:8.2f} µs/mensaje")
+    print(f"   MessageTemplate:   {fast / iterations * 1e6:8.2f} µs/mensaje")
+    print(f"   Aceleración:       {legacy / fast:8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
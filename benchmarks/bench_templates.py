@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark del render de plantillas de email.
+
+Compara el render completo de Jinja contra el esqueleto precalculado
+(`PrerenderedTemplate`) para `otp.html` y `waitlist.html`.
+
+Uso:
+    python benchmarks/bench_templates.py [iteraciones]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.rendering import TemplateRegistry, TEMPLATES_DIR
+from app.rendering.prerender import EMAIL_PRERENDER_SPECS, branding_context
+
+
+CONTEXTS = {
+    "otp.html": {
+        "otp_code": "482913",
+        "expiry_minutes": 10,
+        "expiry_suffix": "s",
+        "show_expiry": True,
+        "redirect_url": "https://app.example.com/verify?code=482913",
+        "show_redirect_button": True,
+    },
+    "waitlist.html": {
+        "user_name": "Ana",
+        "user_email": "ana@example.com",
+        "website_url": "https://example.com",
+        "show_website_button": True,
+        "message_type": "multiple",
+        "availability_message": "En cuanto nuestras soluciones <strong>CRM</strong>, <strong>ERP</strong> estén disponibles oficialmente",
+        "offerings_text_html": "<strong>CRM</strong>, <strong>ERP</strong>",
+    },
+}
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    registry = TemplateRegistry(TEMPLATES_DIR, prerender_specs=EMAIL_PRERENDER_SPECS)
+    registry.load()
+    static_context = branding_context()
+
+    print(f"🚀 Render de plantillas ({iterations} iteraciones)\n")
+    for name, context in CONTEXTS.items():
+        template = registry.get(name)
+        prerendered = registry.get_prerendered(name)
+        full_context = {**static_context, **context}
+        assert prerendered.render(context) == template.render(full_context)
+
+        full = timeit.timeit(lambda: template.render(full_context), number=iterations)
+        fast = timeit.timeit(lambda: prerendered.render(context), number=iterations)
+        print(f"📄 {name} ({prerendered.variant_count} variantes)")
+        print(f"   Jinja completo:  {full / iterations * 1e6:8.2f} µs/render")
+        print(f"   Precalculado:    {fast / iterations * 1e6:8.2f} µs/render")
+        print(f"   Aceleración:     {full / fast:8.1f}x\n")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el control de admisión.
+
+Verifica la cola de requests en espera, el rechazo por threadpool saturado
+y la respuesta `503` con `Retry-After` del middleware.
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+import httpx
+from anyio import to_thread
+
+from app.admission import AdmissionController, AdmissionMiddleware, configure_threadpool, threadpool_stats
+
+
+async def _queue_limits():
+    controller = AdmissionController(capacity=1, queue_depth=1, queue_timeout=0.05, retry_after=2)
+    assert await controller.acquire() is None
+
+    waiter = asyncio.create_task(controller.acquire())
+    await asyncio.sleep(0)
+    assert controller.waiting == 1
+    # La cola admite un solo request en espera
+    assert await controller.acquire() == "queue_full"
+    assert await waiter == "timeout"
+
+    controller.release()
+    assert await controller.acquire() is None
+    return controller.stats()
+
+
+def test_queue_depth_and_timeout():
+    """Con la capacidad ocupada se espera en cola; con la cola llena o al vencer la espera se rechaza."""
+    print("🧪 Probando cola de admisión...")
+    stats = asyncio.run(_queue_limits())
+    assert stats["active"] == 1 and stats["waiting"] == 0
+    print(f"✅ {stats}\n")
+
+
+async def _threadpool_saturation():
+    configure_threadpool(1)
+    controller = AdmissionController(capacity=0, queue_depth=1, queue_timeout=1, retry_after=1)
+    release = threading.Event()
+    busy = asyncio.create_task(to_thread.run_sync(release.wait))
+    queued = asyncio.create_task(to_thread.run_sync(lambda: None))
+    await asyncio.sleep(0.05)
+
+    stats = threadpool_stats()
+    reason = await controller.acquire()
+    release.set()
+    await asyncio.gather(busy, queued)
+    return stats, reason
+
+
+def test_rejects_when_threadpool_is_saturated():
+    """Con tareas esperando un hilo del threadpool el request se rechaza sin encolarse."""
+    print("🧪 Probando saturación del threadpool...")
+    stats, reason = asyncio.run(_threadpool_saturation())
+    assert stats == {"total": 1, "active": 1, "waiting": 1}
+    assert reason == "threadpool"
+    print(f"✅ {stats} → rechazo '{reason}'\n")
+
+
+async def _middleware_responses():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    controller = AdmissionController(capacity=1, queue_depth=0, queue_timeout=1, retry_after=3)
+    app = AdmissionMiddleware(slow_app, controller)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = asyncio.create_task(client.post("/email/send_otp"))
+        await asyncio.sleep(0.05)
+        rejected = await client.post("/email/send_otp")
+        health = asyncio.create_task(client.get("/health"))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await first, rejected, await health
+
+
+def test_middleware_answers_503_with_retry_after():
+    """Un request sin lugar recibe 503 con Retry-After; las rutas de operación no se limitan."""
+    print("🧪 Probando respuesta 503 del middleware...")
+    first, rejected, health = asyncio.run(_middleware_responses())
+    assert first.status_code == 200
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "3"
+    assert "saturado" in rejected.json()["detail"]
+    assert health.status_code == 200
+    print("✅ 503 con Retry-After: 3\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del control de admisión\n")
+    test_queue_depth_and_timeout()
+    test_rejects_when_threadpool_is_saturated()
+    test_middleware_answers_503_with_retry_after()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el cliente SMTP asyncio.
+
+Levanta un servidor SMTP mínimo en localhost (sin TLS) y verifica la
+conversación EHLO/AUTH/MAIL/RCPT/DATA, el envío de varios mensajes con
+PIPELINING y el pool asíncrono sin enviar emails reales.
+"""
+
+import asyncio
+import smtplib
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.smtp.async_client import AsyncSMTPClient
+from app.smtp.async_pool import AsyncSMTPConnectionPool
+from app.smtp.pool import SMTPDataInterruptedError
+
+
+class FakeSMTPServer:
+    """
+    Servidor SMTP simulado que acepta AUTH PLAIN y guarda los mensajes.
+
+    Con `drop_after_data` cierra la conexión tras recibir el primer mensaje,
+    sin responder al `.` (el mensaje queda guardado). Como un relay real,
+    rechaza un MAIL FROM mientras la transacción anterior siga abierta.
+    """
+
+    def __init__(self, reject: set[str] = frozenset(), pipelining: bool = False, drop_after_data: bool = False):
+        self.reject = reject
+        self.pipelining = pipelining
+        self.drop_after_data = drop_after_data
+        self.commands = []
+        self.messages = []
+        self.mail_from = []
+        self.connections = 0
+        self.server = None
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 fake ESMTP\r\n")
+        rcpts = []
+        in_transaction = False
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            cmd = line.decode().strip()
+            upper = cmd.upper()
+            self.commands.append(upper.split(":")[0])
+            if upper.startswith("EHLO"):
+                extensions = b"250-PIPELINING\r\n" if self.pipelining else b""
+                writer.write(b"250-fake\r\n250-AUTH PLAIN LOGIN\r\n" + extensions + b"250 8BITMIME\r\n")
+            elif upper.startswith("AUTH PLAIN"):
+                writer.write(b"235 2.7.0 Accepted\r\n")
+            elif upper.startswith("MAIL FROM"):
+                if in_transaction:
+                    writer.write(b"503 5.5.1 Error: nested MAIL command\r\n")
+                    await writer.drain()
+                    continue
+                rcpts = []
+                in_transaction = True
+                self.mail_from.append(cmd)
+                writer.write(b"250 OK\r\n")
+            elif upper.startswith("RCPT TO"):
+                addr = cmd[cmd.index("<") + 1:cmd.index(">")]
+                if addr in self.reject:
+                    writer.write(b"550 5.1.1 No such user\r\n")
+                else:
+                    rcpts.append(addr)
+                    writer.write(b"250 OK\r\n")
+            elif upper == "DATA":
+                if not rcpts:
+                    writer.write(b"554 5.5.1 No valid recipients\r\n")
+                    await writer.drain()
+                    continue
+                writer.write(b"354 Go ahead\r\n")
+                await writer.drain()
+                data = b""
+                while True:
+                    chunk = await reader.readline()
+                    if chunk == b".\r\n":
+                        break
+                    data += chunk
+                self.messages.append((rcpts, data))
+                in_transaction = False
+                if self.drop_after_data:
+                    self.drop_after_data = False
+                    break
+                writer.write(b"250 2.0.0 Queued\r\n")
+            elif upper in ("NOOP", "RSET"):
+                if upper == "RSET":
+                    in_transaction = False
+                writer.write(b"250 OK\r\n")
+            elif upper == "QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"502 Unknown\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def _client_sends_message():
+    server = FakeSMTPServer(reject={"nadie@test.com"})
+    port = await server.start()
+    client = AsyncSMTPClient("127.0.0.1", port, username="u", password="p", use_tls=False)
+    await client.connect()
+
+    assert client.has_extn("8bitmime")
+    refused = await client.sendmail("from@test.com", ["to@test.com", "nadie@test.com"], "Subject: hola\n\n.linea\n")
+    await client.quit()
+    await server.stop()
+
+    assert "nadie@test.com" in refused
+    rcpts, data = server.messages[0]
+    assert rcpts == ["to@test.com"]
+    # Dot-stuffing y CRLF aplicados
+    assert b"\r\n..linea\r\n" in data
+
+
+def test_async_client_sends_message():
+    """El cliente asyncio completa la conversación SMTP y aplica dot-stuffing."""
+    print("🧪 Probando cliente SMTP asyncio...")
+    asyncio.run(_client_sends_message())
+    print("✅ Mensaje enviado y recibido correctamente\n")
+
+
+async def _client_raises_when_all_refused():
+    server = FakeSMTPServer(reject={"nadie@test.com"})
+    port = await server.start()
+    client = AsyncSMTPClient("127.0.0.1", port, use_tls=False)
+    await client.connect()
+    try:
+        await client.sendmail("from@test.com", "nadie@test.com", "Subject: x\n\nx")
+        raise AssertionError("Debería haber fallado con destinatario rechazado")
+    except smtplib.SMTPRecipientsRefused:
+        pass
+    finally:
+        await client.quit()
+        await server.stop()
+
+
+def test_async_client_raises_when_all_refused():
+    """Si todos los destinatarios son rechazados se lanza SMTPRecipientsRefused."""
+    print("🧪 Probando rechazo de destinatarios...")
+    asyncio.run(_client_raises_when_all_refused())
+    print("✅ Excepción SMTPRecipientsRefused lanzada\n")
+
+
+async def _client_pipelines_messages():
+    server = FakeSMTPServer(reject={"nadie@test.com"}, pipelining=True)
+    port = await server.start()
+    client = AsyncSMTPClient("127.0.0.1", port, use_tls=False)
+    await client.connect()
+
+    results = await client.send_many([
+        ("from@test.com", ["a@test.com"], "Subject: 1\n\nuno", ()),
+        ("from@test.com", ["nadie@test.com"], "Subject: 2\n\ndos", ()),
+        ("from@test.com", ["b@test.com", "nadie@test.com"], "Subject: 3\n\ntres", ()),
+        ("from@test.com", ["c@test.com"], "Subject: 4\n\ncuatro", ()),
+    ])
+    await client.quit()
+    await server.stop()
+
+    assert results[0] == {}
+    assert isinstance(results[1], smtplib.SMTPRecipientsRefused)
+    assert list(results[2]) == ["nadie@test.com"]
+    assert results[3] == {}
+    assert [rcpts for rcpts, _ in server.messages] == [["a@test.com"], ["b@test.com"], ["c@test.com"]]
+    # La transacción rechazada se cierra con RSET antes del siguiente MAIL FROM
+    assert server.commands.count("RSET") == 1
+    return results
+
+
+def test_async_client_pipelines_messages():
+    """Con PIPELINING varios mensajes comparten sesión y un rechazo no afecta al resto."""
+    print("🧪 Probando envío de varios mensajes con PIPELINING...")
+    results = asyncio.run(_client_pipelines_messages())
+    print(f"✅ Resultados por mensaje: {[type(r).__name__ for r in results]}\n")
+
+
+async def _pool_send_many_without_pipelining():
+    server = FakeSMTPServer(reject={"nadie@test.com"})
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1)
+
+    results = await pool.send_many([
+        ("from@test.com", [f"user{i}@test.com" if i != 1 else "nadie@test.com"], f"Subject: {i}\n\nhola")
+        for i in range(3)
+    ])
+    stats = pool.stats()
+    await pool.close()
+    await server.stop()
+
+    assert results[0] == {} and results[2] == {}
+    assert isinstance(results[1], smtplib.SMTPRecipientsRefused)
+    assert len(server.messages) == 2
+    assert server.connections == 1 and stats["reconnects"] == 0
+
+
+async def _pool_reuses_session_after_last_refused():
+    server = FakeSMTPServer(reject={"nadie@test.com"}, pipelining=True)
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1)
+
+    results = await pool.send_many([
+        ("from@test.com", ["a@test.com"], "Subject: 1\n\nuno"),
+        ("from@test.com", ["nadie@test.com"], "Subject: 2\n\ndos"),
+    ])
+    # El siguiente envío reutiliza la misma sesión
+    refused = await pool.sendmail("from@test.com", ["b@test.com"], "Subject: 3\n\ntres")
+    await pool.close()
+    await server.stop()
+
+    assert results[0] == {} and isinstance(results[1], smtplib.SMTPRecipientsRefused)
+    assert refused == {}
+    assert [rcpts for rcpts, _ in server.messages] == [["a@test.com"], ["b@test.com"]]
+    assert server.connections == 1 and server.commands.count("RSET") == 1
+
+
+def test_async_pool_reuses_session_after_last_refused():
+    """Si la última transacción del grupo se rechaza, la sesión vuelve al pool sin un MAIL abierto."""
+    print("🧪 Probando reutilización tras un rechazo al final del grupo...")
+    asyncio.run(_pool_reuses_session_after_last_refused())
+    print("✅ Sesión reutilizada sin MAIL anidado\n")
+
+
+def test_async_pool_send_many_without_pipelining():
+    """Sin PIPELINING el pool envía el grupo uno por uno en la misma sesión."""
+    print("🧪 Probando envío agrupado sin PIPELINING...")
+    asyncio.run(_pool_send_many_without_pipelining())
+    print("✅ Grupo enviado en una sola sesión\n")
+
+
+async def _pool_reuses_sessions():
+    server = FakeSMTPServer()
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=2)
+
+    await asyncio.gather(*[
+        pool.sendmail("from@test.com", [f"user{i}@test.com"], f"Subject: {i}\n\nhola")
+        for i in range(6)
+    ])
+    stats = pool.stats()
+    await pool.close()
+    await server.stop()
+
+    assert len(server.messages) == 6
+    assert server.connections <= 2
+    assert stats["hits"] + stats["misses"] == 6
+    return stats
+
+
+async def _pool_send_many_respects_session_limit():
+    server = FakeSMTPServer(pipelining=True)
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1, max_messages_per_session=2)
+
+    results = await pool.send_many([
+        ("from@test.com", [f"user{i}@test.com"], f"Subject: {i}\n\nhola") for i in range(5)
+    ])
+    await pool.close()
+    await server.stop()
+
+    assert results == [{}] * 5
+    assert len(server.messages) == 5
+    # 2 + 2 + 1 mensajes: una sesión nueva al agotar el límite de cada una
+    assert server.connections == 3
+
+
+def test_async_pool_send_many_respects_session_limit():
+    """Un grupo grande se reparte en sesiones de como máximo `max_messages_per_session` mensajes."""
+    print("🧪 Probando límite de mensajes por sesión en envíos agrupados...")
+    asyncio.run(_pool_send_many_respects_session_limit())
+    print("✅ Grupo repartido entre sesiones\n")
+
+
+async def _pool_send_many_after_drop():
+    server = FakeSMTPServer(pipelining=True, drop_after_data=True)
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1)
+
+    results = await pool.send_many([
+        ("from@test.com", [f"user{i}@test.com"], f"Subject: {i}\n\nhola") for i in range(3)
+    ])
+    stats = pool.stats()
+    await pool.close()
+    await server.stop()
+
+    # El primero llegó al relay antes del corte: no se reenvía; los otros dos sí
+    assert isinstance(results[0], SMTPDataInterruptedError)
+    assert results[1:] == [{}, {}]
+    assert [rcpts for rcpts, _ in server.messages] == [["user0@test.com"], ["user1@test.com"], ["user2@test.com"]]
+    assert server.connections == 2 and stats["reconnects"] == 1
+
+
+def test_async_pool_send_many_after_drop():
+    """Tras un corte solo se reenvían los mensajes que no llegaron a enviar su cuerpo."""
+    print("🧪 Probando corte durante un envío agrupado...")
+    asyncio.run(_pool_send_many_after_drop())
+    print("✅ Sin mensajes duplicados\n")
+
+
+def test_async_pool_reuses_sessions():
+    """Los envíos concurrentes comparten como máximo `max_size` sesiones."""
+    print("🧪 Probando pool SMTP asíncrono...")
+    stats = asyncio.run(_pool_reuses_sessions())
+    print(f"✅ Estadísticas del pool: {stats}\n")
+
+
+async def _pool_does_not_resend_after_data():
+    server = FakeSMTPServer(drop_after_data=True)
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1)
+
+    try:
+        await pool.sendmail("from@test.com", ["to@test.com"], "Subject: hola\n\nhola")
+        raise AssertionError("Se esperaba SMTPDataInterruptedError")
+    except SMTPDataInterruptedError:
+        pass
+    stats = pool.stats()
+    await pool.close()
+    await server.stop()
+
+    assert len(server.messages) == 1
+    assert server.connections == 1 and stats["reconnects"] == 0
+
+
+def test_async_pool_does_not_resend_after_data():
+    """Si la sesión se corta tras enviar el cuerpo, el mensaje no se reenvía."""
+    print("🧪 Probando corte durante DATA...")
+    asyncio.run(_pool_does_not_resend_after_data())
+    print("✅ Mensaje enviado una sola vez\n")
+
+
+async def _pool_sends_8bit_body():
+    server = FakeSMTPServer()
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, use_tls=False, max_size=1)
+
+    message = "Subject: hola\r\nContent-Transfer-Encoding: 8bit\r\n\r\nCódigo ✅\r\n".encode("utf-8")
+    await pool.sendmail("from@test.com", ["to@test.com"], message)
+    await pool.close()
+    await server.stop()
+
+    assert server.mail_from == ["MAIL FROM:<from@test.com> BODY=8BITMIME"]
+    assert "Código ✅".encode("utf-8") in server.messages[0][1]
+
+
+def test_async_pool_sends_8bit_body():
+    """Con 8BITMIME anunciado el cuerpo 8bit viaja sin recodificar."""
+    print("🧪 Probando envío 8bit con BODY=8BITMIME...")
+    asyncio.run(_pool_sends_8bit_body())
+    print("✅ Cuerpo 8bit enviado con BODY=8BITMIME\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del transporte SMTP asyncio\n")
+    test_async_client_sends_message()
+    test_async_client_raises_when_all_refused()
+    test_async_client_pipelines_messages()
+    test_async_pool_reuses_session_after_last_refused()
+    test_async_pool_send_many_without_pipelining()
+    test_async_pool_send_many_respects_session_limit()
+    test_async_pool_send_many_after_drop()
+    test_async_pool_reuses_sessions()
+    test_async_pool_does_not_resend_after_data()
+    test_async_pool_sends_8bit_body()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la idempotencia de los endpoints de envío.
+
+Verifica que un reintento recibe la respuesta guardada sin reenviar, que
+un duplicado concurrente espera al envío en curso, que los fallos no se
+guardan y que una clave reutilizada con otro contenido se rechaza.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.admission import IdempotencyCache, idempotency_cache
+from app.otp import router as otp_router
+from app.otp.models import OTPEmailResponse
+
+
+async def _cached_and_failed():
+    cache = IdempotencyCache(max_keys=10)
+    calls = []
+
+    async def send():
+        calls.append(1)
+        return {"success": True, "n": len(calls)}
+
+    first = await cache.run("k", send, ttl=60)
+    second = await cache.run("k", send, ttl=60)
+
+    async def fail():
+        calls.append(1)
+        raise RuntimeError("SMTP caído")
+
+    for _ in range(2):
+        try:
+            await cache.run("f", fail, ttl=60)
+            raise AssertionError("Se esperaba RuntimeError")
+        except RuntimeError:
+            pass
+    return first, second, len(calls)
+
+
+def test_retry_gets_cached_result_and_failures_are_not_kept():
+    """Un reintento recibe el resultado guardado; tras un fallo la clave se libera."""
+    print("🧪 Probando resultados guardados y fallos...")
+    first, second, calls = asyncio.run(_cached_and_failed())
+    assert first == ({"success": True, "n": 1}, "sent")
+    assert second == ({"success": True, "n": 1}, "cached")
+    # 1 envío exitoso + 2 intentos fallidos (el fallo no se guardó)
+    assert calls == 3
+    print("✅ Reintento servido desde caché, fallo reintentable\n")
+
+
+async def _concurrent_duplicates():
+    cache = IdempotencyCache(max_keys=10)
+    release = asyncio.Event()
+    calls = []
+
+    async def send():
+        calls.append(1)
+        await release.wait()
+        return "enviado"
+
+    tasks = [asyncio.create_task(cache.run("k", send, ttl=60)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+    return await asyncio.gather(*tasks), len(calls), cache.stats()
+
+
+def test_concurrent_duplicate_joins_in_flight_send():
+    """Los duplicados que llegan durante el envío esperan a ese envío en lugar de repetirlo."""
+    print("🧪 Probando duplicados concurrentes...")
+    results, calls, stats = asyncio.run(_concurrent_duplicates())
+    assert calls == 1
+    assert [state for _, state in results] == ["sent", "joined", "joined"]
+    assert stats["joined"] == 2 and stats["keys"] == 1
+    print(f"✅ 3 requests, 1 envío: {stats}\n")
+
+
+def test_endpoint_replays_with_header():
+    """El endpoint responde el reintento con `Idempotent-Replayed` y rechaza la clave con otro email o código."""
+    print("🧪 Probando endpoint con Idempotency-Key...")
+    calls = []
+
+    async def send_otp_email_async(request):
+        calls.append(request.email)
+        return OTPEmailResponse(success=True, message="ok", email_sent_to=request.email,
+                                timestamp="2025-01-01T00:00:00", has_verification_button=False,
+                                logo_used="")
+
+    app = FastAPI()
+    app.include_router(otp_router.router_otp)
+    app.state.otp_controller = SimpleNamespace(send_otp_email_async=send_otp_email_async)
+    client = TestClient(app)
+    body = {"email": "idem@empresa.com", "code": "A1B2C3"}
+    headers = {"Idempotency-Key": "pedido-42"}
+    first = client.post("/email/send_otp", json=body, headers=headers)
+    retry = client.post("/email/send_otp", json=body, headers=headers)
+    other = client.post("/email/send_otp", json={**body, "code": "Z9Y8X7"},
+                        headers={"Idempotency-Key": "pedido-43"})
+    # La misma clave con otro código no repite la respuesta anterior
+    reused = client.post("/email/send_otp", json={**body, "code": "Q1W2E3"}, headers=headers)
+    # Ni con otro email: la clave no se separa por destinatario
+    other_email = client.post("/email/send_otp", json={**body, "email": "otra@empresa.com"}, headers=headers)
+
+    assert first.status_code == retry.status_code == other.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert reused.status_code == other_email.status_code == 422
+    assert calls == ["idem@empresa.com", "idem@empresa.com"]
+    assert idempotency_cache.stats()["hits"] >= 1 and idempotency_cache.stats()["conflicts"] >= 1
+    print("✅ Reintento respondido sin reenviar\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de idempotencia\n")
+    test_retry_gets_cached_result_and_failures_are_not_kept()
+    test_concurrent_duplicate_joins_in_flight_send()
+    test_endpoint_replays_with_header()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
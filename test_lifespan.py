@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el arranque y apagado ordenado del servicio.
+
+Verifica que los controladores se crean en el lifespan, que `/health/ready`
+refleja el estado del arranque y que al apagar se rechazan requests nuevos
+mientras se espera a los que están en curso.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionController, AdmissionMiddleware
+from app.config import settings
+
+
+async def _drain_in_flight():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    controller = AdmissionController(capacity=0, queue_depth=10, queue_timeout=1, retry_after=5)
+    app = AdmissionMiddleware(slow_app, controller)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        in_flight = asyncio.create_task(client.post("/email/send_otp"))
+        await asyncio.sleep(0.05)
+        controller.start_draining()
+        rejected = await client.post("/email/send_otp")
+
+        # El plazo vence mientras el envío sigue en curso
+        timed_out = not await controller.drain(0.1)
+        drained = asyncio.create_task(controller.drain(5))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await in_flight, rejected, timed_out, await drained
+
+
+def test_drain_rejects_new_work_and_waits_in_flight():
+    """Durante el apagado los requests nuevos reciben 503 y el drenado espera a los que están en curso."""
+    print("🧪 Probando drenado de requests...")
+    in_flight, rejected, timed_out, drained = asyncio.run(_drain_in_flight())
+    assert in_flight.status_code == 200
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "5"
+    assert "deteniéndose" in rejected.json()["detail"]
+    assert timed_out and drained
+    print("✅ Request en curso completado, nuevos rechazados\n")
+
+
+def test_lifespan_creates_controllers_and_reports_ready():
+    """El lifespan crea los controladores y `/health/ready` pasa a 503 al apagar."""
+    print("🧪 Probando lifespan de la aplicación...")
+    from app.main import app, relay_prober
+
+    # Sin sondeo de arranque ni periódico no hay resultado de relays que exigir
+    original, original_interval = settings.STARTUP_RELAY_PROBE, relay_prober.interval
+    settings.STARTUP_RELAY_PROBE = False
+    relay_prober.interval = 0
+    try:
+        with TestClient(app) as client:
+            ready = client.get("/health/ready")
+            verify = client.post("/email/otp/verify", json={"email": "nadie@empresa.com", "code": "123456"})
+            assert app.state.otp_controller is not None
+            assert app.state.waitlist_controller is not None
+        assert app.state.ready is False
+        stopped = TestClient(app).get("/health/ready")
+    finally:
+        settings.STARTUP_RELAY_PROBE = original
+        relay_prober.interval = original_interval
+
+    assert ready.status_code == 200 and ready.json()["ready"] is True
+    assert verify.status_code == 410
+    assert stopped.status_code == 503
+    print("✅ Listo tras el arranque, no listo tras el apagado\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de arranque y apagado\n")
+    test_drain_rejects_new_work_and_waits_in_flight()
+    test_lifespan_creates_controllers_and_reports_ready()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
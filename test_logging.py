@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el pipeline de logs estructurados.
+
+Verifica el formato JSON con campos, la redacción de datos sensibles, el
+muestreo de logs INFO por envío y que el handler nunca bloquea cuando la
+cola está llena.
+"""
+
+import json
+import logging
+import queue
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.config import settings
+from app.observability.logs import EventLogger, JsonFormatter, NonBlockingQueueHandler, get_logger
+
+
+class ListHandler(logging.Handler):
+    """Handler que guarda los registros para inspeccionarlos."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _capture(name: str, sampled: bool = False) -> tuple[EventLogger, ListHandler]:
+    handler = ListHandler()
+    base = logging.getLogger(name)
+    base.handlers = [handler]
+    base.setLevel(logging.DEBUG)
+    base.propagate = False
+    return get_logger(name, sampled=sampled), handler
+
+
+def test_json_format_redacts_sensitive_fields():
+    """Los campos van como claves JSON; el código OTP se oculta y el email se enmascara."""
+    print("🧪 Probando formato JSON y redacción...")
+    logger, handler = _capture("test.logs.json")
+    logger.info("Código OTP enviado", email="ana@empresa.com", otp_code="123456", relay="gmail")
+
+    formatter = JsonFormatter(frozenset({"otp_code"}))
+    entry = json.loads(formatter.format(handler.records[0]))
+    assert entry["msg"] == "Código OTP enviado"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test.logs.json"
+    assert entry["relay"] == "gmail"
+    assert entry["otp_code"] == "[REDACTED]"
+    assert entry["email"] == "a***@empresa.com"
+    assert "123456" not in formatter.format(handler.records[0])
+    print(f"✅ {entry}\n")
+
+
+def test_sampling_only_affects_info():
+    """Con muestreo 0 se descartan los INFO por envío, nunca los errores."""
+    print("🧪 Probando muestreo de logs por envío...")
+    logger, handler = _capture("test.logs.sampled", sampled=True)
+    original = settings.LOG_SEND_SAMPLE_RATE
+    settings.LOG_SEND_SAMPLE_RATE = 0.0
+    try:
+        for _ in range(10):
+            logger.info("Correo enviado", email="ana@empresa.com")
+        logger.error("Error enviando", email="ana@empresa.com")
+    finally:
+        settings.LOG_SEND_SAMPLE_RATE = original
+
+    assert [record.levelname for record in handler.records] == ["ERROR"]
+    print("✅ Solo el error se registró\n")
+
+
+def test_queue_handler_never_blocks():
+    """Con la cola llena el registro se descarta y se cuenta, sin bloquear."""
+    print("🧪 Probando cola de logs llena...")
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    base = logging.getLogger("test.logs.queue")
+    base.handlers = [handler]
+    base.propagate = False
+    logger = get_logger("test.logs.queue")
+
+    for index in range(5):
+        logger.warning("Evento", index=index)
+
+    assert handler.enqueued == 2
+    assert handler.dropped == 3
+    # El registro se encola sin formatear: el listener lo formatea después
+    assert handler.queue.get_nowait().fields == {"index": 0}
+    print("✅ 2 encolados, 3 descartados\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del pipeline de logs\n")
+    test_json_format_redacts_sensitive_fields()
+    test_sampling_only_affects_info()
+    test_queue_handler_never_blocks()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
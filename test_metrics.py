@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para las métricas en formato Prometheus.
+
+Verifica la exportación de contadores e histogramas, que las fases del
+envío se etiquetan con la ruta en curso y que el endpoint `/metrics`
+cuenta los requests por ruta registrada.
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi.testclient import TestClient
+
+from app.observability.metrics import (
+    Counter,
+    GaugeCollector,
+    Histogram,
+    MetricsRegistry,
+    current_route,
+    observe_phase,
+    send_phase_seconds,
+)
+
+
+def test_render_counter_and_histogram():
+    """Los buckets se exportan acumulados y un colector con error no rompe la salida."""
+    print("🧪 Probando exportación de métricas...")
+    registry = MetricsRegistry()
+    sends = registry.register(Counter("sends_total", "Envíos.", ("relay",)))
+    latency = registry.register(Histogram("latency_seconds", "Latencia.", ("phase",), buckets=(0.1, 1)))
+    registry.register(GaugeCollector("broken", "Colector roto.", lambda: 1 / 0))
+
+    sends.inc("gmail")
+    sends.inc("gmail", amount=2)
+    for value in (0.05, 0.5, 5):
+        latency.observe(value, "data")
+
+    output = registry.render()
+    assert 'sends_total{relay="gmail"} 3' in output
+    assert 'latency_seconds_bucket{phase="data",le="0.1"} 1' in output
+    assert 'latency_seconds_bucket{phase="data",le="1"} 2' in output
+    assert 'latency_seconds_bucket{phase="data",le="+Inf"} 3' in output
+    assert 'latency_seconds_count{phase="data"} 3' in output
+    assert "# broken no disponible" in output
+    print("✅ Contador, histograma y colector con error exportados\n")
+
+
+def test_phase_uses_current_route():
+    """`observe_phase` toma la ruta del contexto en curso."""
+    print("🧪 Probando etiqueta de ruta en las fases...")
+    token = current_route.set("/otp/send")
+    try:
+        observe_phase("render", time.perf_counter(), "gmail")
+    finally:
+        current_route.reset(token)
+    assert send_phase_seconds.count("render", "/otp/send", "gmail") >= 1
+    print("✅ Fase etiquetada con /otp/send\n")
+
+
+def test_metrics_endpoint_counts_routes():
+    """Las rutas desconocidas cuentan como `other` y `/metrics` no se cuenta a sí mismo."""
+    print("🧪 Probando endpoint /metrics...")
+    from app.main import app
+
+    client = TestClient(app)
+    client.get("/")
+    client.get("/no-existe/12345")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{route="/",method="GET",status="200"}' in body
+    assert 'http_requests_total{route="other",method="GET",status="404"}' in body
+    assert "/no-existe" not in body
+    assert 'route="/metrics"' not in body
+    assert 'smtp_pool_sessions{relay=' in body
+    print("✅ Requests contados por ruta registrada\n")
+
+
+def test_spool_reads_run_off_the_event_loop():
+    """En modo `queued`, `/health`, `/health/ready` y `/metrics` leen el spool SQLite en el threadpool."""
+    print("🧪 Probando lecturas del spool fuera del event loop...")
+    import app.main as main_module
+    from app.smtp.spool import DELIVERY_QUEUED, OutboundSpool
+
+    def on_event_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    class RecordingSpool(OutboundSpool):
+        calls: list = []
+
+        def depth(self) -> int:
+            self.calls.append(on_event_loop())
+            return super().depth()
+
+        def stats(self) -> dict:
+            self.calls.append(on_event_loop())
+            return super().stats()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = RecordingSpool(str(Path(tmp) / "spool.sqlite3"))
+        original, original_mode = main_module.outbound_spool, main_module.settings.DELIVERY_MODE
+        main_module.outbound_spool = spool
+        main_module.settings.DELIVERY_MODE = DELIVERY_QUEUED
+        try:
+            client = TestClient(main_module.app)
+            health = client.get("/health")
+            ready = client.get("/health/ready")
+            body = client.get("/metrics").text
+        finally:
+            main_module.outbound_spool = original
+            main_module.settings.DELIVERY_MODE = original_mode
+        spool.close()
+
+    assert health.json()["spool"]["depth"] == 0
+    assert ready.json()["queue"]["spool_depth"] == 0
+    assert 'spool_messages{status="pending"} 0' in body
+    assert RecordingSpool.calls == [False, False, False]
+    print("✅ Spool leído en el threadpool\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de métricas\n")
+    test_render_counter_and_histogram()
+    test_phase_uses_current_route()
+    test_metrics_endpoint_counts_routes()
+    test_spool_reads_run_off_the_event_loop()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Script de prueba del constructor de mensajes MIME precodificados.
+
+Verifica que el mensaje generado por `MessageTemplate` sea interpretado por
+el paquete `email` igual que el construido con `MIMEMultipart`/`MIMEText`,
+y la negociación de 8BITMIME/SMTPUTF8 con el relay.
+"""
+
+import smtplib
+import sys
+from email import message_from_bytes, policy
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.smtp.mime import MessageTemplate, negotiate_transfer
+
+
+def test_message_template_parses_as_rfc5322():
+    """Cabeceras, partes y cuerpos se recuperan intactos al parsear el mensaje."""
+    print("🧪 Probando mensaje multipart/alternative precodificado...")
+    template = MessageTemplate(
+        "noreply@example.com",
+        "¡Gracias por unirte a la lista de espera!",
+        ("plain", "html"),
+        multipart="alternative",
+        from_name="Equipo Ñandú",
+    )
+    text = "Hola Ana,\ngracias por registrarte ✅\n" + "línea larga " * 40
+    html = "<p>Hola <strong>Ana</strong> — ¡bienvenida!</p>" * 20
+
+    raw = template.build("ana@example.com", (text, html))
+    assert raw.count(b"\n") == raw.count(b"\r\n")
+    assert all(len(line) <= 998 for line in raw.split(b"\r\n"))
+    # Texto con líneas cortas: 8bit; HTML en una sola línea larga: quoted-printable
+    assert b"Content-Transfer-Encoding: base64" not in raw
+    assert b"Content-Transfer-Encoding: 8bit" in raw
+    assert b"Content-Transfer-Encoding: quoted-printable" in raw
+
+    parsed = message_from_bytes(raw, policy=policy.default)
+    assert parsed["Subject"] == "¡Gracias por unirte a la lista de espera!"
+    assert parsed["From"].addresses[0].display_name == "Equipo Ñandú"
+    assert parsed["To"] == "ana@example.com"
+    assert parsed["Date"] and parsed["Message-ID"].endswith("@example.com>")
+    assert parsed.get_content_type() == "multipart/alternative"
+
+    parts = list(parsed.iter_parts())
+    assert [part.get_content_type() for part in parts] == ["text/plain", "text/html"]
+    # Las partes 8bit conservan el CRLF del transporte
+    assert parts[0].get_content().replace("\r\n", "\n") == text
+    assert parts[1].get_content() == html
+    print(f"✅ Mensaje válido ({len(raw)} bytes)\n")
+
+
+def test_message_template_unique_per_message():
+    """Cada mensaje lleva su propio Message-ID y destinatario."""
+    print("🧪 Probando campos por destinatario...")
+    template = MessageTemplate("noreply@example.com", "Codigo de verificación")
+    first = message_from_bytes(template.build("a@example.com", ("<p>1</p>",)), policy=policy.default)
+    second = message_from_bytes(template.build("b@example.com", ("<p>2</p>",)), policy=policy.default)
+
+    assert first["Message-ID"] != second["Message-ID"]
+    assert (first["To"], second["To"]) == ("a@example.com", "b@example.com")
+    assert first.get_body(("html",)).get_content() == "<p>1</p>"
+    print("✅ Campos por destinatario correctos\n")
+
+
+def test_negotiate_transfer_with_relay_extensions():
+    """8bit con 8BITMIME; sin 8BITMIME se recodifica a quoted-printable."""
+    print("🧪 Probando negociación de 8BITMIME...")
+    template = MessageTemplate("noreply@example.com", "Codigo de verificación")
+    raw = template.build("ana@example.com", ("<p>Código: 123456 ✅</p>",))
+
+    data, options = negotiate_transfer(raw, "noreply@example.com", ["ana@example.com"], {"8bitmime": ""})
+    assert data == raw and options == ["BODY=8BITMIME"]
+
+    data, options = negotiate_transfer(raw, "noreply@example.com", ["ana@example.com"], {})
+    assert options == [] and data.isascii()
+    downgraded = message_from_bytes(data, policy=policy.default)
+    html_part = downgraded.get_body(("html",))
+    assert html_part["Content-Transfer-Encoding"] == "quoted-printable"
+    assert html_part.get_content() == "<p>Código: 123456 ✅</p>"
+
+    ascii_msg = "Subject: hola\r\n\r\nhola"
+    assert negotiate_transfer(ascii_msg, "a@example.com", "b@example.com", {}) == (ascii_msg, [])
+    print("✅ Codificación adaptada al relay\n")
+
+
+def test_negotiate_transfer_smtputf8():
+    """Las direcciones internacionalizadas requieren SMTPUTF8."""
+    print("🧪 Probando SMTPUTF8...")
+    raw = MessageTemplate("noreply@example.com", "Hola").build("josé@ejemplo.com", ("<p>hola</p>",))
+    assert "To: josé@ejemplo.com".encode("utf-8") in raw
+
+    _, options = negotiate_transfer(raw, "noreply@example.com", ["josé@ejemplo.com"],
+                                    {"8bitmime": "", "smtputf8": ""})
+    assert options == ["SMTPUTF8", "BODY=8BITMIME"]
+
+    try:
+        negotiate_transfer(raw, "noreply@example.com", ["josé@ejemplo.com"], {"8bitmime": ""})
+        raise AssertionError("Se esperaba SMTPNotSupportedError")
+    except smtplib.SMTPNotSupportedError:
+        pass
+    print("✅ SMTPUTF8 exigido para direcciones no ASCII\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del constructor MIME\n")
+    test_message_template_parses_as_rfc5322()
+    test_message_template_unique_per_message()
+    test_negotiate_transfer_with_relay_extensions()
+    test_negotiate_transfer_smtputf8()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
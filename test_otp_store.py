@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para la emisión y verificación de códigos OTP en el servicio.
+
+Verifica el consumo de códigos válidos, el bloqueo por intentos fallidos,
+la expiración con la rueda de tiempos, el backend SQLite compartido entre
+workers y los endpoints `/email/otp/issue` y `/email/otp/verify`.
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.otp import router as otp_router
+from app.otp import store as otp_store_module
+from app.otp.models import OTPEmailResponse
+from app.otp.store import (
+    VERIFY_EXPIRED,
+    VERIFY_INVALID,
+    VERIFY_LOCKED,
+    VERIFY_VALID,
+    MemoryOTPStore,
+    SQLiteOTPStore,
+    TimingWheel,
+)
+
+
+def _wrong(code: str) -> str:
+    return "0000" if code != "0000" else "1111"
+
+
+def test_memory_store_consumes_and_locks():
+    """Un código correcto se consume una vez; tras los intentos fallidos queda bloqueado."""
+    print("🧪 Probando store en memoria...")
+    store = MemoryOTPStore(shards=4, max_attempts=3)
+    code = store.issue("Ana@Empresa.com", ttl=60)
+    assert len(code) == 6 and code.isdigit()
+    assert store.verify("ana@empresa.com", _wrong(code)) == (VERIFY_INVALID, 2)
+    assert store.verify("ana@empresa.com", code) == (VERIFY_VALID, 0)
+    assert store.verify("ana@empresa.com", code) == (VERIFY_EXPIRED, 0)
+
+    code = store.issue("ana@empresa.com", ttl=60)
+    assert store.verify("ana@empresa.com", _wrong(code)) == (VERIFY_INVALID, 2)
+    assert store.verify("ana@empresa.com", _wrong(code)) == (VERIFY_INVALID, 1)
+    assert store.verify("ana@empresa.com", _wrong(code)) == (VERIFY_LOCKED, 0)
+    # Bloqueado: ni el código correcto sirve hasta emitir uno nuevo
+    assert store.verify("ana@empresa.com", code) == (VERIFY_LOCKED, 0)
+    assert store.verify("ana@empresa.com", store.issue("ana@empresa.com", ttl=60))[0] == VERIFY_VALID
+
+    codes = {f"user{i}@test.com": store.issue(f"user{i}@test.com", ttl=60) for i in range(10_000)}
+    started = time.perf_counter()
+    for email, code in codes.items():
+        assert store.verify(email, code)[0] == VERIFY_VALID
+    rate = len(codes) / (time.perf_counter() - started)
+    print(f"✅ Consumo y bloqueo correctos ({rate:,.0f} verificaciones/s)\n")
+
+
+def test_timing_wheel_expires_codes():
+    """La rueda devuelve solo las claves vencidas, incluidas las de más de una vuelta."""
+    print("🧪 Probando rueda de expiración...")
+    wheel = TimingWheel(resolution=1.0, slots=8)
+    wheel.advance(100)
+    wheel.schedule("a", 103)
+    wheel.schedule("b", 105)
+    wheel.schedule("lejana", 100 + 8 * 3)
+    assert wheel.advance(102) == []
+    assert wheel.advance(103) == ["a"]
+    assert sorted(wheel.advance(120)) == ["b"]
+    assert wheel.advance(124) == ["lejana"]
+
+    store = MemoryOTPStore(shards=1)
+    code = store.issue("exp@test.com", ttl=0.01)
+    time.sleep(0.02)
+    assert store.verify("exp@test.com", code) == (VERIFY_EXPIRED, 0)
+    print("✅ Claves expiradas a tiempo\n")
+
+
+def test_sqlite_store_is_shared_between_workers():
+    """Dos instancias sobre el mismo archivo comparten códigos, intentos y clave del HMAC."""
+    print("🧪 Probando backend SQLite...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "otp.sqlite3")
+        worker_a = SQLiteOTPStore(path, max_attempts=2)
+        worker_b = SQLiteOTPStore(path, max_attempts=2)
+
+        code = worker_a.issue("ana@empresa.com", ttl=60)
+        assert worker_b.verify("ana@empresa.com", _wrong(code)) == (VERIFY_INVALID, 1)
+        assert worker_a.verify("ana@empresa.com", code) == (VERIFY_VALID, 0)
+        assert worker_b.verify("ana@empresa.com", code) == (VERIFY_EXPIRED, 0)
+
+        code = worker_b.issue("ana@empresa.com", ttl=60)
+        worker_a.verify("ana@empresa.com", _wrong(code))
+        assert worker_b.verify("ana@empresa.com", _wrong(code)) == (VERIFY_LOCKED, 0)
+        assert worker_a.stats()["codes"] == 1
+        worker_a.close()
+        worker_b.close()
+    print("✅ Códigos compartidos entre workers\n")
+
+
+def test_blocking_stats_run_off_the_event_loop():
+    """Con el backend SQLite las estadísticas de `/health` se leen fuera del event loop."""
+    print("🧪 Probando estadísticas del store SQLite...")
+
+    class RecordingStore(SQLiteOTPStore):
+        def stats(self) -> dict:
+            self.thread = threading.get_ident()
+            return super().stats()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RecordingStore(str(Path(tmp) / "otp.sqlite3"))
+        store.issue("ana@empresa.com", ttl=60)
+        original = otp_store_module.otp_store
+        otp_store_module.otp_store = store
+        try:
+            stats = asyncio.run(otp_store_module.store_stats())
+        finally:
+            otp_store_module.otp_store = original
+        store.close()
+
+    assert stats["codes"] == 1
+    assert store.thread != threading.get_ident()
+    print(f"✅ Estadísticas leídas en el threadpool: {stats['codes']} código(s)\n")
+
+
+def test_issue_and_verify_endpoints():
+    """`/otp/issue` envía un código generado que luego valida `/otp/verify`."""
+    print("🧪 Probando endpoints de emisión y verificación...")
+    sent = []
+
+    async def send_otp_email_async(request):
+        sent.append(request)
+        return OTPEmailResponse(success=True, message="ok", email_sent_to=request.email,
+                                timestamp="2025-01-01T00:00:00", has_verification_button=False,
+                                logo_used="", expiry_minutes=request.expiry_minutes)
+
+    app = FastAPI()
+    app.include_router(otp_router.router_otp)
+    app.state.otp_controller = SimpleNamespace(send_otp_email_async=send_otp_email_async)
+    client = TestClient(app)
+    issued = client.post("/email/otp/issue", json={"email": "verif@empresa.com", "expiry_minutes": 5})
+    code = sent[0].code
+    wrong = client.post("/email/otp/verify", json={"email": "verif@empresa.com", "code": _wrong(code)})
+    valid = client.post("/email/otp/verify", json={"email": "verif@empresa.com", "code": code})
+    reused = client.post("/email/otp/verify", json={"email": "verif@empresa.com", "code": code})
+
+    assert issued.status_code == 200 and code not in issued.text
+    assert sent[0].expiry_minutes == 5
+    assert wrong.status_code == 400 and wrong.json()["attempts_remaining"] >= 1
+    assert valid.status_code == 200 and valid.json()["valid"] is True
+    assert reused.status_code == 410 and reused.json()["status"] == VERIFY_EXPIRED
+    print("✅ Código emitido, verificado y consumido\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del store de códigos OTP\n")
+    test_memory_store_consumes_and_locks()
+    test_timing_wheel_expires_codes()
+    test_sqlite_store_is_shared_between_workers()
+    test_blocking_stats_run_off_the_event_loop()
+    test_issue_and_verify_endpoints()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el rate limiting por IP y por destinatario.
+
+Verifica la ventana deslizante aproximada, la expiración de claves
+inactivas, que los rechazos (429 con Retry-After) ocurren antes de
+llegar al endpoint y que la verificación de OTP queda fuera del límite
+por IP.
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.admission import RateLimiter, RateLimitMiddleware, SlidingWindowCounter, enforce_recipient_limit
+
+
+def test_sliding_window_weights_previous_window():
+    """La ventana anterior cuenta en proporción a lo que aún cae dentro de la ventana deslizante."""
+    print("🧪 Probando ventana deslizante...")
+    counter = SlidingWindowCounter(limit=10, window=60)
+    for _ in range(10):
+        assert counter.wait("ip", 30) == 0
+        counter.add("ip", 30)
+    # Ventana llena: hay que esperar a la siguiente y a que salga parte de la actual
+    assert counter.wait("ip", 59) > 0
+
+    # A los 15 s de la ventana siguiente la anterior pesa 75%: 7.5 + 0 eventos, entran 2
+    counter.add("ip", 75)
+    counter.add("ip", 75)
+    wait = counter.wait("ip", 75)
+    assert 0 < wait <= 15
+    # Al vencer la espera vuelve a haber cupo
+    assert counter.wait("ip", 75 + wait + 0.01) == 0
+    print(f"✅ Espera calculada: {wait:.1f}s\n")
+
+
+def test_stale_keys_expire():
+    """Las claves sin actividad en dos ventanas se descartan y el total de claves está acotado."""
+    print("🧪 Probando expiración de claves...")
+    counter = SlidingWindowCounter(limit=5, window=60, max_keys=3)
+    for index in range(3):
+        counter.add(f"ip-{index}", 10)
+    assert len(counter) == 3
+    counter.add("ip-nueva", 200)
+    assert len(counter) == 1
+
+    for index in range(5):
+        counter.add(f"otra-{index}", 210)
+    assert len(counter) == 3
+    print("✅ Claves expiradas y acotadas\n")
+
+
+def test_middleware_rejects_before_endpoint():
+    """Un cliente sobre su límite recibe 429 con Retry-After sin ejecutar el endpoint."""
+    print("🧪 Probando middleware por IP...")
+    calls = []
+    app = FastAPI()
+
+    @app.post("/email/send_otp")
+    async def send_otp():
+        calls.append(1)
+        return {"success": True}
+
+    @app.post("/email/otp/verify")
+    async def verify_otp():
+        return {"valid": True}
+
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(per_ip=[(2, 60)], per_recipient=[]))
+    client = TestClient(app)
+    statuses = [client.post("/email/send_otp").status_code for _ in range(3)]
+    rejected = client.post("/email/send_otp")
+
+    assert statuses == [200, 200, 429]
+    assert int(rejected.headers["retry-after"]) >= 1
+    assert len(calls) == 2
+    assert client.get("/health").status_code == 404  # excluida del límite, no rechazada
+    # La verificación de OTP no consume el límite por IP
+    assert {client.post("/email/otp/verify").status_code for _ in range(10)} == {200}
+    print("✅ 2 admitidos, el resto 429\n")
+
+
+def test_recipient_limit_raises_429():
+    """El límite por destinatario no distingue mayúsculas y responde 429 con Retry-After."""
+    print("🧪 Probando límite por destinatario...")
+    from app.admission import ratelimit
+
+    original = ratelimit.rate_limiter
+    ratelimit.rate_limiter = RateLimiter(per_ip=[], per_recipient=[(1, 60)])
+    try:
+        enforce_recipient_limit("ana@empresa.com")
+        try:
+            enforce_recipient_limit("Ana@Empresa.com")
+            raise AssertionError("Se esperaba 429")
+        except HTTPException as e:
+            assert e.status_code == 429
+            assert int(e.headers["Retry-After"]) >= 1
+    finally:
+        ratelimit.rate_limiter = original
+    print("✅ Segundo envío al mismo destinatario rechazado\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de rate limiting\n")
+    test_sliding_window_weights_previous_window()
+    test_stale_keys_expire()
+    test_middleware_rejects_before_endpoint()
+    test_recipient_limit_raises_429()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el sondeo de relays y el readiness profundo.
+
+Verifica que el sondeo recorre conexión, EHLO y AUTH con una conexión
+nueva, que detecta credenciales rechazadas y relays caídos, que el
+resultado caduca con el TTL, que un sondeo interrumpido por el plazo del
+arranque deja los relays como caídos y que `/health/ready` responde desde
+la caché sin abrir conexiones SMTP.
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi.testclient import TestClient
+
+from app.smtp.probe import RelayProber
+from app.smtp.relays import FAILURE_AUTH, FAILURE_CONNECT, Relay, RelayConfig, RelayRouter
+from app.smtp.spool import DELIVERY_QUEUED
+from test_async_smtp import FakeSMTPServer
+
+
+class RejectingAuthServer(FakeSMTPServer):
+    """Servidor SMTP simulado que rechaza cualquier AUTH (credenciales revocadas)."""
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 fake ESMTP\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            upper = line.decode().strip().upper()
+            self.commands.append(upper.split(" ")[0])
+            if upper.startswith("EHLO"):
+                writer.write(b"250-fake\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif upper.startswith("AUTH"):
+                writer.write(b"535 5.7.8 Authentication credentials invalid\r\n")
+            elif upper == "QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+
+def make_relay(name: str, port: int) -> Relay:
+    return Relay(RelayConfig(name=name, host="127.0.0.1", port=port, username="u@test.com",
+                             password="p", use_tls=False))
+
+
+async def _probe_relays():
+    healthy, revoked = FakeSMTPServer(), RejectingAuthServer()
+    healthy_port, revoked_port = await healthy.start(), await revoked.start()
+    # Puerto sin servidor: se abre y cierra uno para obtener un puerto libre
+    closed = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+    closed_port = closed.sockets[0].getsockname()[1]
+    closed.close()
+    await closed.wait_closed()
+
+    relays = [make_relay("sano", healthy_port), make_relay("revocado", revoked_port),
+              make_relay("caido", closed_port)]
+    prober = RelayProber(RelayRouter(relays), interval=0, timeout=2)
+    results = {result["relay"]: result for result in await prober.run_once()}
+
+    connections = healthy.connections
+    for _ in range(100):
+        snapshot = prober.snapshot()
+    await healthy.stop()
+    await revoked.stop()
+    return results, relays, snapshot, connections, healthy, revoked
+
+
+def test_probe_detects_auth_and_connect_failures():
+    """El sondeo completa EHLO y AUTH en el relay sano y marca caídos los que fallan."""
+    print("🧪 Probando sondeo de relays...")
+    results, relays, snapshot, connections, healthy, revoked = asyncio.run(_probe_relays())
+    sano, revocado, caido = relays
+
+    assert results["sano"]["ok"] and results["sano"]["auth"]
+    assert [cmd.split(" ")[0] for cmd in healthy.commands] == ["EHLO", "AUTH", "QUIT"]
+    assert results["revocado"]["failure"] == FAILURE_AUTH and "AUTH" in revoked.commands
+    assert results["caido"]["failure"] == FAILURE_CONNECT
+    # AUTH rechazado abre el circuito de inmediato
+    assert sano.available() and not revocado.available()
+
+    # El snapshot sale de la caché: ninguna conexión nueva tras 100 lecturas
+    assert healthy.connections == connections == 1
+    assert snapshot["healthy"] == 1 and not snapshot["stale"]
+    print(f"✅ Sondeo: {[(r, v['ok'], v['failure']) for r, v in results.items()]}\n")
+
+
+def test_snapshot_goes_stale_after_ttl():
+    """Con sondeo periódico, un resultado más antiguo que el TTL se marca vencido."""
+    print("🧪 Probando caducidad del sondeo...")
+    prober = RelayProber(RelayRouter([make_relay("sano", 25)]), interval=30, ttl=90)
+    assert prober.snapshot()["checked_at"] is None and not prober.snapshot()["stale"]
+
+    prober._results = {"sano": {"relay": "sano", "ok": True}}
+    prober.checked_at = time.time() - 10
+    assert not prober.snapshot()["stale"]
+    prober.checked_at = time.time() - 120
+    assert prober.snapshot()["stale"]
+    # Sin sondeo periódico el último resultado explícito no caduca
+    prober.interval = 0
+    assert not prober.snapshot()["stale"]
+    print("✅ Resultado vencido tras el TTL\n")
+
+
+def test_readiness_reads_cached_probe():
+    """`/health/ready` responde desde la caché y pasa a 503 sin relays sanos."""
+    print("🧪 Probando readiness profundo...")
+    import app.main as main_module
+
+    prober = RelayProber(RelayRouter([make_relay("sano", 25)]), interval=30, ttl=90)
+    prober._results = {"sano": {"relay": "sano", "ok": True}}
+    prober.checked_at = time.time()
+
+    original, original_ready = main_module.relay_prober, getattr(main_module.app.state, "ready", False)
+    main_module.relay_prober = prober
+    main_module.app.state.ready = True
+    try:
+        client = TestClient(main_module.app)
+        ready = client.get("/health/ready")
+        metrics = client.get("/metrics").text
+        prober._results["sano"]["ok"] = False
+        down = client.get("/health/ready")
+        prober._results["sano"]["ok"] = True
+        prober.checked_at = time.time() - 120
+        stale = client.get("/health/ready")
+    finally:
+        main_module.relay_prober = original
+        main_module.app.state.ready = original_ready
+
+    body = ready.json()
+    assert ready.status_code == 200 and body["ready"] is True
+    assert body["relays"]["healthy"] == 1
+    assert {"pools", "queue"} <= body.keys() and "admission" in body["queue"]
+    assert prober.probes == 0
+    # Cada métrica del sondeo se exporta bajo su propio HELP/TYPE
+    assert 'smtp_relay_probe_up{relay="sano"} 1' in metrics
+    assert "# TYPE smtp_relay_probe_age_seconds gauge" in metrics
+    assert "\nsmtp_relay_probe_age_seconds " in metrics
+    if main_module.settings.DELIVERY_MODE != DELIVERY_QUEUED:
+        assert down.status_code == 503 and stale.status_code == 503
+    print(f"✅ Readiness: {ready.status_code} / {down.status_code} / {stale.status_code}\n")
+
+
+async def _probe_times_out():
+    # Servidor que acepta la conexión y nunca envía el saludo
+    writers = []
+    silent = await asyncio.start_server(lambda r, w: writers.append(w), "127.0.0.1", 0)
+    relays = [make_relay("mudo", silent.sockets[0].getsockname()[1])]
+    prober = RelayProber(RelayRouter(relays), interval=0, timeout=5)
+    try:
+        await asyncio.wait_for(prober.run_once(), 0.2)
+        timed_out = False
+    except asyncio.TimeoutError:
+        timed_out = True
+    for writer in writers:
+        writer.close()
+    silent.close()
+    await silent.wait_closed()
+    return prober, relays[0], timed_out
+
+
+def test_probe_timeout_marks_relays_down():
+    """Un sondeo cancelado por el plazo del arranque registra los relays sin respuesta como caídos."""
+    print("🧪 Probando sondeo de arranque vencido...")
+    import app.main as main_module
+
+    prober, relay, timed_out = asyncio.run(_probe_times_out())
+    snapshot = prober.snapshot()
+    assert timed_out
+    assert snapshot["checked_at"] is not None and snapshot["healthy"] == 0
+    assert snapshot["relays"][0]["ok"] is False and snapshot["relays"][0]["failure"] == FAILURE_CONNECT
+    assert prober.failures == 1 and relay.last_error.startswith("TimeoutError")
+
+    # Sin resultado (sondeo interrumpido antes de registrar nada) tampoco se reporta listo
+    empty = RelayProber(RelayRouter([make_relay("sano", 25)]), interval=0)
+    original, original_ready = main_module.relay_prober, getattr(main_module.app.state, "ready", False)
+    original_probe = main_module.settings.STARTUP_RELAY_PROBE
+    main_module.app.state.ready = True
+    main_module.settings.STARTUP_RELAY_PROBE = True
+    try:
+        client = TestClient(main_module.app)
+        main_module.relay_prober = prober
+        timeout = client.get("/health/ready")
+        main_module.relay_prober = empty
+        unprobed = client.get("/health/ready")
+        main_module.settings.STARTUP_RELAY_PROBE = False
+        disabled = client.get("/health/ready")
+    finally:
+        main_module.relay_prober = original
+        main_module.app.state.ready = original_ready
+        main_module.settings.STARTUP_RELAY_PROBE = original_probe
+
+    assert timeout.json()["relays"]["healthy"] == 0
+    if main_module.settings.DELIVERY_MODE != DELIVERY_QUEUED:
+        assert timeout.status_code == 503 and unprobed.status_code == 503
+    assert disabled.status_code == 200
+    print(f"✅ Readiness tras el plazo: {timeout.status_code} / {unprobed.status_code} / {disabled.status_code}\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del sondeo de relays\n")
+    test_probe_detects_auth_and_connect_failures()
+    test_snapshot_goes_stale_after_ttl()
+    test_readiness_reads_cached_probe()
+    test_probe_timeout_marks_relays_down()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
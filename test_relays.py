@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el enrutamiento entre relays SMTP.
+
+Verifica el reparto ponderado del tráfico, el failover ante errores de
+autenticación o conexión, que un rechazo 5xx no cambie de relay, los
+reintentos con backoff, el circuit breaker y que el presupuesto de envío
+priorice los OTP, usando servidores SMTP simulados.
+"""
+
+import asyncio
+import smtplib
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.smtp.pool import SMTPConnectionPool, SMTPDataInterruptedError
+from app.smtp.relays import NoRelayAvailableError, Relay, RelayConfig, RelayRouter
+from app.smtp.retry import RetryPolicy
+from app.smtp.scheduler import PRIORITY_BULK, PRIORITY_OTP, SendBudgetExceededError, SendScheduler
+
+
+class FakeSMTP:
+    """Servidor SMTP simulado; `error` se lanza en cada envío (o en los `failures` primeros)."""
+
+    def __init__(self, error: Exception = None, failures: int = None):
+        self.sent = []
+        self.error = error
+        self.failures = failures
+
+    esmtp_features = {"8bitmime": ""}
+
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=()):
+        if self.error is not None and self.failures != 0:
+            if self.failures is not None:
+                self.failures -= 1
+            raise self.error
+        self.sent.append((from_addr, to_addrs, msg))
+        return {}
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        pass
+
+
+def make_relay(name: str, weight: int = 1, error: Exception = None, failures: int = None,
+               otp_reserve: float = 0.0, cooldown: float = 60, **kwargs) -> tuple[Relay, FakeSMTP]:
+    """Crea un relay cuyo pool síncrono siempre entrega el mismo servidor simulado."""
+    server = FakeSMTP(error, failures)
+    relay = Relay(RelayConfig(name=name, host=f"{name}.test", weight=weight, **kwargs),
+                  cooldown=cooldown, otp_reserve=otp_reserve)
+    relay.pool = SMTPConnectionPool(host=relay.config.host, port=587, connection_factory=lambda: server)
+    return relay, server
+
+
+def test_weighted_distribution():
+    """El tráfico se reparte según el peso de cada relay."""
+    print("🧪 Probando reparto ponderado...")
+    (heavy, heavy_server), (light, light_server) = make_relay("heavy", weight=3), make_relay("light", weight=1)
+    router = RelayRouter([heavy, light])
+
+    for i in range(8):
+        router.send("from@test.com", ["to@test.com"], f"mensaje {i}")
+
+    assert len(heavy_server.sent) == 6
+    assert len(light_server.sent) == 2
+    print(f"✅ Reparto: heavy={len(heavy_server.sent)} light={len(light_server.sent)}\n")
+
+
+def test_failover_on_auth_error():
+    """Un error de autenticación saca al relay de rotación y el envío sigue en otro."""
+    print("🧪 Probando failover por error de autenticación...")
+    broken, _ = make_relay("broken", weight=5, error=smtplib.SMTPAuthenticationError(535, b"Bad credentials"))
+    backup, backup_server = make_relay("backup", weight=0)
+    router = RelayRouter([broken, backup])
+
+    router.send("from@test.com", ["to@test.com"], "mensaje 1")
+    router.send("from@test.com", ["to@test.com"], "mensaje 2")
+
+    stats = {relay["name"]: relay for relay in router.stats(use_async=False)}
+    assert len(backup_server.sent) == 2
+    assert stats["broken"]["errors"]["auth"] == 1
+    assert not stats["broken"]["available"]
+    assert stats["backup"]["sent"] == 2
+    print(f"✅ Failover correcto: {stats['broken']['last_error']}\n")
+
+
+def test_permanent_rejection_does_not_fail_over():
+    """Un rechazo 5xx del mensaje se propaga sin probar otros relays."""
+    print("🧪 Probando rechazo permanente...")
+    rejecting, _ = make_relay("rejecting", error=smtplib.SMTPDataError(550, b"Message rejected"))
+    other, other_server = make_relay("other", weight=0)
+    router = RelayRouter([rejecting, other])
+
+    try:
+        router.send("from@test.com", ["to@test.com"], "mensaje")
+        assert False, "Se esperaba SMTPDataError"
+    except smtplib.SMTPDataError:
+        pass
+
+    assert other_server.sent == []
+    assert rejecting.available()
+    print("✅ El rechazo 5xx no provocó failover\n")
+
+
+def test_unsupported_extension_does_not_mark_relay_down():
+    """Un mensaje que pide una extensión que el relay no anuncia falla sin abrir su circuito."""
+    print("🧪 Probando extensión no soportada...")
+    error = smtplib.SMTPNotSupportedError("El relay no soporta SMTPUTF8 para direcciones internacionalizadas")
+    relay, _ = make_relay("ascii", error=error)
+    router = RelayRouter([relay])
+
+    for _ in range(10):
+        try:
+            router.send("from@test.com", ["josé@empresa.com"], "mensaje")
+            assert False, "Se esperaba SMTPNotSupportedError"
+        except smtplib.SMTPNotSupportedError:
+            pass
+
+    errors = relay.stats()["errors"]
+    assert errors["5xx"] == 10 and errors["connect"] == 0
+    assert relay.available()
+    print("✅ El relay sigue en rotación\n")
+
+
+def test_interrupted_data_does_not_fail_over():
+    """Un corte durante DATA se propaga sin reenviar por otro relay."""
+    print("🧪 Probando corte durante DATA...")
+    dropped, _ = make_relay("dropped", weight=5, error=SMTPDataInterruptedError("Sesión cortada durante DATA"))
+    other, other_server = make_relay("other", weight=0)
+    router = RelayRouter([dropped, other])
+
+    try:
+        router.send("from@test.com", ["to@test.com"], "mensaje")
+        assert False, "Se esperaba SMTPDataInterruptedError"
+    except SMTPDataInterruptedError:
+        pass
+
+    assert other_server.sent == []
+    assert dropped.stats()["errors"]["connect"] == 1
+    print("✅ El mensaje no se duplicó en otro relay\n")
+
+
+def test_daily_quota():
+    """Un relay con la cuota diaria agotada deja de recibir tráfico."""
+    print("🧪 Probando cuota diaria...")
+    limited, limited_server = make_relay("limited", weight=10, daily_quota=2)
+    spare, spare_server = make_relay("spare", weight=1)
+    router = RelayRouter([limited, spare])
+
+    for i in range(5):
+        router.send("from@test.com", ["to@test.com"], f"mensaje {i}")
+
+    assert len(limited_server.sent) == 2
+    assert len(spare_server.sent) == 3
+    print("✅ Cuota respetada\n")
+
+
+def test_transient_error_is_retried():
+    """Un 421 transitorio se reintenta con backoff en el mismo relay."""
+    print("🧪 Probando reintento de errores transitorios...")
+    relay, server = make_relay("flaky", error=smtplib.SMTPSenderRefused(421, b"Try again later", "from@test.com"),
+                               failures=2)
+    router = RelayRouter([relay], retry=RetryPolicy(max_attempts=3, base_delay=0.001))
+
+    router.send("from@test.com", ["to@test.com"], "mensaje")
+
+    assert len(server.sent) == 1
+    assert router.retries == 2
+    assert relay.stats()["errors"]["4xx"] == 2
+    assert relay.breaker.state == "closed"
+    print("✅ Entregado tras 2 reintentos\n")
+
+
+def test_greylisted_recipient_does_not_fail_over():
+    """Un 4xx de todos los destinatarios se reintenta en el mismo relay sin afectar su circuito."""
+    print("🧪 Probando rechazo temporal del destinatario...")
+    greylisted = smtplib.SMTPRecipientsRefused({"to@test.com": (451, b"Greylisted, try again later")})
+    primary, primary_server = make_relay("primary", weight=5, error=greylisted, failures=2)
+    backup, backup_server = make_relay("backup", weight=0)
+    router = RelayRouter([primary, backup], retry=RetryPolicy(max_attempts=3, base_delay=0.001))
+    primary.breaker.failure_threshold = 1
+
+    router.send("from@test.com", ["to@test.com"], "mensaje")
+
+    assert len(primary_server.sent) == 1 and backup_server.sent == []
+    assert router.retries == 2
+    assert primary.stats()["errors"]["rcpt_4xx"] == 2
+    assert primary.breaker.state == "closed" and primary.available()
+    print("✅ Entregado en el mismo relay tras 2 reintentos\n")
+
+
+def test_circuit_breaker_fails_fast():
+    """Con el circuito abierto no se intenta el relay hasta pasar a semiabierto."""
+    print("🧪 Probando circuit breaker...")
+    relay, server = make_relay("down", error=ConnectionRefusedError("Connection refused"), cooldown=0.05)
+    router = RelayRouter([relay], retry=RetryPolicy(max_attempts=5, base_delay=0.001))
+    relay.breaker.failure_threshold = 2
+
+    try:
+        router.send("from@test.com", ["to@test.com"], "mensaje")
+        assert False, "Se esperaba ConnectionRefusedError"
+    except ConnectionRefusedError:
+        pass
+    assert relay.stats()["failed"] == 2
+    assert relay.breaker.state == "open"
+
+    try:
+        router.send("from@test.com", ["to@test.com"], "mensaje")
+        assert False, "Se esperaba NoRelayAvailableError"
+    except NoRelayAvailableError:
+        pass
+    assert relay.stats()["failed"] == 2
+
+    # Tras el enfriamiento, un envío de prueba exitoso cierra el circuito
+    time.sleep(0.06)
+    assert relay.breaker.state == "half_open"
+    server.error = None
+    router.send("from@test.com", ["to@test.com"], "mensaje")
+    assert relay.breaker.state == "closed"
+    print(f"✅ Circuito: {relay.breaker.stats()}\n")
+
+
+def test_otp_reserve():
+    """El tráfico masivo no consume la fracción del presupuesto reservada a OTP."""
+    print("🧪 Probando reserva de presupuesto para OTP...")
+    relay, server = make_relay("limited", max_per_minute=10, otp_reserve=0.2)
+    router = RelayRouter([relay])
+
+    bulk_sent = 0
+    try:
+        for i in range(10):
+            router.send("from@test.com", ["to@test.com"], f"masivo {i}", PRIORITY_BULK)
+            bulk_sent += 1
+        assert False, "Se esperaba SendBudgetExceededError"
+    except SendBudgetExceededError as e:
+        assert e.retry_after > 0
+
+    router.send("from@test.com", ["to@test.com"], "otp 1", PRIORITY_OTP)
+    router.send("from@test.com", ["to@test.com"], "otp 2", PRIORITY_OTP)
+
+    assert bulk_sent == 8
+    assert len(server.sent) == 10
+    print(f"✅ Masivo detenido en {bulk_sent}; los OTP usaron la reserva\n")
+
+
+def test_scheduler_serves_otp_first():
+    """Con el presupuesto agotado, un OTP en espera se atiende antes que el masivo."""
+    print("🧪 Probando prioridad del scheduler...")
+
+    async def scenario():
+        scheduler = SendScheduler({PRIORITY_OTP: 5, PRIORITY_BULK: 5})
+        budget = [0]
+        order = []
+
+        def try_grant():
+            if budget[0] > 0:
+                budget[0] -= 1
+                return True
+            return None
+
+        async def send(priority, label):
+            await scheduler.acquire(priority, try_grant, lambda: 0.01)
+            order.append(label)
+
+        bulk = asyncio.create_task(send(PRIORITY_BULK, "bulk"))
+        await asyncio.sleep(0.02)
+        otp = asyncio.create_task(send(PRIORITY_OTP, "otp"))
+        await asyncio.sleep(0.02)
+
+        budget[0] = 1
+        await otp
+        assert order == ["otp"]
+        budget[0] = 1
+        await bulk
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["otp", "bulk"]
+    assert stats["deferred"] == {"otp": 1, "bulk": 1}
+    print(f"✅ Orden de atención: {order}\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de relays SMTP\n")
+    test_weighted_distribution()
+    test_failover_on_auth_error()
+    test_permanent_rejection_does_not_fail_over()
+    test_unsupported_extension_does_not_mark_relay_down()
+    test_interrupted_data_does_not_fail_over()
+    test_daily_quota()
+    test_transient_error_is_retried()
+    test_greylisted_recipient_does_not_fail_over()
+    test_circuit_breaker_fails_fast()
+    test_otp_reserve()
+    test_scheduler_serves_otp_first()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Script de prueba del envío de DATA por fragmentos.
+
+Verifica que el dot-stuffing incremental produzca los mismos bytes que
+`smtplib` y que `StreamingSMTP` entregue el mensaje completo al servidor.
+"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.smtp.data import StreamingSMTP, iter_data_chunks
+from test_async_smtp import FakeSMTPServer
+
+
+def _reference(msg: bytes) -> bytes:
+    """Contenido de DATA tal como lo arma `smtplib.SMTP.data()`."""
+    quoted = msg.replace(b"\r\n.", b"\r\n..")
+    if quoted.startswith(b"."):
+        quoted = b"." + quoted
+    if not quoted.endswith(b"\r\n"):
+        quoted += b"\r\n"
+    return quoted + b".\r\n"
+
+
+def test_dot_stuffing_matches_smtplib():
+    """Mismo resultado con fragmentos pequeños, generadores y fin de línea mixto."""
+    print("🧪 Probando dot-stuffing incremental...")
+    message = b".inicio\r\nlinea\r\n.punto\r\n..doble\r\nfin sin salto"
+    expected = _reference(message)
+
+    for chunk_size in (1, 3, 7, 64 * 1024):
+        assert b"".join(iter_data_chunks(message, chunk_size)) == expected
+
+    # Generador con puntos justo después de un corte entre fragmentos
+    parts = [message[i:i + 5] for i in range(0, len(message), 5)]
+    assert b"".join(iter_data_chunks(iter(parts))) == expected
+
+    # Los str y los finales de línea sueltos se normalizan a CRLF
+    assert b"".join(iter_data_chunks("Subject: x\n\n.linea\n")) == b"Subject: x\r\n\r\n..linea\r\n.\r\n"
+    print("✅ Dot-stuffing equivalente a smtplib\n")
+
+
+def test_streaming_smtp_delivers_message():
+    """`StreamingSMTP.sendmail()` entrega el mensaje con dot-stuffing al servidor."""
+    print("🧪 Probando DATA por fragmentos con smtplib...")
+    server = FakeSMTPServer()
+    loop = asyncio.new_event_loop()
+    port = loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        body = b"Subject: hola\r\n\r\n" + b"linea de relleno\r\n" * 10000 + b".final\r\n"
+        client = StreamingSMTP("127.0.0.1", port)
+        client.data_chunk_size = 4096
+        client.sendmail("from@test.com", ["to@test.com"], body)
+        client.quit()
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+    rcpts, data = server.messages[0]
+    assert rcpts == ["to@test.com"]
+    assert data == body.replace(b"\r\n.final", b"\r\n..final")
+    print(f"✅ {len(body)} bytes enviados por fragmentos\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de DATA por fragmentos\n")
+    test_dot_stuffing_matches_smtplib()
+    test_streaming_smtp_delivers_message()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
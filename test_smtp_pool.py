@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el pool de conexiones SMTP.
+
+Verifica la reutilización de sesiones, el reciclaje por límite de mensajes
+y la reconexión transparente sin abrir conexiones SMTP reales.
+"""
+
+import smtplib
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.smtp.pool import SMTPConnectionPool, SMTPDataInterruptedError
+
+
+class FakeSMTP:
+    """Servidor SMTP simulado que registra los mensajes enviados."""
+
+    def __init__(self, fail_next: bool = False, fail_after_data: bool = False):
+        self.sent = []
+        self.closed = False
+        self.fail_next = fail_next
+        self.fail_after_data = fail_after_data
+        self.data_started = False
+
+    esmtp_features = {"8bitmime": ""}
+
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=()):
+        if self.fail_next:
+            self.fail_next = False
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if self.fail_after_data:
+            # El cuerpo llegó al relay pero la respuesta al "." nunca volvió
+            self.data_started = True
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent.append((from_addr, to_addrs, msg))
+        return {}
+
+    def noop(self):
+        return (250, b"OK")
+
+    def quit(self):
+        self.closed = True
+
+
+def make_pool(servers, **kwargs):
+    """Crea un pool cuya fábrica entrega los servidores simulados en orden."""
+    iterator = iter(servers)
+    return SMTPConnectionPool(
+        host="smtp.test",
+        port=587,
+        connection_factory=lambda: next(iterator),
+        **kwargs
+    )
+
+
+def test_pool_reuses_sessions():
+    """Los envíos consecutivos reutilizan la misma sesión autenticada."""
+    print("🧪 Probando reutilización de sesiones...")
+    server = FakeSMTP()
+    pool = make_pool([server])
+
+    for i in range(3):
+        pool.sendmail("from@test.com", ["to@test.com"], f"mensaje {i}")
+
+    stats = pool.stats()
+    assert len(server.sent) == 3
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+    assert stats["created"] == 1
+    print(f"✅ Estadísticas del pool: {stats}\n")
+
+
+def test_pool_recycles_after_max_messages():
+    """La sesión se cierra al alcanzar el límite de mensajes por sesión."""
+    print("🧪 Probando reciclaje por límite de mensajes...")
+    first, second = FakeSMTP(), FakeSMTP()
+    pool = make_pool([first, second], max_messages_per_session=2)
+
+    for i in range(3):
+        pool.sendmail("from@test.com", ["to@test.com"], f"mensaje {i}")
+
+    assert first.closed
+    assert len(first.sent) == 2
+    assert len(second.sent) == 1
+    assert pool.stats()["discarded"] == 1
+    print("✅ Sesión reciclada correctamente\n")
+
+
+def test_pool_reconnects_on_disconnect():
+    """Si el relay cierra la sesión, se reconecta y se reintenta una vez."""
+    print("🧪 Probando reconexión transparente...")
+    dropped, fresh = FakeSMTP(fail_next=True), FakeSMTP()
+    pool = make_pool([dropped, fresh])
+
+    result = pool.sendmail("from@test.com", ["to@test.com"], "mensaje")
+
+    stats = pool.stats()
+    assert result == {}
+    assert len(fresh.sent) == 1
+    assert stats["reconnects"] == 1
+    assert stats["size"] == 1
+    print(f"✅ Reconexión exitosa: {stats}\n")
+
+
+def test_pool_does_not_resend_after_data():
+    """Un corte después de enviar el cuerpo no se reintenta: el relay pudo haberlo aceptado."""
+    print("🧪 Probando corte durante DATA...")
+    dropped, fresh = FakeSMTP(fail_after_data=True), FakeSMTP()
+    pool = make_pool([dropped, fresh])
+
+    try:
+        pool.sendmail("from@test.com", ["to@test.com"], "mensaje")
+        raise AssertionError("Se esperaba SMTPDataInterruptedError")
+    except SMTPDataInterruptedError:
+        pass
+
+    stats = pool.stats()
+    assert fresh.sent == []
+    assert stats["reconnects"] == 0
+    assert stats["size"] == 0
+    print(f"✅ Mensaje no reenviado: {stats}\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del pool SMTP\n")
+    test_pool_reuses_sessions()
+    test_pool_recycles_after_max_messages()
+    test_pool_reconnects_on_disconnect()
+    test_pool_does_not_resend_after_data()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el spool durable de correos salientes.
+
+Verifica que los mensajes encolados sobrevivan a un reinicio, que los
+que quedaron a medio entregar vuelvan a la cola y que los terminados se
+purguen al vencer la retención, sin enviar emails reales.
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.smtp.scheduler import PRIORITY_OTP
+from app.smtp.spool import OutboundSpool, SpoolWorkers
+
+
+def test_spool_survives_restart():
+    """Un mensaje reservado antes de una caída vuelve a `pending` al reabrir."""
+    print("🧪 Probando durabilidad del spool...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "spool.sqlite3")
+
+        spool = OutboundSpool(path)
+        first = spool.enqueue("/email/send_otp", "from@test.com", ["a@test.com"], b"mensaje 1")
+        spool.enqueue("/email/send_otp", "from@test.com", ["b@test.com"], b"mensaje 2")
+        claimed = spool.claim()
+        assert claimed.id == first
+        spool.close()
+
+        # Simular reinicio del proceso
+        reopened = OutboundSpool(path)
+        assert reopened.stats()["pending"] == 2
+        item = reopened.claim()
+        assert item.id == first
+        assert item.attempts == 2
+        assert item.recipients == ["a@test.com"]
+        assert item.message == b"mensaje 1"
+
+        reopened.mark_sent(item.id)
+        assert reopened.depth() == 1
+        reopened.close()
+    print("✅ Mensajes recuperados tras el reinicio\n")
+
+
+def test_spool_retry_and_failure():
+    """Los fallos con `retry_at` vuelven a la cola; sin él quedan como `failed`."""
+    print("🧪 Probando reintentos del spool...")
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = OutboundSpool(str(Path(tmp) / "spool.sqlite3"))
+        message_id = spool.enqueue("/waitlist/send_confirmation", "from@test.com", ["a@test.com"], b"x")
+
+        item = spool.claim()
+        spool.mark_failed(item.id, "421 try later", retry_at=0)
+        assert spool.claim().id == message_id
+
+        spool.mark_failed(message_id, "550 no such user")
+        assert spool.claim() is None
+        assert spool.stats()["failed"] == 1
+        spool.close()
+    print("✅ Reintentos y fallos registrados correctamente\n")
+
+
+def test_spool_claims_otp_first():
+    """Un OTP encolado después de correos masivos se reserva antes que ellos."""
+    print("🧪 Probando prioridad del spool...")
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = OutboundSpool(str(Path(tmp) / "spool.sqlite3"))
+        spool.enqueue("/waitlist/send_confirmation", "from@test.com", ["a@test.com"], b"masivo")
+        otp_id = spool.enqueue("/email/send_otp", "from@test.com", ["b@test.com"], b"otp", PRIORITY_OTP)
+
+        item = spool.claim()
+        assert item.id == otp_id
+        assert item.priority == PRIORITY_OTP
+
+        # Diferir por falta de presupuesto no consume el intento
+        spool.defer(item.id, retry_at=0)
+        assert spool.claim().attempts == 1
+        spool.close()
+    print("✅ OTP reservado primero\n")
+
+
+def test_spool_claims_batch_of_same_priority():
+    """`claim_many()` reserva un grupo de la prioridad más urgente, en orden de llegada."""
+    print("🧪 Probando reserva de grupos del spool...")
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = OutboundSpool(str(Path(tmp) / "spool.sqlite3"))
+        bulk = [
+            spool.enqueue("/waitlist/send_confirmation", "from@test.com", [f"{i}@test.com"], b"masivo")
+            for i in range(3)
+        ]
+        otp_id = spool.enqueue("/email/send_otp", "from@test.com", ["b@test.com"], b"otp", PRIORITY_OTP)
+
+        assert [item.id for item in spool.claim_many(10)] == [otp_id]
+        assert [item.id for item in spool.claim_many(2)] == bulk[:2]
+        assert [item.id for item in spool.claim_many(2)] == bulk[2:]
+        assert spool.claim_many(2) == []
+        spool.close()
+    print("✅ Grupos reservados por prioridad\n")
+
+
+def test_spool_supersedes_pending_otp():
+    """Un OTP nuevo reemplaza al pendiente del mismo destinatario; uno ya reservado no se reintenta."""
+    print("🧪 Probando reemplazo de OTP pendientes...")
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = OutboundSpool(str(Path(tmp) / "spool.sqlite3"))
+        key = "/email/send_otp:a@test.com"
+        for code in (b"111111", b"222222"):
+            spool.enqueue("/email/send_otp", "from@test.com", ["a@test.com"], code, PRIORITY_OTP, key)
+        other = spool.enqueue("/email/send_otp", "from@test.com", ["b@test.com"], b"999999", PRIORITY_OTP,
+                              "/email/send_otp:b@test.com")
+        latest = spool.enqueue("/email/send_otp", "from@test.com", ["a@test.com"], b"333333", PRIORITY_OTP, key)
+
+        items = spool.claim_many(10)
+        assert sorted(item.id for item in items) == sorted([other, latest])
+        assert spool.stats()["superseded"] == 2
+
+        # El reservado falla y, mientras tanto, se pidió otro código: no vuelve a la cola
+        newest = spool.enqueue("/email/send_otp", "from@test.com", ["a@test.com"], b"444444", PRIORITY_OTP, key)
+        spool.mark_failed(latest, "421 try later", retry_at=0)
+        spool.defer(other, retry_at=0)
+        assert sorted(item.id for item in spool.claim_many(10)) == sorted([other, newest])
+        assert spool.stats()["superseded"] == 3
+        spool.close()
+    print("✅ Solo se entrega el último código de cada destinatario\n")
+
+
+def test_spool_purges_finished_messages():
+    """Los mensajes terminados se borran al vencer la retención; los pendientes se conservan."""
+    print("🧪 Probando purga de mensajes terminados...")
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = OutboundSpool(str(Path(tmp) / "spool.sqlite3"))
+        key = "/email/send_otp:a@test.com"
+        spool.enqueue("/email/send_otp", "from@test.com", ["a@test.com"], b"111111", PRIORITY_OTP, key)
+        spool.enqueue("/email/send_otp", "from@test.com", ["a@test.com"], b"222222", PRIORITY_OTP, key)
+        spool.mark_sent(spool.claim().id)
+        failed = spool.enqueue("/waitlist/send_confirmation", "from@test.com", ["b@test.com"], b"x")
+        spool.claim()
+        spool.mark_failed(failed, "550 no such user")
+        spool.enqueue("/waitlist/send_confirmation", "from@test.com", ["c@test.com"], b"y")
+
+        assert spool.purge(older_than=3600) == 0
+        time.sleep(0.01)
+        workers = SpoolWorkers(spool, retention=0.001)
+        asyncio.run(workers._purge())
+        stats = spool.stats()
+        assert workers.stats()["purged"] == 3
+        assert stats == {"pending": 1, "sending": 0, "sent": 0, "failed": 0, "superseded": 0}
+        # La siguiente purga espera PURGE_INTERVAL
+        spool.mark_sent(spool.claim().id)
+        time.sleep(0.01)
+        asyncio.run(workers._purge())
+        assert spool.stats()["sent"] == 1
+        spool.close()
+    print(f"✅ Mensajes terminados purgados: {workers.purged}\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del spool\n")
+    test_spool_survives_restart()
+    test_spool_retry_and_failure()
+    test_spool_claims_otp_first()
+    test_spool_claims_batch_of_same_priority()
+    test_spool_supersedes_pending_otp()
+    test_spool_purges_finished_messages()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
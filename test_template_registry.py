@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el registro compartido de plantillas.
+
+Verifica la compilación al iniciar, la caché de bytecode en disco, la
+recarga explícita sin auto-reload, la etapa de build (CSS incrustado y
+HTML minificado) y que el render precalculado coincide con el render
+completo de Jinja.
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.rendering import TemplateRegistry, TEMPLATES_DIR
+from app.rendering.build import build_template, build_templates
+from app.rendering.prerender import EMAIL_PRERENDER_SPECS, PrerenderSpec, branding_context
+
+
+def test_registry_compiles_and_caches_bytecode():
+    """Las plantillas se compilan al cargar y el bytecode queda en disco."""
+    print("🧪 Probando compilación y caché de bytecode...")
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir = Path(tmp) / "templates"
+        templates_dir.mkdir()
+        (templates_dir / "hola.html").write_text("Hola {{ nombre }}")
+        cache_dir = Path(tmp) / "cache"
+
+        registry = TemplateRegistry(templates_dir, names=("hola.html",), cache_dir=str(cache_dir))
+        registry.load()
+
+        assert registry.render("hola.html", {"nombre": "Ana"}) == "Hola Ana"
+        assert len(list(cache_dir.iterdir())) == 1
+
+        # Un registro nuevo (arranque en frío) reutiliza el bytecode existente
+        cold = TemplateRegistry(templates_dir, names=("hola.html",), cache_dir=str(cache_dir))
+        cold.load()
+        assert cold.render("hola.html", {"nombre": "Luis"}) == "Hola Luis"
+    print("✅ Bytecode reutilizado en arranque en frío\n")
+
+
+def test_registry_reload():
+    """Sin auto-reload los cambios en disco solo se aplican con `reload()`."""
+    print("🧪 Probando recarga explícita...")
+    with tempfile.TemporaryDirectory() as tmp:
+        template = Path(tmp) / "hola.html"
+        template.write_text("Hola {{ nombre }}")
+
+        registry = TemplateRegistry(Path(tmp), names=("hola.html",))
+        registry.load()
+
+        template.write_text("Adiós {{ nombre }}")
+        assert registry.render("hola.html", {"nombre": "Ana"}) == "Hola Ana"
+
+        registry.reload()
+        assert registry.render("hola.html", {"nombre": "Ana"}) == "Adiós Ana"
+        assert registry.stats()["reloads"] == 1
+    print("✅ Plantilla recargada\n")
+
+
+def test_prerender_matches_full_render():
+    """El esqueleto precalculado produce el mismo HTML que Jinja en cada variante."""
+    print("🧪 Probando render precalculado de otp.html y waitlist.html...")
+    registry = TemplateRegistry(TEMPLATES_DIR, prerender_specs=EMAIL_PRERENDER_SPECS)
+    registry.load()
+
+    otp_contexts = [
+        {"otp_code": "123456", "expiry_minutes": minutes, "expiry_suffix": "" if minutes == 1 else "s",
+         "show_expiry": bool(minutes), "redirect_url": url, "show_redirect_button": bool(url)}
+        for minutes in (None, 1, 10)
+        for url in (None, "https://app.test/verify?c=1&x=<2>")
+    ]
+    waitlist_contexts = [
+        {"user_name": "Ana <Dev>", "user_email": "ana@test.com", "website_url": url,
+         "show_website_button": bool(url), "message_type": message_type,
+         "availability_message": "En cuanto <strong>CRM</strong> esté disponible",
+         "offerings_text_html": "<strong>CRM</strong>"}
+        for url in ("", "https://ana.test")
+        for message_type in ("platform", "single", "multiple")
+    ]
+
+    for name, contexts in (("otp.html", otp_contexts), ("waitlist.html", waitlist_contexts)):
+        template = registry.get(name)
+        for context in contexts:
+            expected = template.render({**branding_context(), **context})
+            assert registry.render(name, context) == expected, (name, context)
+        assert registry.get_prerendered(name).fallbacks == 0
+    print("✅ Render precalculado idéntico al completo\n")
+
+
+def test_prerender_fallback_for_unknown_variant():
+    """Un valor de variante no precalculado usa el render completo."""
+    print("🧪 Probando fallback a render completo...")
+    with tempfile.TemporaryDirectory() as tmp:
+        (Path(tmp) / "hola.html").write_text("{{ marca }}: {% if tipo == 'a' %}A{% else %}B{% endif %} {{ nombre }}")
+        spec = PrerenderSpec(slots=("nombre",), variants={"tipo": ("a",)}, static_context=lambda: {"marca": "M"})
+        registry = TemplateRegistry(Path(tmp), names=("hola.html",), prerender_specs={"hola.html": spec})
+        registry.load()
+
+        assert registry.render("hola.html", {"tipo": "a", "nombre": "Ana"}) == "M: A Ana"
+        assert registry.render("hola.html", {"tipo": "z", "nombre": "Ana"}) == "M: B Ana"
+        assert registry.stats()["prerendered"]["hola.html"] == {"variants": 1, "fallbacks": 1}
+    print("✅ Fallback correcto\n")
+
+
+def test_build_inlines_css_and_minifies():
+    """El build incrusta reglas simples y conserva en <style> las que no se pueden incrustar."""
+    print("🧪 Probando CSS incrustado y minificación...")
+    source = """<html>
+<head>
+    <style>
+        /* Comentario */
+        .box { color: red; padding: 4px; }
+        .box p { margin: 0; }
+        .box:hover { color: blue; }
+        @media (max-width: 600px) { .box { padding: 0; } }
+    </style>
+</head>
+<body>
+    <!-- Contenido -->
+    <div class="box" style="padding: 8px">
+        <p>Hola   <strong>{{ nombre }}</strong> {% if vip %}VIP{% endif %}</p>
+    </div>
+</body>
+</html>"""
+    built = build_template(source)
+
+    # Los saltos de línea solo se insertan en límites de bloque
+    flat = built.replace("\n", "")
+    assert "Comentario" not in built and "Contenido" not in built
+    assert '<div class="box" style="color:red;padding:8px">' in flat
+    assert '<p style="margin:0">Hola <strong>{{ nombre }}</strong> {% if vip %}VIP{% endif %}</p>' in flat
+    assert "<style>.box:hover{color:blue}\n@media (max-width: 600px){.box{padding:0!important}}</style>" in built
+    assert "</div></body>" in flat
+    print(f"✅ {len(source)} → {len(built)} bytes\n")
+
+
+def test_registry_uses_fresh_build_only():
+    """El registro usa el artefacto optimizado solo mientras coincide con su fuente."""
+    print("🧪 Probando carga de plantillas construidas...")
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir = Path(tmp) / "templates"
+        templates_dir.mkdir()
+        template = templates_dir / "hola.html"
+        template.write_text("<p>\n    Hola   {{ nombre }}\n</p>")
+        build_dir = Path(tmp) / "build"
+        manifest = build_templates(templates_dir, build_dir, names=("hola.html",))
+        assert manifest["hola.html"]["built_bytes"] < manifest["hola.html"]["source_bytes"]
+
+        registry = TemplateRegistry(templates_dir, names=("hola.html",), build_dir=build_dir)
+        registry.load()
+        assert registry.render("hola.html", {"nombre": "Ana"}) == "<p>Hola Ana</p>"
+        assert "hola.html" in registry.stats()["built"]
+
+        # Fuente modificado después del build: se ignora el artefacto obsoleto
+        template.write_text("<p>Adiós {{ nombre }}</p>")
+        registry.reload()
+        assert registry.render("hola.html", {"nombre": "Ana"}) == "<p>Adiós Ana</p>"
+        assert registry.stats()["built"] == {}
+    print("✅ Artefacto obsoleto descartado\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas del registro de plantillas\n")
+    test_registry_compiles_and_caches_bytecode()
+    test_registry_reload()
+    test_prerender_matches_full_render()
+    test_prerender_fallback_for_unknown_variant()
+    test_build_inlines_css_and_minifies()
+    test_registry_uses_fresh_build_only()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el contexto TLS compartido y la reanudación de sesiones.
+
+Verifica que una segunda conexión al mismo servidor reanude la sesión TLS
+(con `smtplib` vía `wrap_socket()` y con asyncio vía `wrap_bio()`), que con
+`SMTP_TLS_SESSION_RESUMPTION=false` siempre se haga el handshake completo y
+las métricas de handshakes, contra un servidor TLS local con un certificado
+autofirmado generado con `openssl`.
+"""
+
+import asyncio
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.smtp import tls
+from app.smtp.tls import ResumableSSLContext, TLSHandshakeStats, tls_stats
+
+
+class FakeTLSServer:
+    """Servidor TLS 1.2 local (reanudación determinista) que responde `ok` a cada conexión."""
+
+    def __init__(self, certfile: str, keyfile: str):
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.maximum_version = ssl.TLSVersion.TLSv1_2
+        self.context.load_cert_chain(certfile, keyfile)
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                with self.context.wrap_socket(conn, server_side=True) as tls_conn:
+                    tls_conn.sendall(b"ok")
+            except (OSError, ssl.SSLError):
+                pass
+
+    def close(self):
+        self.sock.close()
+
+
+def make_certificate(directory: str) -> tuple[str, str]:
+    certfile, keyfile = str(Path(directory) / "cert.pem"), str(Path(directory) / "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", keyfile, "-out", certfile,
+         "-days", "1", "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost"],
+        check=True, capture_output=True,
+    )
+    return certfile, keyfile
+
+
+def client_context(certfile: str, resumption: bool) -> ResumableSSLContext:
+    context = ResumableSSLContext(ssl.PROTOCOL_TLS_CLIENT, resumption=resumption)
+    context.load_verify_locations(certfile)
+    return context
+
+
+def connect_sync(context: ResumableSSLContext, port: int) -> bool:
+    """Conecta como `smtplib` (wrap_socket), guarda la sesión y devuelve si se reanudó."""
+    with context.wrap_socket(socket.create_connection(("127.0.0.1", port)), server_hostname="localhost") as sock:
+        assert sock.recv(2) == b"ok"
+        context.store_session("localhost", sock.session)
+        return sock.session_reused
+
+
+async def connect_async(context: ResumableSSLContext, port: int) -> bool:
+    """Conecta como el cliente asyncio (wrap_bio), guarda la sesión y devuelve si se reanudó."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, ssl=context, server_hostname="localhost")
+    assert await reader.readexactly(2) == b"ok"
+    ssl_object = writer.get_extra_info("ssl_object")
+    context.store_session("localhost", ssl_object.session)
+    writer.close()
+    return ssl_object.session_reused
+
+
+def run_with_server(check) -> None:
+    if shutil.which("openssl") is None:
+        print("⚠️ openssl no disponible, prueba omitida\n")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile, keyfile = make_certificate(tmp)
+        server = FakeTLSServer(certfile, keyfile)
+        try:
+            check(certfile, server.port)
+        finally:
+            server.close()
+
+
+def test_session_is_resumed_for_same_host():
+    """La segunda conexión al mismo host reanuda la sesión guardada, con ambos transportes."""
+    print("🧪 Probando reanudación de sesiones TLS...")
+
+    def check(certfile, port):
+        before = tls_stats.stats().get("localhost", {"handshakes": 0, "resumed": 0})
+        context = client_context(certfile, resumption=True)
+        assert [connect_sync(context, port) for _ in range(3)] == [False, True, True]
+        assert context.get_session("localhost") is not None
+        assert context.get_session("otro.host") is None
+
+        after = tls_stats.stats()["localhost"]
+        assert after["handshakes"] - before["handshakes"] == 3
+        assert after["resumed"] - before["resumed"] == 2
+
+        context = client_context(certfile, resumption=True)
+        assert asyncio.run(connect_async(context, port)) is False
+        assert asyncio.run(connect_async(context, port)) is True
+        print(f"✅ Sesiones reanudadas: {after}\n")
+
+    run_with_server(check)
+
+
+def test_resumption_disabled():
+    """Con la reanudación desactivada no se guardan sesiones y cada conexión hace el handshake completo."""
+    print("🧪 Probando SMTP_TLS_SESSION_RESUMPTION=false...")
+
+    def check(certfile, port):
+        context = client_context(certfile, resumption=False)
+        assert [connect_sync(context, port) for _ in range(2)] == [False, False]
+        assert asyncio.run(connect_async(context, port)) is False
+        assert context.get_session("localhost") is None
+        print("✅ Handshake completo en cada conexión\n")
+
+    run_with_server(check)
+
+    original_context, original_setting = tls._default_context, tls.settings.SMTP_TLS_SESSION_RESUMPTION
+    tls._default_context = None
+    tls.settings.SMTP_TLS_SESSION_RESUMPTION = False
+    try:
+        shared = tls.get_ssl_context()
+        assert shared is tls.get_ssl_context()
+        assert shared.resumption_enabled is False
+    finally:
+        tls._default_context = original_context
+        tls.settings.SMTP_TLS_SESSION_RESUMPTION = original_setting
+
+
+def test_handshake_stats():
+    """Las métricas promedian latencia y CPU por host y calculan la proporción reanudada."""
+    print("🧪 Probando métricas de handshakes...")
+    stats = TLSHandshakeStats()
+    stats.record("smtp.a", latency=0.040, cpu=0.004, resumed=False)
+    stats.record("smtp.a", latency=0.010, cpu=0.001, resumed=True)
+    stats.record("smtp.b", latency=0.020, cpu=0.002, resumed=False)
+
+    result = stats.stats()
+    assert result["smtp.a"] == {
+        "handshakes": 2, "resumed": 1, "resumption_ratio": 0.5, "avg_latency_ms": 25.0, "avg_cpu_ms": 2.5,
+    }
+    assert result["smtp.b"]["resumption_ratio"] == 0.0 and result["smtp.b"]["handshakes"] == 1
+    print(f"✅ Métricas: {result}\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de TLS\n")
+    test_session_is_resumed_for_same_host()
+    test_resumption_disabled()
+    test_handshake_stats()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
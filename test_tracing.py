@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para las trazas por envío y las transcripciones SMTP lentas.
+
+Verifica la lectura de `traceparent`, que las fases del envío quedan como
+spans hijos, que el middleware continúa la traza entrante y que los
+envíos lentos guardan su transcripción sin credenciales.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.observability.metrics import observe_phase
+from app.observability.tracing import parse_traceparent, start_span
+from app.observability.transcripts import record_transcript, slow_transcripts
+from app.smtp.async_pool import AsyncSMTPConnectionPool
+from test_async_smtp import FakeSMTPServer
+from test_logging import ListHandler
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_parse_traceparent():
+    """Solo se aceptan headers `traceparent` bien formados."""
+    print("🧪 Probando lectura de traceparent...")
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00") == (TRACE_ID, PARENT_ID, False)
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent(f"ff-{TRACE_ID}-{PARENT_ID}-01") is None
+    assert parse_traceparent(f"00-{TRACE_ID}-xyz-01") is None
+    assert parse_traceparent("") is None
+    print("✅ Headers válidos e inválidos reconocidos\n")
+
+
+def test_phases_become_child_spans():
+    """Con la traza muestreada, cada fase se registra como span hijo del span en curso."""
+    print("🧪 Probando spans por fase...")
+    handler = ListHandler()
+    base = logging.getLogger("app.observability.tracing")
+    base.handlers = [handler]
+    base.setLevel(logging.INFO)
+    base.propagate = False
+    original = settings.TRACE_SAMPLE_RATE
+    settings.TRACE_SAMPLE_RATE = 1.0
+    try:
+        with start_span("otp.send") as root:
+            observe_phase("render", time.perf_counter())
+    finally:
+        settings.TRACE_SAMPLE_RATE = original
+        base.handlers = []
+
+    spans = [record.fields for record in handler.records]
+    assert [span["span"] for span in spans] == ["render", "otp.send"]
+    assert spans[0]["parent_id"] == root.span_id
+    assert spans[0]["trace_id"] == spans[1]["trace_id"] == root.trace_id
+    print(f"✅ {len(spans)} spans en la traza {root.trace_id}\n")
+
+
+def test_middleware_continues_incoming_trace():
+    """La respuesta devuelve un `traceparent` de la misma traza con el span del servicio."""
+    print("🧪 Probando propagación de traceparent...")
+    from app.main import app
+
+    client = TestClient(app)
+    response = client.get("/", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+    trace_id, span_id, sampled = parse_traceparent(response.headers["traceparent"])
+    assert trace_id == TRACE_ID
+    assert span_id != PARENT_ID
+    assert not sampled
+    print(f"✅ {response.headers['traceparent']}\n")
+
+
+async def _slow_send_records_transcript():
+    server = FakeSMTPServer()
+    port = await server.start()
+    pool = AsyncSMTPConnectionPool("127.0.0.1", port, username="u", password="secreto", use_tls=False, name="fake")
+    with start_span("smtp.send") as span, record_transcript("fake"):
+        await pool.sendmail("from@test.com", ["ana@empresa.com"], "Subject: hola\n\nlinea\n")
+    await pool.close()
+    await server.stop()
+    return span
+
+
+def test_slow_send_records_transcript():
+    """Un envío sobre el umbral guarda su transcripción, con AUTH oculto y fases medidas."""
+    print("🧪 Probando transcripción de envíos lentos...")
+    original = settings.SMTP_SLOW_SEND_THRESHOLD_MS
+    settings.SMTP_SLOW_SEND_THRESHOLD_MS = 0
+    slow_transcripts.clear()
+    try:
+        span = asyncio.run(_slow_send_records_transcript())
+    finally:
+        settings.SMTP_SLOW_SEND_THRESHOLD_MS = original
+
+    entry = slow_transcripts.entries()[0]
+    text = "\n".join(entry["lines"])
+    assert entry["relay"] == "fake"
+    assert entry["trace_id"] == span.trace_id
+    assert "AUTH PLAIN ***" in text
+    assert "secreto" not in text and "AHUAc2VjcmV0bw" not in text
+    assert "RCPT TO:<a***@empresa.com>" in text
+    for phase in ("dns", "connect", "auth", "data"):
+        assert f"* {phase} " in text
+    assert "< 250 2.0.0 Queued" in text
+    print(f"✅ Transcripción de {len(entry['lines'])} líneas guardada\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de trazas y transcripciones\n")
+    test_parse_traceparent()
+    test_phases_become_child_spans()
+    test_middleware_continues_incoming_trace()
+    test_slow_send_records_transcript()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Script de prueba para el endpoint de confirmaciones de waitlist en lote.
+
+Verifica la decodificación incremental de NDJSON y arrays JSON (incluidos
+los arrays malformados y los valores partidos entre fragmentos), que la
+respuesta no escuche desconexiones mientras se lee el cuerpo y que el
+endpoint devuelva un resultado por elemento en streaming.
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.insert(0, str(Path(__file__).parent))
+
+import httpx
+from fastapi import FastAPI
+
+from app.waitlist import router as waitlist_router
+from app.waitlist.batch import BatchItemError, RequestStreamingResponse, iter_json_items
+
+
+async def _chunks(*parts: str):
+    for part in parts:
+        yield part.encode("utf-8")
+
+
+async def _collect(*parts: str) -> list:
+    return [
+        (index, f"error: {item}" if isinstance(item, BatchItemError) else item)
+        async for index, item in iter_json_items(_chunks(*parts))
+    ]
+
+
+def parse(*parts: str) -> list:
+    return asyncio.run(_collect(*parts))
+
+
+def test_parses_ndjson_and_arrays():
+    """NDJSON y arrays JSON válidos, partidos en cualquier punto, producen los mismos elementos."""
+    print("🧪 Probando decodificación incremental...")
+    assert parse('{"a": 1}\n', '{"b"', ': 2}\n\n{"c": 3}') == [(0, {"a": 1}), (1, {"b": 2}), (2, {"c": 3})]
+    assert parse('{"a": 1}\nno es json\n{"c": 3}\n')[1][1].startswith("error: JSON inválido")
+    assert parse("  [", '{"a": 1}', ' , {"b": [1, ', '2]} ]  \n') == [(0, {"a": 1}), (1, {"b": [1, 2]})]
+    assert parse("[]") == [] and parse(" [ ", " ] ") == []
+    # Un escalar partido entre fragmentos no se divide en dos elementos
+    assert parse("[1", "2, 3]") == [(0, 12), (1, 3)]
+    assert parse('["ho', 'la", tr', "ue, 4", "5.5]") == [(0, "hola"), (1, True), (2, 45.5)]
+    print("✅ Elementos decodificados correctamente\n")
+
+
+def test_rejects_malformed_arrays():
+    """Comas repetidas, separadores faltantes y datos tras el cierre terminan el lote con un error."""
+    print("🧪 Probando arrays malformados...")
+    cases = {
+        "[{},,{}]": [(0, {})],
+        '[{"a":1} {"b":2}]': [(0, {"a": 1})],
+        '[{"a":1}] trailing': [(0, {"a": 1})],
+        "[1,]": [(0, 1)],
+        "[,1]": [],
+        '[{"a":1},': [(0, {"a": 1})],
+    }
+    for body, expected in cases.items():
+        items = parse(*body)  # Un carácter por fragmento
+        assert items[:-1] == expected, (body, items)
+        index, error = items[-1]
+        assert index == len(expected) and error.startswith("error: "), (body, items)
+    print(f"✅ {len(cases)} arrays malformados rechazados\n")
+
+
+async def _listen_after_body():
+    body_consumed = asyncio.Event()
+    response = RequestStreamingResponse(_chunks(), body_consumed=body_consumed)
+    received = []
+
+    async def receive():
+        received.append(1)
+        return {"type": "http.disconnect"}
+
+    listener = asyncio.create_task(response.listen_for_disconnect(receive))
+    await asyncio.sleep(0.01)
+    before = len(received)
+    body_consumed.set()
+    await asyncio.wait_for(listener, 1)
+    return before, len(received)
+
+
+def test_response_listens_only_after_body():
+    """La respuesta no lee `receive()` hasta terminar de consumir el cuerpo del request."""
+    print("🧪 Probando escucha de desconexión...")
+    before, after = asyncio.run(_listen_after_body())
+    assert before == 0 and after == 1
+    print("✅ Desconexión escuchada solo tras el cuerpo\n")
+
+
+async def _post_batch(parts: list[str]):
+    async def send_waitlist_batch(items):
+        total = 0
+        async for index, item in items:
+            total += 1
+            if isinstance(item, BatchItemError):
+                yield {"index": index, "success": False, "message": str(item)}
+            else:
+                yield {"index": index, "email": item["email"], "success": True}
+        yield {"summary": {"total": total}}
+
+    app = FastAPI()
+    app.include_router(waitlist_router.router_waitlist)
+    app.state.waitlist_controller = SimpleNamespace(send_waitlist_batch=send_waitlist_batch)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/waitlist/send_confirmation/batch", content=_chunks(*parts),
+                                     headers={"Content-Type": "application/x-ndjson"})
+    return response, [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_endpoint_streams_results():
+    """El endpoint devuelve una línea NDJSON por elemento y un resumen final."""
+    print("🧪 Probando endpoint en lote...")
+    lines = [json.dumps({"email": f"user{i}@empresa.com"}) + "\n" for i in range(50)]
+    # Fragmentos que cortan las líneas en cualquier punto
+    body = "".join(lines[:25]) + "{roto\n" + "".join(lines[25:])
+    parts = [body[i:i + 7] for i in range(0, len(body), 7)]
+    response, results = asyncio.run(_post_batch(parts))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [result["index"] for result in results[:-1]] == list(range(51))
+    assert results[25]["success"] is False and "JSON inválido" in results[25]["message"]
+    assert results[26]["email"] == "user25@empresa.com"
+    assert results[-1] == {"summary": {"total": 51}}
+    print(f"✅ {len(results) - 1} resultados en streaming\n")
+
+
+def main():
+    """Función principal de pruebas."""
+    print("🚀 Iniciando pruebas de confirmaciones en lote\n")
+    test_parses_ndjson_and_arrays()
+    test_rejects_malformed_arrays()
+    test_response_listens_only_after_body()
+    test_batch_endpoint_streams_results()
+    print("🎉 Todas las pruebas pasaron exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())